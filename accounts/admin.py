@@ -1,18 +1,26 @@
 from django.contrib import admin
+from django.core.cache import cache
+from markets.throttling import TIER_PREFIX
 from .models import Account, Transaction
 
 
 @admin.register(Account)
 class AccountAdmin(admin.ModelAdmin):
-    list_display = ['user', 'balance', 'created_at']
-    list_filter = ['created_at']
+    list_display = ['user', 'balance', 'tier', 'created_at']
+    list_filter = ['tier', 'created_at']
     search_fields = ['user__username', 'user__email']
     readonly_fields = ['created_at', 'updated_at']
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Apply a new tier's rate limits right away
+        cache.delete(f'{TIER_PREFIX}{obj.user_id}')
+
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
-    list_display = ['account', 'transaction_type', 'amount', 'created_at']
+    list_display = ['account', 'transaction_type', 'amount', 'market', 'created_at']
     list_filter = ['transaction_type', 'created_at']
-    search_fields = ['account__user__username', 'description']
-    readonly_fields = ['created_at']
\ No newline at end of file
+    search_fields = ['account__user__username', 'market__title', 'description']
+    readonly_fields = ['created_at']
+    raw_id_fields = ['market', 'order', 'trade']
\ No newline at end of file
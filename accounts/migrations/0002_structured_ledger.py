@@ -0,0 +1,90 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+TYPE_CODES = ['DEPOSIT', 'WITHDRAWAL', 'BUY', 'SELL', 'REFUND', 'BUY_LIMIT', 'CANCEL_BUY']
+
+
+def encode_types(apps, schema_editor):
+    """Map the old string types onto the compact enum, one UPDATE per type"""
+    Transaction = apps.get_model('accounts', 'Transaction')
+    for value, code in enumerate(TYPE_CODES, start=1):
+        Transaction.objects.filter(transaction_type=code).update(kind=value)
+
+
+def decode_types(apps, schema_editor):
+    Transaction = apps.get_model('accounts', 'Transaction')
+    for value, code in enumerate(TYPE_CODES, start=1):
+        Transaction.objects.filter(kind=value).update(transaction_type=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0010_trade'),
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='market',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='markets.market'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='markets.order'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='outcome',
+            field=models.CharField(blank=True, max_length=3),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='price',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='quantity',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='trade',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='markets.trade'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='kind',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.RunPython(encode_types, decode_types),
+        # Lets a reverse migration re-add the column before decoding into it
+        migrations.AlterField(
+            model_name='transaction',
+            name='transaction_type',
+            field=models.CharField(default='', max_length=20),
+        ),
+        migrations.RemoveField(
+            model_name='transaction',
+            name='transaction_type',
+        ),
+        migrations.RenameField(
+            model_name='transaction',
+            old_name='kind',
+            new_name='transaction_type',
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='transaction_type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Deposit'), (2, 'Withdrawal'), (3, 'Buy Shares'), (4, 'Sell Shares'), (5, 'Refund'), (6, 'Limit Buy Reserve'), (7, 'Cancelled Buy Refund')]),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', '-created_at'], name='transaction_account_time_idx'),
+        ),
+    ]
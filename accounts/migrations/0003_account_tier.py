@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_structured_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='tier',
+            field=models.CharField(choices=[('STANDARD', 'Standard'), ('PRO', 'Pro'), ('MARKET_MAKER', 'Market Maker')], default='STANDARD', max_length=20),
+        ),
+    ]
@@ -1,11 +1,22 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Account(models.Model):
     """User account with virtual currency balance"""
+    # Order rate limits per tier are set in ORDER_THROTTLE_RATES
+    TIERS = [
+        ('STANDARD', 'Standard'),
+        ('PRO', 'Pro'),
+        ('MARKET_MAKER', 'Market Maker'),
+    ]
+    DEFAULT_TIER = 'STANDARD'
+
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=1000.00)
+    tier = models.CharField(max_length=20, choices=TIERS, default=DEFAULT_TIER)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -16,35 +27,78 @@ class Account(models.Model):
         """Check if account has enough balance for a transaction"""
         return self.balance >= amount
 
+    # Balances change with UPDATE ... SET balance = balance +/- amount, never by
+    # saving the whole row, so concurrent matchers and the expiry/close jobs
+    # can't overwrite each other's changes with a stale balance
+
     def add_funds(self, amount):
         """Add funds to account"""
-        self.balance += amount
-        self.save()
+        Account.objects.filter(pk=self.pk).update(balance=F('balance') + amount, updated_at=timezone.now())
+        self.refresh_from_db(fields=['balance', 'updated_at'])
 
     def deduct_funds(self, amount):
         """Deduct funds from account"""
-        if self.can_afford(amount):
-            self.balance -= amount
-            self.save()
-            return True
-        return False
+        deducted = Account.objects.filter(pk=self.pk, balance__gte=amount).update(
+            balance=F('balance') - amount, updated_at=timezone.now()
+        )
+        self.refresh_from_db(fields=['balance', 'updated_at'])
+        return bool(deducted)
 
 
 class Transaction(models.Model):
-    """Transaction history for account"""
-    TRANSACTION_TYPES = [
-        ('DEPOSIT', 'Deposit'),
-        ('WITHDRAWAL', 'Withdrawal'),
-        ('BUY', 'Buy Shares'),
-        ('SELL', 'Sell Shares'),
-        ('REFUND', 'Refund'),
-    ]
+    """Ledger entry for an account, linked to the market, order and trade it came from"""
+    class Type(models.IntegerChoices):
+        DEPOSIT = 1, 'Deposit'
+        WITHDRAWAL = 2, 'Withdrawal'
+        BUY = 3, 'Buy Shares'
+        SELL = 4, 'Sell Shares'
+        REFUND = 5, 'Refund'
+        BUY_LIMIT = 6, 'Limit Buy Reserve'
+        CANCEL_BUY = 7, 'Cancelled Buy Refund'
+
+    # Rendered at read time from the structured fields of trading entries
+    DESCRIPTIONS = {
+        Type.BUY: 'Buy {quantity} {outcome} shares in {market}',
+        Type.SELL: 'Sell {quantity} {outcome} shares in {market}',
+        Type.REFUND: '{note} buy order: {quantity} {outcome} @ {price} in {market}',
+        Type.BUY_LIMIT: 'Limit buy order: {quantity} {outcome} @ {price} in {market}',
+        Type.CANCEL_BUY: 'Cancelled buy order: {quantity} {outcome} @ {price} in {market}',
+    }
 
     account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='transactions')
-    transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPES)
+    transaction_type = models.PositiveSmallIntegerField(choices=Type.choices)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    market = models.ForeignKey('markets.Market', on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
+    order = models.ForeignKey('markets.Order', on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
+    trade = models.ForeignKey('markets.Trade', on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
+    outcome = models.CharField(max_length=3, blank=True)
+    quantity = models.IntegerField(null=True, blank=True)
+    price = models.DecimalField(max_digits=6, decimal_places=4, null=True, blank=True)
+    # Free text for entries without a market (deposits, older rows) and the
+    # reason of a refund
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', '-created_at'], name='transaction_account_time_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.account.user.username} - {self.transaction_type} - ${self.amount}"
\ No newline at end of file
+        return f"{self.account.user.username} - {self.type_code} - ${self.amount}"
+
+    @property
+    def type_code(self):
+        return self.Type(self.transaction_type).name
+
+    def get_description(self):
+        """Human-readable text; select_related('market') when listing"""
+        if self.market_id is None:
+            return self.description
+        return self.DESCRIPTIONS[self.transaction_type].format(
+            note=self.description,
+            quantity=self.quantity,
+            outcome=self.outcome,
+            price=self.price,
+            market=self.market.title,
+        )
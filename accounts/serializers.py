@@ -7,10 +7,14 @@ class AccountSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Account
-        fields = ['id', 'username', 'balance', 'created_at']
+        fields = ['id', 'username', 'balance', 'tier', 'created_at']
+        read_only_fields = ['tier']
 
 
 class TransactionSerializer(serializers.ModelSerializer):
+    transaction_type = serializers.CharField(source='type_code', read_only=True)
+    description = serializers.CharField(source='get_description', read_only=True)
+    
     class Meta:
         model = Transaction
-        fields = ['id', 'transaction_type', 'amount', 'description', 'created_at']
+        fields = ['id', 'transaction_type', 'amount', 'description', 'market', 'order', 'trade', 'created_at']
@@ -8,6 +8,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from .models import Account, Transaction
 from .serializers import AccountSerializer, TransactionSerializer
+from markets.cache import cached_response
 
 
 class AccountDetailView(generics.RetrieveAPIView):
@@ -21,9 +22,13 @@ class AccountDetailView(generics.RetrieveAPIView):
 class TransactionListView(generics.ListAPIView):
     serializer_class = TransactionSerializer
     
+    @method_decorator(cached_response('transaction-list', ['user:{user}']))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
     def get_queryset(self):
         account, created = Account.objects.get_or_create(user=self.request.user)
-        return account.transactions.all().order_by('-created_at')
+        return account.transactions.select_related('market').order_by('-created_at')
 
 
 @api_view(['POST'])
@@ -40,7 +45,7 @@ def add_funds(request):
     # Create transaction record
     Transaction.objects.create(
         account=account,
-        transaction_type='DEPOSIT',
+        transaction_type=Transaction.Type.DEPOSIT,
         amount=amount,
         description=f'Admin added ${amount}'
     )
@@ -104,7 +104,7 @@ def seed_market_liquidity(market, user):
         for outcome in ['YES', 'NO']:
             # Create bid order (buy) at 49¢
             from markets.models import Order, Share
-            Order.objects.create(
+            buy_order = Order.objects.create(
                 user=user,
                 market=market,
                 order_type='BUY',
@@ -116,7 +116,7 @@ def seed_market_liquidity(market, user):
             )
             
             # Create ask order (sell) at 51¢
-            Order.objects.create(
+            sell_order = Order.objects.create(
                 user=user,
                 market=market,
                 order_type='SELL',
@@ -127,6 +127,9 @@ def seed_market_liquidity(market, user):
                 status='PENDING'
             )
             
+            buy_order.adjust_price_level(shares_per_side, 1)
+            sell_order.adjust_price_level(shares_per_side, 1)
+            
             # Create shares for the sell orders
             share, created = Share.objects.get_or_create(
                 user=user,
@@ -18,31 +18,28 @@ const MarketDetail = () => {
     price: 0.50
   });
   const [orderBook, setOrderBook] = useState(null);
+  const [history, setHistory] = useState([]);
   const [submitting, setSubmitting] = useState(false);
   const [message, setMessage] = useState('');
 
   const fetchMarketData = useCallback(async () => {
     try {
-      const [marketResponse, sharesResponse, orderBookResponse] = await Promise.all([
-        axios.get(API_ENDPOINTS.MARKETS.DETAIL(id), { withCredentials: true }),
-        axios.get(API_ENDPOINTS.ACCOUNTS.PORTFOLIO, { withCredentials: true }),
-        axios.get(API_ENDPOINTS.MARKETS.ORDER_BOOK(id), { withCredentials: true })
+      const [viewResponse, historyResponse] = await Promise.all([
+        axios.get(API_ENDPOINTS.MARKETS.VIEW(id), { withCredentials: true }),
+        axios.get(API_ENDPOINTS.MARKETS.HISTORY(id), { withCredentials: true })
       ]);
+      const view = viewResponse.data;
       
-      setMarket(marketResponse.data);
-      setOrderBook(orderBookResponse.data);
-      
-      // Find user's shares for this market
-      const userShares = sharesResponse.data.find(share => share.market === parseInt(id));
-      if (userShares) {
-        setShares({
-          YES: userShares.outcome === 'YES' ? userShares.quantity : 0,
-          NO: userShares.outcome === 'NO' ? userShares.quantity : 0
-        });
-      }
+      setMarket(view.market);
+      setOrderBook(view.order_books.YES);
+      setHistory(historyResponse.data.points);
+      setShares({
+        YES: view.position.YES.quantity,
+        NO: view.position.NO.quantity
+      });
       
       // Set default price to mid-price or current market price
-      const defaultPrice = orderBookResponse.data.mid_price || marketResponse.data.current_yes_price;
+      const defaultPrice = view.order_books.YES.mid_price || view.market.current_yes_price;
       setOrderForm(prev => ({
         ...prev,
         price: defaultPrice
@@ -106,6 +103,15 @@ const MarketDetail = () => {
     return (parseFloat(price) * 100).toFixed(1);
   };
 
+  // SVG polyline of [time, price] points, prices 0-1 scaled to the box height
+  const historyLine = (points, width, height) => {
+    const first = points[0][0];
+    const span = points[points.length - 1][0] - first || 1;
+    return points
+      .map(([time, price]) => `${((time - first) / span) * width},${(1 - price) * height}`)
+      .join(' ');
+  };
+
   const getStatusColor = (status) => {
     switch (status) {
       case 'ACTIVE':
@@ -224,6 +230,28 @@ const MarketDetail = () => {
         </div>
       </div>
 
+      {/* Price History */}
+      {history.length > 1 && (
+        <div className="card">
+          <div className="card-header">
+            <h3 className="card-title">Price History - {market.outcome_yes}</h3>
+            <div className="text-sm text-gray-500">
+              Since {new Date(history[0][0]).toLocaleDateString()}
+            </div>
+          </div>
+          
+          <svg viewBox="0 0 600 160" className="w-full h-40" preserveAspectRatio="none">
+            <polyline
+              points={historyLine(history, 600, 160)}
+              fill="none"
+              stroke="#16a34a"
+              strokeWidth="2"
+              vectorEffect="non-scaling-stroke"
+            />
+          </svg>
+        </div>
+      )}
+
       {/* Order Book */}
       {orderBook && (
         <div className="card">
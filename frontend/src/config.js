@@ -14,7 +14,9 @@ export const API_ENDPOINTS = {
   MARKETS: {
     LIST: `${API_BASE_URL}/api/markets/markets/`,
     DETAIL: (id) => `${API_BASE_URL}/api/markets/markets/${id}/`,
+    VIEW: (id) => `${API_BASE_URL}/api/markets/markets/${id}/view/`,
     ORDER_BOOK: (id) => `${API_BASE_URL}/api/markets/markets/${id}/orderbook/YES/`,
+    HISTORY: (id) => `${API_BASE_URL}/api/markets/markets/${id}/history/?points=200`,
     PLACE_ORDER: `${API_BASE_URL}/api/markets/place-order/`,
     CANCEL_ORDER: `${API_BASE_URL}/api/markets/orders/`,
   }
@@ -1,10 +1,15 @@
 from django.contrib import admin
-from .models import Market, Share, Order
+from .models import Market, MarketShard, Share, Order, Task
+from .scheduling import market_load
+from .search import search_markets
 
 
 @admin.register(Market)
 class MarketAdmin(admin.ModelAdmin):
-    list_display = ['title', 'status', 'resolution_date', 'created_by', 'created_at']
+    list_display = [
+        'title', 'status', 'resolution_date', 'created_by', 'created_at',
+        'queue_depth', 'avg_wait_ms', 'shed_orders',
+    ]
     list_filter = ['status', 'created_at', 'resolution_date']
     search_fields = ['title', 'description']
     readonly_fields = ['created_at', 'current_yes_price', 'current_no_price']
@@ -25,6 +30,32 @@ class MarketAdmin(admin.ModelAdmin):
         }),
     )
 
+    def order_load(self, obj):
+        # One cache read per row for all three load columns
+        if not hasattr(obj, '_order_load'):
+            obj._order_load = market_load([obj.id])[obj.id]
+        return obj._order_load
+
+    @admin.display(description='Queued orders')
+    def queue_depth(self, obj):
+        return self.order_load(obj)['queued']
+
+    @admin.display(description='Avg wait (ms)')
+    def avg_wait_ms(self, obj):
+        load = self.order_load(obj)
+        return round(load['wait_us'] / load['admitted'] / 1000, 2) if load['admitted'] else 0
+
+    @admin.display(description='Shed orders')
+    def shed_orders(self, obj):
+        return self.order_load(obj)['shed']
+
+    def get_search_results(self, request, queryset, search_term):
+        # The full-text index instead of icontains scans over search_fields
+        if not search_term:
+            return queryset, False
+        ranks = search_markets(search_term, self.list_max_show_all)
+        return queryset.filter(id__in=[market_id for market_id, rank in ranks]), False
+
 
 @admin.register(Share)
 class ShareAdmin(admin.ModelAdmin):
@@ -39,4 +70,18 @@ class OrderAdmin(admin.ModelAdmin):
     list_display = ['user', 'market', 'order_type', 'outcome', 'quantity', 'price', 'status', 'created_at']
     list_filter = ['order_type', 'outcome', 'status', 'created_at']
     search_fields = ['user__username', 'market__title']
-    readonly_fields = ['created_at', 'updated_at', 'filled_quantity', 'remaining_quantity']
\ No newline at end of file
+    readonly_fields = ['created_at', 'updated_at', 'filled_quantity', 'remaining_quantity']
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'run_after', 'created_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['created_at']
+
+
+@admin.register(MarketShard)
+class MarketShardAdmin(admin.ModelAdmin):
+    list_display = ['market', 'shard', 'updated_at']
+    list_filter = ['shard']
+    search_fields = ['market__title']
@@ -0,0 +1,153 @@
+"""
+Async read-only market endpoints.
+
+These return the same JSON as the DRF views in ``views.py`` but use the async
+ORM, so under ASGI a request waiting on the database does not hold a worker.
+Concurrent database work is bounded by ``ASYNC_DB_MAX_CONNECTIONS`` per event
+loop, which caps the number of connections a single worker can open.
+"""
+
+import asyncio
+import functools
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from . import fastpath, marketdata
+from .models import Market, OrderBook
+from .renderers import dumps
+
+_db_semaphores = weakref.WeakKeyDictionary()
+
+
+def _db_slots():
+    """Semaphore bounding concurrent database work on the running loop"""
+    loop = asyncio.get_running_loop()
+    semaphore = _db_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.ASYNC_DB_MAX_CONNECTIONS)
+        _db_semaphores[loop] = semaphore
+    return semaphore
+
+
+def _json_response(data, status=200):
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+def _wants_market_data(request):
+    """Content negotiation for the binary format, mirroring the sync views"""
+    return (
+        request.GET.get('format') == 'bin'
+        or marketdata.MEDIA_TYPE in request.headers.get('Accept', '')
+    )
+
+
+def _market_data_response(frame):
+    return HttpResponse(frame, content_type=marketdata.MEDIA_TYPE)
+
+
+def async_read_view(view):
+    """Allow only authenticated GET/HEAD requests and bound database access"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return _json_response(
+                {'detail': f'Method "{request.method}" not allowed.'}, status=405
+            )
+        async with _db_slots():
+            is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+            if not is_authenticated:
+                return _json_response(
+                    {'detail': 'Authentication credentials were not provided.'}, status=403
+                )
+            return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def _share_totals(market_ids):
+    return {
+        (row['market_id'], row['outcome']): row['total']
+        async for row in fastpath.share_totals_query(market_ids)
+    }
+
+
+@async_read_view
+async def market_list(request):
+    """List all markets"""
+    rows = [row async for row in Market.objects.values(*fastpath.MARKET_FIELDS)]
+    totals = await _share_totals([row['id'] for row in rows])
+    return _json_response([fastpath.market_dict(row, totals) for row in rows])
+
+
+@async_read_view
+async def market_detail(request, pk):
+    """Get a single market"""
+    row = await Market.objects.filter(pk=pk).values(*fastpath.MARKET_FIELDS).afirst()
+    if row is None:
+        return _json_response({'detail': 'Not found.'}, status=404)
+    totals = await _share_totals([pk])
+    return _json_response(fastpath.market_dict(row, totals))
+
+
+async def _depth_levels(market_id, outcome, side, levels=10):
+    return [level async for level in fastpath.price_levels(market_id, outcome, side, levels)]
+
+
+@async_read_view
+async def order_book(request, market_id, outcome):
+    """Get order book depth for a market outcome"""
+    if not await Market.objects.filter(id=market_id).aexists():
+        return _json_response({'error': 'Market not found'}, status=404)
+
+    binary = _wants_market_data(request)
+    if binary:
+        # Read before the depth, so a frame's depth is never older than its sequence
+        sequence = await OrderBook.objects.filter(
+            market_id=market_id, outcome=outcome
+        ).values_list('version', flat=True).afirst()
+    bids = await _depth_levels(market_id, outcome, 'BUY')
+    asks = await _depth_levels(market_id, outcome, 'SELL')
+    if binary:
+        return _market_data_response(
+            marketdata.encode_depth(market_id, outcome, sequence or 0, bids, asks)
+        )
+    return _json_response(fastpath.order_book_dict(outcome, bids, asks))
+
+
+@async_read_view
+async def market_ticker(request, market_id):
+    """Get top of book for both outcomes of a market"""
+    if not await Market.objects.filter(id=market_id).aexists():
+        return _json_response({'error': 'Market not found'}, status=404)
+
+    rows = [
+        row async for row in OrderBook.objects.filter(market_id=market_id).values(
+            *fastpath.ORDERBOOK_FIELDS
+        ).order_by('outcome')
+    ]
+    if _wants_market_data(request):
+        return _market_data_response(marketdata.encode_ticker(rows))
+    return _json_response([fastpath.orderbook_dict(row) for row in rows])
+
+
+@async_read_view
+async def ticker(request):
+    """Get top of book and last trade for every active market"""
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        return _json_response({'error': 'since must be an integer version'}, status=400)
+
+    rows = await cache.aget(fastpath.TICKER_CACHE_KEY)
+    if rows is None:
+        rows = [row async for row in fastpath.ticker_query()]
+        await cache.aset(fastpath.TICKER_CACHE_KEY, rows, settings.MARKET_TICKER_CACHE_TIMEOUT)
+
+    if _wants_market_data(request):
+        return _market_data_response(
+            marketdata.encode_ticker([row for row in rows if row['version'] > since])
+        )
+    return _json_response(fastpath.ticker(rows, since))
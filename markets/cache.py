@@ -0,0 +1,149 @@
+"""
+Event-driven response caching for market reads.
+
+Cached responses are keyed by a generation number per scope (``markets``,
+``market:<id>``, ``book:<id>`` for a market's order books, ``user:<id>``).
+Signals fired by order placement, fills, cancels and market changes bump the
+generations of the scopes they touch (see ``signals.py``), which orphans
+every response built from the old data without deleting anything or
+guessing TTLs.
+
+Generations are bumped by whichever process commits the write: web workers,
+``run_tasks`` and the schedulers. So they must live where every process reads
+them. That is the cache itself when it is shared (Redis, Memcached, ...).
+With a process-local cache ``CACHE_GENERATIONS_IN_DATABASE`` keeps them in
+``CacheGeneration`` rows instead, at one primary-key query per cached read.
+"""
+
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from .models import CacheGeneration
+
+GENERATION_PREFIX = 'gen:'
+RESPONSE_PREFIX = 'resp:'
+DATA_PREFIX = 'data:'
+STATS_PREFIX = 'stats:'
+
+cached_routes = set()
+
+
+def _new_generation():
+    # Start from the clock so an evicted generation never reuses old keys
+    return time.time_ns()
+
+
+def get_generations(scopes):
+    """Current generation of each scope"""
+    if settings.CACHE_GENERATIONS_IN_DATABASE:
+        # From the primary: a lagging replica would hand out an orphaned generation
+        stored = dict(
+            CacheGeneration.objects.using('default').filter(scope__in=scopes).values_list('scope', 'generation')
+        )
+        return [stored.get(scope, 0) for scope in scopes]
+    keys = [GENERATION_PREFIX + scope for scope in scopes]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _new_generation(), timeout=None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def bump_generation(scope):
+    if settings.CACHE_GENERATIONS_IN_DATABASE:
+        CacheGeneration.bump(scope, _new_generation())
+        return
+    key = GENERATION_PREFIX + scope
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_generation(), timeout=None)
+
+
+def invalidate(*scopes):
+    """Invalidate cached responses for the given scopes once the transaction commits"""
+    def bump():
+        for scope in scopes:
+            bump_generation(scope)
+    transaction.on_commit(bump)
+
+
+def _count(route, outcome):
+    key = f'{STATS_PREFIX}{route}:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def cache_stats():
+    """Hit/miss counters per cached route"""
+    keys = {
+        route: (f'{STATS_PREFIX}{route}:hits', f'{STATS_PREFIX}{route}:misses')
+        for route in sorted(cached_routes)
+    }
+    counts = cache.get_many([key for pair in keys.values() for key in pair])
+    return {
+        route: {'hits': counts.get(hits, 0), 'misses': counts.get(misses, 0)}
+        for route, (hits, misses) in keys.items()
+    }
+
+
+def cached_data(name, scopes, build):
+    """
+    ``build()``, cached until one of ``scopes`` (resolved scope names) changes.
+
+    For the parts of a response that are shared between users; None is never
+    cached.
+    """
+    generations = get_generations(scopes)
+    key = DATA_PREFIX + ':'.join([name] + [f'{scope}@{gen}' for scope, gen in zip(scopes, generations)])
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        if data is not None:
+            cache.set(key, data, settings.MARKET_CACHE_TIMEOUT)
+    return data
+
+
+def cached_response(route, scopes):
+    """
+    Cache a view's successful response data until one of its scopes changes.
+
+    ``scopes`` are format strings filled from the URL kwargs and ``user``
+    (the requesting user's id), e.g. ``['market:{pk}']`` or ``['user:{user}']``.
+    Apply it to DRF handlers (``method_decorator`` for class-based views) so
+    authentication and permissions still run on every request.
+    """
+    cached_routes.add(route)
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            resolved = [scope.format(user=request.user.id, **kwargs) for scope in scopes]
+            generations = get_generations(resolved)
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = RESPONSE_PREFIX + ':'.join(
+                [route, path] + [f'{scope}@{gen}' for scope, gen in zip(resolved, generations)]
+            )
+
+            data = cache.get(key)
+            if data is not None:
+                _count(route, 'hits')
+                return Response(data)
+
+            _count(route, 'misses')
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, settings.MARKET_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
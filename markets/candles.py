@@ -0,0 +1,149 @@
+"""
+OHLCV candles per order book at the intervals of ``Candle.INTERVAL_SECONDS``.
+
+Trades are rolled up as their price history is recorded: ``update_candles``
+summarises a batch of ``[market_id, outcome, ms, ticks, quantity]`` points per
+bucket and merges each summary into its candle with one UPDATE (``Candle.add``).
+``rebuild_candles`` recomputes a book's candles from its packed history a few
+chunks at a time with NumPy.
+"""
+
+from collections import defaultdict
+
+import numpy
+from django.db import transaction
+
+from .history import from_millis
+from .models import Candle, PriceHistoryChunk
+from .ticks import from_ticks
+
+# Same layout as history.POINT
+RECORD = numpy.dtype([('t', '<i8'), ('p', '<i4'), ('q', '<i4')])
+
+# Summary fields: (first ms, open, high, low, last ms, close, volume, trades)
+FIRST, OPEN, HIGH, LOW, LAST, CLOSE, VOLUME, TRADES = range(8)
+
+
+def bucket_millis(interval):
+    return Candle.INTERVAL_SECONDS[interval] * 1000
+
+
+def merge(summary, other):
+    """Combine the summaries of two sets of trades in the same bucket"""
+    if summary is None:
+        return other
+    first = summary if summary[FIRST] <= other[FIRST] else other
+    last = other if other[LAST] >= summary[LAST] else summary
+    return (
+        first[FIRST], first[OPEN],
+        max(summary[HIGH], other[HIGH]), min(summary[LOW], other[LOW]),
+        last[LAST], last[CLOSE],
+        summary[VOLUME] + other[VOLUME], summary[TRADES] + other[TRADES],
+    )
+
+
+def summarise(points, intervals):
+    """``{(interval, bucket ms): summary}`` of ``(ms, ticks, quantity)`` points"""
+    summaries = {}
+    for interval in intervals:
+        size = bucket_millis(interval)
+        for millis, ticks, quantity in points:
+            key = (interval, millis - millis % size)
+            summaries[key] = merge(summaries.get(key), (millis, ticks, ticks, ticks, millis, ticks, quantity, 1))
+    return summaries
+
+
+def summarise_array(records, intervals):
+    """``summarise`` over a NumPy array of ``history.POINT`` records"""
+    records = numpy.sort(records, order='t', kind='stable')
+    times, prices, quantities = records['t'], records['p'], records['q'].astype(numpy.int64)
+    summaries = {}
+    for interval in intervals:
+        buckets = times - times % bucket_millis(interval)
+        starts = numpy.flatnonzero(numpy.r_[True, buckets[1:] != buckets[:-1]])
+        ends = numpy.r_[starts[1:], len(times)] - 1
+        highs = numpy.maximum.reduceat(prices, starts)
+        lows = numpy.minimum.reduceat(prices, starts)
+        volumes = numpy.add.reduceat(quantities, starts)
+        for index, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+            summaries[interval, int(buckets[start])] = (
+                int(times[start]), int(prices[start]), int(highs[index]), int(lows[index]),
+                int(times[end]), int(prices[end]), int(volumes[index]), end - start + 1,
+            )
+    return summaries
+
+
+def candle_fields(summary):
+    return {
+        'first_trade_at': from_millis(summary[FIRST]),
+        'open': from_ticks(summary[OPEN]),
+        'high': from_ticks(summary[HIGH]),
+        'low': from_ticks(summary[LOW]),
+        'last_trade_at': from_millis(summary[LAST]),
+        'close': from_ticks(summary[CLOSE]),
+        'volume': summary[VOLUME],
+        'trades': summary[TRADES],
+    }
+
+
+def update_candles(points):
+    """Merge history points into the candles of every interval, one UPDATE per bucket"""
+    books = defaultdict(list)
+    for market_id, outcome, millis, ticks, quantity in points:
+        books[market_id, outcome].append((millis, ticks, quantity))
+
+    for (market_id, outcome), book_points in books.items():
+        summaries = summarise(book_points, Candle.INTERVAL_SECONDS)
+        for (interval, bucket), summary in sorted(summaries.items()):
+            Candle.add(market_id, outcome, interval, from_millis(bucket), candle_fields(summary))
+
+
+def rebuild_candles(market_id, outcome, intervals, batch_chunks=50):
+    """
+    Replace a book's candles at ``intervals`` with ones computed from its
+    history, decoding ``batch_chunks`` chunks at a time; returns how many.
+
+    Appends to the book's history wait on the lock of its latest chunk until
+    the rebuild commits, so no trade is counted twice or missed.
+    """
+    with transaction.atomic():
+        chunks = PriceHistoryChunk.objects.filter(market_id=market_id, outcome=outcome)
+        chunks.select_for_update().order_by('-start_at').first()
+        Candle.objects.filter(market_id=market_id, outcome=outcome, interval__in=intervals).delete()
+
+        ids = list(chunks.order_by('start_at').values_list('id', flat=True))
+        summaries = {}
+        created = 0
+        for offset in range(0, len(ids), batch_chunks):
+            datas = PriceHistoryChunk.objects.filter(
+                id__in=ids[offset:offset + batch_chunks]
+            ).values_list('data', flat=True)
+            records = numpy.frombuffer(b''.join(bytes(data) for data in datas), dtype=RECORD)
+            batch = summarise_array(records, intervals)
+            for key, summary in batch.items():
+                summaries[key] = merge(summaries.get(key), summary)
+
+            # Chunks are appended in time order, so buckets ending before this
+            # batch's earliest trade get nothing from later batches
+            if offset + batch_chunks < len(ids):
+                earliest = min(summary[FIRST] for summary in batch.values())
+                done = {
+                    key: summary for key, summary in summaries.items()
+                    if key[1] + bucket_millis(key[0]) <= earliest
+                }
+            else:
+                done = summaries
+            created += save_candles(market_id, outcome, done)
+            summaries = {key: summary for key, summary in summaries.items() if key not in done}
+    return created
+
+
+def save_candles(market_id, outcome, summaries):
+    Candle.objects.bulk_create([
+        Candle(
+            market_id=market_id, outcome=outcome, interval=interval,
+            bucket_start=from_millis(bucket), **candle_fields(summary)
+        )
+        for (interval, bucket), summary in summaries.items()
+    ], batch_size=1000)
+    return len(summaries)
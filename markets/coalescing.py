@@ -0,0 +1,136 @@
+"""
+Single-flight coalescing for hot reads.
+
+When many clients ask for the same order book or market at once, only one
+request per worker computes the response; the others wait for it and share
+the result. With ``REQUEST_COALESCING_SHARED`` the leader also takes a lock in
+the shared cache and publishes its result, so followers in other workers
+reuse it too.
+
+Flights are keyed by the generations of the scopes the response depends on
+(see ``cache.py``), so a result computed before a write is never handed to a
+request that arrives after it.
+"""
+
+import functools
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from .cache import get_generations
+
+LOCK_PREFIX = 'flight-lock:'
+RESULT_PREFIX = 'flight-result:'
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one call per key at a time and share its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+_flights = SingleFlight()
+
+
+def _shared_call(key, func):
+    """Coalesce across workers through a lock and result in the shared cache"""
+    result_key = RESULT_PREFIX + key
+    lock_key = LOCK_PREFIX + key
+    timeout = settings.REQUEST_COALESCING_LOCK_TIMEOUT
+
+    result = cache.get(result_key)
+    if result is not None:
+        return result
+
+    if not cache.add(lock_key, 1, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.005)
+            result = cache.get(result_key)
+            if result is not None:
+                return result
+            if cache.get(lock_key) is None:
+                break
+
+    try:
+        result = func()
+        if result[0] == 200:
+            cache.set(result_key, result, timeout)
+    finally:
+        cache.delete(lock_key)
+    return result
+
+
+def coalesce_requests(route, scopes):
+    """
+    Coalesce concurrent identical requests to a DRF view.
+
+    ``scopes`` are the same format strings as ``cache.cached_response`` takes.
+    The shared result is the response data and status, so every follower
+    gets its own Response to render.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not settings.REQUEST_COALESCING:
+                return view(request, *args, **kwargs)
+
+            resolved = [scope.format(user=request.user.id, **kwargs) for scope in scopes]
+            renderer = getattr(request, 'accepted_renderer', None)
+            key = ':'.join(
+                [
+                    route,
+                    hashlib.md5(request.get_full_path().encode()).hexdigest(),
+                    getattr(renderer, 'format', ''),
+                ]
+                + [f'{scope}@{gen}' for scope, gen in zip(resolved, get_generations(resolved))]
+            )
+
+            def compute():
+                response = view(request, *args, **kwargs)
+                return response.status_code, response.data
+
+            if settings.REQUEST_COALESCING_SHARED:
+                status, data = _flights.do(key, lambda: _shared_call(key, compute))
+            else:
+                status, data = _flights.do(key, compute)
+            return Response(data, status=status)
+        return wrapper
+    return decorator
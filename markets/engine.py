@@ -0,0 +1,213 @@
+"""
+Market-sharded matching engine processes.
+
+With ``MATCHING_ENGINE_SHARDS = K`` the request layer validates orders and
+hands them to one of K ``manage.py run_engine --shard N`` processes over a
+Unix socket, so orders for different markets are matched on different cores.
+A market belongs to shard ``crc32(market id) % K`` unless a ``MarketShard``
+row moves it elsewhere (``manage.py rebalance_engines``).
+
+Each engine matches one order at a time, and engines keep no state of their
+own: the database stays the source of truth. Moving a market is fenced by
+its row lock. Matching an order locks the market row for the whole match,
+and ``rebalance_engines`` locks the rows of the markets it moves. So an
+order still in flight on the old shard commits before the move does, and
+two engines never match one market at once. Web workers may keep routing to
+the old shard for up to ``MATCHING_ENGINE_ASSIGNMENT_TTL`` seconds. The old
+shard re-reads the placement under the lock and answers 421 for a market it
+no longer owns, and the web worker reloads placements and resends the order,
+which was never created.
+
+Requests carry the user to place the order for and are pickled, so only the
+app may reach an engine: its socket sits in ``MATCHING_ENGINE_SOCKET_DIR``,
+which must be private to the app's user, and both ends authenticate with
+``MATCHING_ENGINE_AUTHKEY``.
+"""
+
+import os
+import secrets
+import threading
+import time
+import zlib
+from multiprocessing.connection import Client, Listener
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, transaction
+from rest_framework import status
+
+from .models import Market, MarketShard
+
+_assignments = {}
+_assignments_loaded_at = None
+_local = threading.local()
+
+
+def hash_shard(market_id, shards=None):
+    """Default shard of a market, stable across processes and restarts"""
+    return zlib.crc32(str(market_id).encode()) % (shards or settings.MATCHING_ENGINE_SHARDS)
+
+
+def placed_shard(market_id, shard):
+    """``shard`` from a ``MarketShard`` placement (or None), falling back to the hash"""
+    if shard is None or shard >= settings.MATCHING_ENGINE_SHARDS:
+        return hash_shard(market_id)
+    return shard
+
+
+def shard_for_market(market_id, reload=False):
+    """Shard that owns a market, honouring rebalanced placements (cached for the assignment TTL)"""
+    global _assignments, _assignments_loaded_at
+    now = time.monotonic()
+    if reload or _assignments_loaded_at is None or now - _assignments_loaded_at > settings.MATCHING_ENGINE_ASSIGNMENT_TTL:
+        _assignments = dict(MarketShard.objects.values_list('market_id', 'shard'))
+        _assignments_loaded_at = now
+    return placed_shard(market_id, _assignments.get(market_id))
+
+
+def owning_shard(market_id):
+    """Shard that owns a market right now, read from the database"""
+    return placed_shard(
+        market_id, MarketShard.objects.filter(market_id=market_id).values_list('shard', flat=True).first()
+    )
+
+
+def socket_path(shard):
+    return os.path.join(settings.MATCHING_ENGINE_SOCKET_DIR, f'matching-engine-{shard}.sock')
+
+
+def socket_dir():
+    """The socket directory, created if missing; refuses one other users can enter"""
+    path = settings.MATCHING_ENGINE_SOCKET_DIR
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise ImproperlyConfigured(
+            f'MATCHING_ENGINE_SOCKET_DIR {path} must be owned by this user with mode 0700'
+        )
+    return path
+
+
+def _authkey():
+    if settings.MATCHING_ENGINE_AUTHKEY:
+        return settings.MATCHING_ENGINE_AUTHKEY.encode()
+    if not settings.DEBUG:
+        raise ImproperlyConfigured('MATCHING_ENGINE_AUTHKEY is required when MATCHING_ENGINE_SHARDS is set')
+    # Development: a random key shared through the private socket directory
+    path = os.path.join(socket_dir(), 'authkey')
+    if not os.path.exists(path):
+        # Written aside and linked into place, so no process reads it half written
+        temporary = f'{path}.{os.getpid()}'
+        with os.fdopen(os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as file:
+            file.write(secrets.token_hex(32))
+        try:
+            os.link(temporary, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(temporary)
+    with open(path) as file:
+        return file.read().strip().encode()
+
+
+def _connection(shard):
+    """This thread's connection to a shard, opened on first use"""
+    connections = _local.__dict__.setdefault('connections', {})
+    path = socket_path(shard)
+    if path not in connections:
+        connections[path] = Client(path, family='AF_UNIX', authkey=_authkey())
+    return connections[path]
+
+
+def _drop_connection(shard):
+    connection = _local.__dict__.get('connections', {}).pop(socket_path(shard), None)
+    if connection is not None:
+        connection.close()
+
+
+def submit_order(user_id, data):
+    """Send a validated order to the engine that owns its market; returns (status code, body)"""
+    order = dict(data, market=data['market'].id)
+    request = {'user_id': user_id, 'order': order}
+    shard = shard_for_market(order['market'])
+    status_code, body = send_order(shard, request)
+    if status_code == status.HTTP_421_MISDIRECTED_REQUEST:
+        # The market moved since our placements were loaded
+        status_code, body = send_order(shard_for_market(order['market'], reload=True), request)
+    return status_code, body
+
+
+def send_order(shard, request):
+    """Send an order request to one shard; returns (status code, body)"""
+    # A cached connection may have been closed by an engine restart; only
+    # resend when the order never reached the engine
+    for attempt in range(2):
+        try:
+            connection = _connection(shard)
+            connection.send(request)
+        except OSError:
+            _drop_connection(shard)
+            continue
+        try:
+            return connection.recv()
+        except (OSError, EOFError):
+            _drop_connection(shard)
+            # The order may have committed, unlike every 503 (see idempotency.py)
+            return status.HTTP_504_GATEWAY_TIMEOUT, {
+                'error': f'Matching engine {shard} went away; check your orders before retrying'
+            }
+    return status.HTTP_503_SERVICE_UNAVAILABLE, {'error': f'Matching engine {shard} is unavailable'}
+
+
+def execute_request(request, shard):
+    """Run an order sent by ``submit_order`` in this process, if ``shard`` still owns its market"""
+    from .views import execute_order
+
+    close_old_connections()
+    order = request['order']
+    with transaction.atomic():
+        try:
+            user = User.objects.get(id=request['user_id'])
+            # The lock fences a concurrent move, see the module docstring
+            order['market'] = Market.objects.select_for_update().get(id=order['market'])
+        except (User.DoesNotExist, Market.DoesNotExist):
+            return status.HTTP_400_BAD_REQUEST, {'error': 'Unknown user or market'}
+        if owning_shard(order['market'].id) != shard:
+            return status.HTTP_421_MISDIRECTED_REQUEST, {'error': f'Market moved off shard {shard}'}
+        return execute_order(user, order)
+
+
+def serve(shard):
+    """Accept orders for one shard until the process is stopped"""
+    authkey = _authkey()
+    socket_dir()
+    path = socket_path(shard)
+    if os.path.exists(path):
+        os.unlink(path)
+    listener = Listener(path, family='AF_UNIX', authkey=authkey)
+    os.chmod(path, 0o600)
+    # Connections are read concurrently but matched one at a time
+    matching = threading.Lock()
+
+    def handle(connection):
+        with connection:
+            while True:
+                try:
+                    request = connection.recv()
+                except (OSError, EOFError):
+                    return
+                with matching:
+                    response = execute_request(request, shard)
+                connection.send(response)
+
+    try:
+        while True:
+            try:
+                connection = listener.accept()
+            except OSError:
+                # Covers failed authentication of a stray client
+                continue
+            threading.Thread(target=handle, args=(connection,), daemon=True).start()
+    finally:
+        listener.close()
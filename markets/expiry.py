@@ -0,0 +1,244 @@
+"""
+Bulk teardown of resting orders.
+
+Orders are cancelled a batch at a time instead of one by one: a single UPDATE
+flips the orders, one UPDATE each hands reserved funds back to accounts and
+reserved shares back to positions, and the ledger rows are inserted together.
+
+Two background jobs use it. ``manage.py expire_orders`` finds due GTD orders
+through the partial ``order_open_expiry_idx`` index, and ``manage.py
+close_markets`` finds active markets past their resolution date through
+``market_active_resolution_idx``, closes them and tears down their books.
+Both only read the rows they are about to change.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Market, Order, OrderBook, PriceLevel, Share, next_book_version
+from .signals import markets_closed, orders_cancelled
+from .stats import refresh_depth
+from .ticks import from_micros, notional, to_ticks
+from accounts.models import Account, Transaction
+
+EXPIRY_BATCH_SIZE = 500
+CLOSE_BATCH_SIZE = 200
+
+RESERVATION_FIELDS = (
+    'id', 'user_id', 'market_id', 'outcome', 'order_type', 'price', 'quantity', 'filled_quantity',
+    'status',
+)
+
+
+def cancel_orders(order_ids, reason, refresh_books=True):
+    """
+    Cancel the open orders among ``order_ids`` and release their reservations.
+
+    Buy orders refund ``remaining * price`` to the account, sell orders return
+    the remaining shares without touching the position's average price.
+    Untriggered buy stops hold no reservation and are only cancelled.
+    ``reason`` prefixes the refund descriptions ("Expired", ...). Pass
+    ``refresh_books=False`` when the caller resets the order books and their
+    price levels itself.
+    Runs inside the caller's transaction and returns the number of orders
+    cancelled.
+    """
+    # Lock in the same order as matching (markets, then accounts, then the
+    # orders), so a sweep and an order in flight never wait on each other
+    candidates = Order.objects.filter(id__in=order_ids, status__in=Order.CANCELLABLE_STATUSES).order_by()
+    list(
+        Market.objects.select_for_update()
+        .filter(id__in=candidates.values('market_id')).order_by('id').values_list('id', flat=True)
+    )
+    list(
+        Account.objects.select_for_update()
+        .filter(user_id__in=candidates.filter(order_type='BUY').values('user_id'))
+        .order_by('id').values_list('id', flat=True)
+    )
+    orders = list(
+        Order.objects.select_for_update()
+        .filter(id__in=order_ids, status__in=Order.CANCELLABLE_STATUSES)
+        .order_by()
+        .values(*RESERVATION_FIELDS)
+    )
+    if not orders:
+        return 0
+
+    now = timezone.now()
+    Order.objects.filter(id__in=[order['id'] for order in orders]).update(
+        status='CANCELLED', updated_at=now
+    )
+
+    refunded_orders = [
+        order for order in orders if order['order_type'] == 'BUY' and order['status'] != 'WAITING'
+    ]
+    refunds = defaultdict(int)
+    returned_shares = defaultdict(int)
+    for order in refunded_orders:
+        refunds[order['user_id']] += notional(
+            order['quantity'] - order['filled_quantity'], to_ticks(order['price'])
+        )
+    for order in orders:
+        if order['order_type'] == 'SELL':
+            returned_shares[order['user_id'], order['market_id'], order['outcome']] += (
+                order['quantity'] - order['filled_quantity']
+            )
+
+    if refunds:
+        release_funds(refunds, now)
+        accounts = dict(
+            Account.objects.filter(user_id__in=refunds).values_list('user_id', 'id')
+        )
+        Transaction.objects.bulk_create([
+            Transaction(
+                account_id=accounts[order['user_id']],
+                transaction_type=Transaction.Type.REFUND,
+                amount=from_micros(notional(
+                    order['quantity'] - order['filled_quantity'], to_ticks(order['price'])
+                )),
+                market_id=order['market_id'],
+                order_id=order['id'],
+                outcome=order['outcome'],
+                quantity=order['quantity'] - order['filled_quantity'],
+                price=order['price'],
+                description=reason,
+            )
+            for order in refunded_orders
+        ])
+    if returned_shares:
+        release_shares(returned_shares, now)
+
+    if refresh_books:
+        release_price_levels([order for order in orders if order['status'] != 'WAITING'])
+        for market_id, outcome in {(order['market_id'], order['outcome']) for order in orders}:
+            orderbook, created = OrderBook.objects.get_or_create(market_id=market_id, outcome=outcome)
+            orderbook.update_book()
+        refresh_depth({order['market_id'] for order in orders})
+
+    orders_cancelled.send(sender=Order, orders=orders, reason=reason)
+    return len(orders)
+
+
+def release_funds(refunds, now):
+    """Add ``{user_id: micro-units}`` to account balances in one UPDATE"""
+    Account.objects.filter(user_id__in=refunds).update(
+        balance=F('balance') + Case(
+            *[
+                When(user_id=user_id, then=Value(from_micros(amount)))
+                for user_id, amount in refunds.items()
+            ],
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+        updated_at=now,
+    )
+
+
+def release_shares(returned_shares, now):
+    """Add ``{(user_id, market_id, outcome): quantity}`` to positions in one UPDATE"""
+    share_ids = {
+        (user_id, market_id, outcome): share_id
+        for share_id, user_id, market_id, outcome in Share.objects.filter(
+            user_id__in={key[0] for key in returned_shares},
+            market_id__in={key[1] for key in returned_shares},
+        ).values_list('id', 'user_id', 'market_id', 'outcome')
+    }
+    quantities = {
+        share_ids[key]: quantity for key, quantity in returned_shares.items() if key in share_ids
+    }
+    Share.objects.filter(id__in=quantities).update(
+        quantity=F('quantity') + Case(
+            *[When(id=share_id, then=Value(quantity)) for share_id, quantity in quantities.items()],
+            output_field=IntegerField(),
+        ),
+        updated_at=now,
+    )
+
+
+def release_price_levels(orders):
+    """Take cancelled orders off their price levels in one UPDATE, dropping emptied levels"""
+    changes = defaultdict(lambda: [0, 0])
+    for order in orders:
+        change = changes[order['market_id'], order['outcome'], order['order_type'], order['price']]
+        change[0] += order['quantity'] - order['filled_quantity']
+        change[1] += 1
+    if not changes:
+        return
+
+    level_ids = {
+        (market_id, outcome, side, price): level_id
+        for level_id, market_id, outcome, side, price in PriceLevel.objects.filter(
+            market_id__in={key[0] for key in changes},
+            price__in={key[3] for key in changes},
+        ).values_list('id', 'market_id', 'outcome', 'side', 'price')
+    }
+    changes = {level_ids[key]: change for key, change in changes.items() if key in level_ids}
+    levels = PriceLevel.objects.filter(id__in=changes)
+    levels.update(
+        total_quantity=F('total_quantity') - Case(
+            *[When(id=level_id, then=Value(quantity)) for level_id, (quantity, count) in changes.items()],
+            output_field=IntegerField(),
+        ),
+        order_count=F('order_count') - Case(
+            *[When(id=level_id, then=Value(count)) for level_id, (quantity, count) in changes.items()],
+            output_field=IntegerField(),
+        ),
+    )
+    levels.filter(order_count=0).delete()
+
+
+def expire_orders(batch_size=EXPIRY_BATCH_SIZE, now=None):
+    """Cancel every GTD order due by ``now``, one transaction per batch"""
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        with transaction.atomic():
+            due = list(
+                Order.objects.filter(status__in=Order.CANCELLABLE_STATUSES, expires_at__lte=now)
+                .order_by('expires_at')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not due:
+                return expired
+            expired += cancel_orders(due, 'Expired')
+
+
+def close_markets(batch_size=CLOSE_BATCH_SIZE, now=None):
+    """
+    Close every active market whose resolution date has passed.
+
+    Each batch of markets is flipped to CLOSED, all of their resting orders
+    are cancelled with their reservations refunded, and their order books
+    and resting depth are emptied, in one transaction. Returns the number of
+    markets closed.
+    """
+    now = now or timezone.now()
+    closed = 0
+    while True:
+        with transaction.atomic():
+            due = list(
+                Market.objects.select_for_update()
+                .filter(status='ACTIVE', resolution_date__lte=now)
+                .order_by('resolution_date')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not due:
+                return closed
+
+            Market.objects.filter(id__in=due).update(status='CLOSED')
+            cancel_orders(
+                Order.objects.filter(market_id__in=due, status__in=Order.CANCELLABLE_STATUSES).values('id'),
+                'Market closed',
+                refresh_books=False,
+            )
+            PriceLevel.objects.filter(market_id__in=due).delete()
+            refresh_depth(due)
+            OrderBook.objects.filter(market_id__in=due).update(
+                best_bid=None, best_ask=None, bid_volume=0, ask_volume=0,
+                version=Greatest(F('version') + 1, next_book_version()), updated_at=now,
+            )
+            markets_closed.send(sender=Market, market_ids=due)
+            closed += len(due)
@@ -0,0 +1,316 @@
+"""
+Fast-path representations for hot read endpoints.
+
+These build exactly the dicts the DRF serializers would produce, but straight
+from ``values()`` rows, skipping model instantiation and per-field serializer
+machinery. Both the sync views and the async read API use them.
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, F, FloatField, Sum, When, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import Market, Share, Order, OrderBook, PriceLevel, Trade, yes_price_from_shares, no_price_from_yes
+
+MARKET_FIELDS = (
+    'id', 'title', 'description', 'outcome_yes', 'outcome_no', 'status',
+    'resolution_date', 'created_by__username', 'created_at',
+    'resolved_outcome', 'resolved_at',
+    'stats__volume_24h', 'stats__open_interest', 'stats__traders', 'stats__resting_depth',
+)
+
+ORDER_FIELDS = (
+    'id', 'market_id', 'market__title', 'order_type', 'order_class', 'outcome',
+    'quantity', 'price', 'stop_price', 'filled_quantity', 'status', 'time_in_force', 'expires_at',
+    'created_at', 'updated_at', 'filled_at',
+)
+
+ORDERBOOK_FIELDS = (
+    'id', 'market_id', 'outcome', 'best_bid', 'best_ask',
+    'bid_volume', 'ask_volume', 'updated_at', 'version',
+    'last_price', 'last_quantity', 'last_trade_at',
+)
+
+TRADE_FIELDS = ('id', 'outcome', 'price', 'quantity', 'created_at')
+
+PRICE_QUANTUM = Decimal('0.0001')
+
+TICKER_CACHE_KEY = 'markets:ticker'
+
+
+def format_datetime(value):
+    """Same output as ``serializers.DateTimeField``"""
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def format_price(value):
+    """Same output as ``serializers.DecimalField(max_digits=6, decimal_places=4)``"""
+    if value is None:
+        return None
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return '{:f}'.format(value.quantize(PRICE_QUANTUM))
+
+
+def format_float(value):
+    """Same output as a ``ReadOnlyField`` holding a Decimal once rendered"""
+    return float(value) if value is not None else None
+
+
+def market_dict(row, totals):
+    """``MarketSerializer`` representation of a values() row"""
+    yes_price = yes_price_from_shares(
+        totals.get((row['id'], 'YES')) or 0,
+        totals.get((row['id'], 'NO')) or 0,
+    )
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'description': row['description'],
+        'outcome_yes': row['outcome_yes'],
+        'outcome_no': row['outcome_no'],
+        'status': row['status'],
+        'resolution_date': format_datetime(row['resolution_date']),
+        'current_yes_price': yes_price,
+        'current_no_price': no_price_from_yes(yes_price),
+        'created_by_username': row['created_by__username'],
+        'created_at': format_datetime(row['created_at']),
+        'resolved_outcome': row['resolved_outcome'],
+        'resolved_at': format_datetime(row['resolved_at']),
+        'volume_24h': row['stats__volume_24h'],
+        'open_interest': row['stats__open_interest'],
+        'traders': row['stats__traders'],
+        'resting_depth': row['stats__resting_depth'],
+    }
+
+
+def order_dict(row):
+    """``OrderSerializer`` representation of a values() row"""
+    return {
+        'id': row['id'],
+        'market': row['market_id'],
+        'market_title': row['market__title'],
+        'order_type': row['order_type'],
+        'order_class': row['order_class'],
+        'outcome': row['outcome'],
+        'quantity': row['quantity'],
+        'price': format_price(row['price']),
+        'stop_price': format_price(row['stop_price']),
+        'filled_quantity': row['filled_quantity'],
+        'remaining_quantity': row['quantity'] - row['filled_quantity'],
+        'status': row['status'],
+        'time_in_force': row['time_in_force'],
+        'expires_at': format_datetime(row['expires_at']),
+        'is_market_order': row['order_class'] == 'MARKET',
+        'is_limit_order': row['order_class'] == 'LIMIT',
+        'created_at': format_datetime(row['created_at']),
+        'updated_at': format_datetime(row['updated_at']),
+        'filled_at': format_datetime(row['filled_at']),
+    }
+
+
+def orderbook_dict(row):
+    """Top of book, volumes, spread and mid price of an order book values() row"""
+    book = OrderBook(best_bid=row['best_bid'], best_ask=row['best_ask'])
+    return {
+        'id': row['id'],
+        'market': row['market_id'],
+        'outcome': row['outcome'],
+        'best_bid': format_price(row['best_bid']),
+        'best_ask': format_price(row['best_ask']),
+        'bid_volume': row['bid_volume'],
+        'ask_volume': row['ask_volume'],
+        'spread': format_float(book.spread),
+        'mid_price': format_float(book.mid_price),
+        'updated_at': format_datetime(row['updated_at']),
+    }
+
+
+def ticker_dict(row):
+    """Market-wide ticker entry for an order book values() row"""
+    return {
+        'market': row['market_id'],
+        'outcome': row['outcome'],
+        'best_bid': format_price(row['best_bid']),
+        'best_ask': format_price(row['best_ask']),
+        'bid_volume': row['bid_volume'],
+        'ask_volume': row['ask_volume'],
+        'last_price': format_price(row['last_price']),
+        'last_quantity': row['last_quantity'],
+        'last_trade_at': format_datetime(row['last_trade_at']),
+        'version': row['version'],
+    }
+
+
+def trade_dict(row):
+    """Recent trade of a market, at the taker's outcome and price"""
+    return {
+        'id': row['id'],
+        'outcome': row['outcome'],
+        'price': format_price(row['price']),
+        'quantity': row['quantity'],
+        'created_at': format_datetime(row['created_at']),
+    }
+
+
+def price_levels(market_id, outcome, side, levels=10):
+    """Best ``levels`` (price, quantity) levels on one side of a book"""
+    return PriceLevel.objects.filter(
+        market_id=market_id, outcome=outcome, side=side
+    ).order_by('-price' if side == 'BUY' else 'price').values_list(
+        'price', 'total_quantity'
+    )[:levels]
+
+
+def depth_list(levels):
+    return [{'price': float(price), 'quantity': quantity} for price, quantity in levels]
+
+
+def order_book_dict(outcome, bids, asks):
+    """``OrderBookDepthSerializer`` representation of aggregated depth"""
+    book = OrderBook(
+        best_bid=bids[0][0] if bids else None,
+        best_ask=asks[0][0] if asks else None,
+    )
+    return {
+        'outcome': outcome,
+        'bids': depth_list(bids),
+        'asks': depth_list(asks),
+        'spread': format_price(book.spread),
+        'mid_price': format_price(book.mid_price),
+    }
+
+
+def share_totals_query(market_ids):
+    """Outstanding share totals per (market, outcome)"""
+    return Share.objects.filter(market_id__in=market_ids).values(
+        'market_id', 'outcome'
+    ).annotate(total=Sum('quantity')).order_by()
+
+
+def share_totals(market_ids):
+    return {
+        (row['market_id'], row['outcome']): row['total']
+        for row in share_totals_query(market_ids)
+    }
+
+
+def market_list(queryset=None):
+    """All markets, in two queries regardless of how many there are"""
+    if queryset is None:
+        queryset = Market.objects.all()
+    rows = list(queryset.values(*MARKET_FIELDS))
+    totals = share_totals([row['id'] for row in rows])
+    return [market_dict(row, totals) for row in rows]
+
+
+def market_detail(pk):
+    """A single market, or None if it doesn't exist"""
+    row = Market.objects.filter(pk=pk).values(*MARKET_FIELDS).first()
+    if row is None:
+        return None
+    return market_dict(row, share_totals([pk]))
+
+
+def order_list(queryset):
+    return [order_dict(row) for row in queryset.values(*ORDER_FIELDS)]
+
+
+def depth_levels(market_id, outcome, levels=10):
+    """Best bid and ask levels for a market outcome"""
+    bids = list(price_levels(market_id, outcome, 'BUY', levels))
+    asks = list(price_levels(market_id, outcome, 'SELL', levels))
+    return bids, asks
+
+
+def order_book(market_id, outcome, levels=10):
+    return order_book_dict(outcome, *depth_levels(market_id, outcome, levels))
+
+
+def book_depth(market_id, levels=10):
+    """``{outcome: (bids, asks)}`` of both outcomes of a market, in one query"""
+    # A float, as SQLite can't order a window by a decimal (cast) expression
+    best_first = Case(When(side='BUY', then=-F('price')), default=F('price'), output_field=FloatField())
+    rows = PriceLevel.objects.filter(market_id=market_id).annotate(
+        position=Window(RowNumber(), partition_by=[F('outcome'), F('side')], order_by=best_first.asc()),
+    ).filter(position__lte=levels).values_list('outcome', 'side', 'position', 'price', 'total_quantity')
+
+    depth = {outcome: ([], []) for outcome, name in Share.OUTCOME_CHOICES}
+    for outcome, side, position, price, quantity in sorted(rows):
+        depth[outcome][side == 'SELL'].append((price, quantity))
+    return depth
+
+
+def market_overview(market_id, levels=10, trades=20):
+    """
+    The parts of a market's page shared by every user: the market, depth of
+    both outcomes and its latest trades, in four queries. None if the market
+    doesn't exist.
+    """
+    market = market_detail(market_id)
+    if market is None:
+        return None
+    depth = book_depth(market_id, levels)
+    return {
+        'market': market,
+        'order_books': {outcome: order_book_dict(outcome, *depth[outcome]) for outcome in depth},
+        'recent_trades': [
+            trade_dict(row) for row in Trade.objects.filter(
+                market_id=market_id
+            ).values(*TRADE_FIELDS).order_by('-created_at', '-id')[:trades]
+        ],
+    }
+
+
+def user_position(user, market_id):
+    """A user's shares of each outcome of a market and their open orders there, in two queries"""
+    position = {outcome: {'quantity': 0, 'average_price': None} for outcome, name in Share.OUTCOME_CHOICES}
+    for outcome, quantity, average_price in Share.objects.filter(
+        user=user, market_id=market_id
+    ).values_list('outcome', 'quantity', 'average_price'):
+        position[outcome] = {'quantity': quantity, 'average_price': format_price(average_price)}
+    return {
+        'position': position,
+        'open_orders': order_list(Order.objects.filter(
+            user=user, market_id=market_id, status__in=Order.CANCELLABLE_STATUSES
+        ).order_by('-created_at')),
+    }
+
+
+def ticker_query():
+    """Order books of every active market, in one query"""
+    return OrderBook.objects.filter(market__status='ACTIVE').values(
+        *ORDERBOOK_FIELDS
+    ).order_by('market_id', 'outcome')
+
+
+def ticker_rows():
+    """Ticker rows, cached until an order book or market changes"""
+    rows = cache.get(TICKER_CACHE_KEY)
+    if rows is None:
+        rows = list(ticker_query())
+        cache.set(TICKER_CACHE_KEY, rows, settings.MARKET_TICKER_CACHE_TIMEOUT)
+    return rows
+
+
+def invalidate_ticker():
+    cache.delete(TICKER_CACHE_KEY)
+
+
+def ticker(rows, since=0):
+    """Market-wide ticker: the latest version plus books changed after ``since``"""
+    return {
+        'version': max((row['version'] for row in rows), default=0),
+        'books': [ticker_dict(row) for row in rows if row['version'] > since],
+    }
@@ -0,0 +1,205 @@
+"""
+Append-only price/volume history per order book, and downsampling for charts.
+
+Every trade adds a ``(time in ms, price in ticks, quantity)`` point to its
+order book's history (both books for complementary matches). Points are
+packed into ``PriceHistoryChunk`` rows of up to ``CHUNK_POINTS`` 16 byte
+records, appended by a queued task after the trade commits. Each chunk also
+keeps open/high/low/close and volume.
+
+``series`` serves any time range downsampled to a requested number of points
+with LTTB (largest triangle three buckets, which keeps the shape of the line)
+or min/max bucketing (which keeps every spike). A range touching at most
+``MAX_SCANNED_CHUNKS`` chunks is drawn from their packed points. A longer one
+is drawn from the OHLCV candles (see ``candles.py``) of the finest interval
+that covers it in ``MAX_SUMMARY_CANDLES``. Either way a request reads a
+bounded number of rows, however many trades the range holds.
+"""
+
+import struct
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from .models import Candle, PriceHistoryChunk
+from .ticks import complement, from_ticks, to_ticks, TICKS_PER_UNIT
+
+POINT = struct.Struct('<qii')
+CHUNK_POINTS = 1024
+MAX_SCANNED_CHUNKS = 100
+MAX_SUMMARY_CANDLES = 2500
+
+METHODS = ('lttb', 'minmax')
+
+
+def to_millis(moment):
+    return int(moment.timestamp() * 1000)
+
+
+def from_millis(millis):
+    return datetime.fromtimestamp(millis / 1000, tz=dt_timezone.utc)
+
+
+def trade_points(trades):
+    """``[market_id, outcome, ms, ticks, quantity]`` points for saved trades, JSON-safe for a task"""
+    points = []
+    for trade in trades:
+        millis, ticks = to_millis(trade.created_at), to_ticks(trade.price)
+        points.append([trade.market_id, trade.outcome, millis, ticks, trade.quantity])
+        if trade.maker_order.outcome != trade.outcome:
+            # A complementary match also prices the other outcome
+            points.append([trade.market_id, trade.maker_order.outcome, millis, complement(ticks), trade.quantity])
+    return points
+
+
+def append_points(points):
+    """Append points to the open chunk of each order book, starting new chunks when full"""
+    books = defaultdict(list)
+    for market_id, outcome, millis, ticks, quantity in points:
+        books[market_id, outcome].append((millis, ticks, quantity))
+
+    for (market_id, outcome), book_points in books.items():
+        chunk = PriceHistoryChunk.objects.select_for_update().filter(
+            market_id=market_id, outcome=outcome
+        ).order_by('-start_at').first()
+        while book_points:
+            if chunk is None or chunk.count >= CHUNK_POINTS:
+                chunk = PriceHistoryChunk(market_id=market_id, outcome=outcome, data=b'')
+            room = CHUNK_POINTS - chunk.count
+            extend_chunk(chunk, book_points[:room])
+            chunk.save()
+            book_points = book_points[room:]
+
+
+def extend_chunk(chunk, points):
+    """Add points to a chunk's packed data and summary"""
+    prices = [ticks for millis, ticks, quantity in points]
+    if not chunk.count:
+        chunk.start_at = from_millis(points[0][0])
+        chunk.open = from_ticks(prices[0])
+        chunk.high = chunk.low = from_ticks(prices[0])
+        chunk.volume = 0
+    chunk.data = bytes(chunk.data) + b''.join(POINT.pack(*point) for point in points)
+    chunk.count += len(points)
+    latest = max(millis for millis, ticks, quantity in points)
+    chunk.end_at = from_millis(latest) if chunk.end_at is None else max(chunk.end_at, from_millis(latest))
+    chunk.high = max(chunk.high, from_ticks(max(prices)))
+    chunk.low = min(chunk.low, from_ticks(min(prices)))
+    chunk.close = from_ticks(prices[-1])
+    chunk.volume += sum(quantity for millis, ticks, quantity in points)
+
+
+def decode(data):
+    return list(POINT.iter_unpack(bytes(data)))
+
+
+def series(market_id, outcome, start, end, points, method):
+    """Downsampled ``[ms, price, volume]`` points of an order book between two datetimes"""
+    chunks = PriceHistoryChunk.objects.filter(
+        market_id=market_id, outcome=outcome, end_at__gte=start, start_at__lte=end
+    ).order_by('start_at')
+    start_ms, end_ms = to_millis(start), to_millis(end)
+
+    # Counting stops one past the cap, so this stays bounded too
+    if chunks[:MAX_SCANNED_CHUNKS + 1].count() <= MAX_SCANNED_CHUNKS:
+        raw = sorted(
+            point
+            for data in chunks.values_list('data', flat=True)
+            for point in decode(data)
+            if start_ms <= point[0] <= end_ms
+        )
+    else:
+        raw = summary_points(market_id, outcome, start, end)
+
+    sampled = lttb(raw, points) if method == 'lttb' else minmax(raw, points)
+    return [[millis, ticks / TICKS_PER_UNIT, volume] for millis, ticks, volume in sampled]
+
+
+def summary_interval(start, end):
+    """Finest candle interval covering a range in at most ``MAX_SUMMARY_CANDLES`` candles"""
+    span = (end - start).total_seconds()
+    by_length = sorted(Candle.INTERVAL_SECONDS, key=Candle.INTERVAL_SECONDS.get)
+    for interval in by_length:
+        if span / Candle.INTERVAL_SECONDS[interval] <= MAX_SUMMARY_CANDLES:
+            return interval
+    return by_length[-1]
+
+
+def summary_points(market_id, outcome, start, end):
+    """
+    Two points per candle in the range, its low and high in the order the
+    price moved, at its first and last trade clipped to the range. Past
+    ``MAX_SUMMARY_CANDLES`` daily candles only the latest are read.
+    """
+    interval = summary_interval(start, end)
+    candles = Candle.objects.filter(
+        market_id=market_id, outcome=outcome, interval=interval,
+        bucket_start__gt=start - timedelta(seconds=Candle.INTERVAL_SECONDS[interval]), bucket_start__lte=end,
+        last_trade_at__gte=start, first_trade_at__lte=end,
+    ).order_by('-bucket_start').values_list(
+        'first_trade_at', 'last_trade_at', 'open', 'high', 'low', 'close', 'volume'
+    )[:MAX_SUMMARY_CANDLES]
+    start_ms, end_ms = to_millis(start), to_millis(end)
+    raw = []
+    for first_at, last_at, open_, high, low, close, volume in list(candles)[::-1]:
+        first, second = (low, high) if close >= open_ else (high, low)
+        raw.append((max(to_millis(first_at), start_ms), to_ticks(first), volume // 2))
+        raw.append((min(to_millis(last_at), end_ms), to_ticks(second), volume - volume // 2))
+    return raw
+
+
+def lttb(points, threshold):
+    """
+    Largest triangle three buckets: keep the first and last point and, from
+    each bucket in between, the point forming the largest triangle with the
+    previously kept point and the average of the next bucket. Each kept point
+    carries the volume of its bucket.
+    """
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return points
+
+    every = (count - 2) / (threshold - 2)
+    sampled = [points[0]]
+    previous = points[0]
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        following = points[end:min(int((bucket + 2) * every) + 1, count)] or [points[-1]]
+        average_t = sum(point[0] for point in following) / len(following)
+        average_price = sum(point[1] for point in following) / len(following)
+
+        best, best_area = None, -1
+        for point in points[start:end]:
+            area = abs(
+                (previous[0] - average_t) * (point[1] - previous[1])
+                - (previous[0] - point[0]) * (average_price - previous[1])
+            )
+            if area > best_area:
+                best, best_area = point, area
+        volume = sum(point[2] for point in points[start:end])
+        sampled.append((best[0], best[1], volume))
+        previous = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def minmax(points, threshold):
+    """Keep the lowest and highest price of each of ``threshold // 2`` buckets, in time order"""
+    count = len(points)
+    buckets = threshold // 2
+    if threshold >= count or buckets < 1:
+        return points
+
+    every = count / buckets
+    sampled = []
+    for bucket in range(buckets):
+        members = points[int(bucket * every):int((bucket + 1) * every)]
+        if not members:
+            continue
+        low = min(members, key=lambda point: point[1])
+        high = max(members, key=lambda point: point[1])
+        volume = sum(point[2] for point in members)
+        first, *rest = sorted({low, high})
+        sampled.append((first[0], first[1], volume))
+        sampled.extend((point[0], point[1], 0) for point in rest)
+    return sampled
@@ -0,0 +1,113 @@
+"""
+Idempotency keys for placing and cancelling orders.
+
+A client may send ``Idempotency-Key`` (up to 64 characters) with a POST. The
+first request with a key claims it for the user before it runs, and its
+response is stored with the key. Retries get that response back with
+``Idempotent-Replayed: true`` and never reach the order book. A retry while
+the first request is still running gets a 409. Reusing a key for a different
+request gets a 422. Responses that prove the request never took effect
+release the key, so the request can run again: exceptions (rolled back),
+500 (order processing rolled back) and 503 (shed, or the matching engine
+was unreachable). A 504 from a matching engine that went away mid-order is
+kept and replayed, since the order may have committed. A claim still
+unfinished after ``IDEMPOTENCY_CLAIM_TIMEOUT`` seconds belongs to a worker
+that died mid-request, and a retry of the same request takes it over. Keys
+are pruned after ``IDEMPOTENCY_KEY_RETENTION`` seconds by ``manage.py
+prune_idempotency_keys``.
+"""
+
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 64
+# Statuses of responses to requests that never took effect
+RELEASED_STATUSES = {status.HTTP_500_INTERNAL_SERVER_ERROR, status.HTTP_503_SERVICE_UNAVAILABLE}
+
+
+def request_fingerprint(request, kwargs):
+    """Hash of what the request asks for, to catch a key reused for another request"""
+    # The body stream is already consumed by parsing, so hash the parsed data
+    payload = json.dumps([request.path, kwargs, request.data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def idempotent(view):
+    """Replay the stored response of a DRF function view for a repeated ``Idempotency-Key``"""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = request_fingerprint(request, kwargs)
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=request.user, key=key, request_hash=fingerprint
+                )
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+            if record is not None and record.request_hash != fingerprint:
+                return Response(
+                    {'error': f'This {HEADER} was already used for a different request'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if record is not None and record.status_code is not None:
+                return Response(record.response, status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+            if record is None or not reclaim(record):
+                return Response(
+                    {'error': f'A request with this {HEADER} is still being processed'},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+        # Only while the claim is still ours, not a retry's that took it over
+        claim = IdempotencyKey.objects.filter(pk=record.pk, claimed_at=record.claimed_at)
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            claim.delete()
+            raise
+        if response.status_code in RELEASED_STATUSES:
+            claim.delete()
+        else:
+            claim.update(status_code=response.status_code, response=response.data)
+        return response
+    return wrapper
+
+
+def reclaim(record):
+    """Take over an abandoned claim; only one of several concurrent retries gets it"""
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.IDEMPOTENCY_CLAIM_TIMEOUT)
+    if not IdempotencyKey.objects.filter(
+        pk=record.pk, status_code__isnull=True, claimed_at__lt=cutoff
+    ).update(claimed_at=now):
+        return False
+    record.claimed_at = now
+    return True
+
+
+def prune_idempotency_keys(now=None):
+    """Delete keys older than the retention window; returns how many"""
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=settings.IDEMPOTENCY_KEY_RETENTION)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
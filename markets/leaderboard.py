@@ -0,0 +1,186 @@
+"""
+Trader leaderboard, materialized for every user at once.
+
+``compute_leaderboard`` reads positions, marks, resting orders, ledger totals
+and traded notional in a handful of bulk queries, computes everyone's P&L
+with NumPy and replaces ``LeaderboardEntry`` in one transaction, so readers
+see the previous board until the new one commits.
+
+P&L comes from the ledger and positions marked to market:
+
+- total = sell proceeds and refunds - money spent on buys + funds still
+  reserved by resting buys + positions at their mark
+- unrealized = positions (held or reserved by resting sells) at their mark
+  less their average cost
+- realized = total - unrealized
+
+A position's mark is 1 or 0 once its market resolves, otherwise the last
+trade price of its order book, or the middle of the book before any trade.
+"""
+
+from decimal import Decimal
+
+import numpy
+from django.db import transaction
+from django.db.models import Case, F, Sum, When
+from django.utils import timezone
+
+from accounts.models import Account, Transaction
+from .models import LeaderboardEntry, Market, Order, OrderBook, Share, Trade
+
+DEFAULT_MARK = 0.5
+BOUGHT = [Transaction.Type.BUY, Transaction.Type.BUY_LIMIT]
+RELEASED = [Transaction.Type.REFUND, Transaction.Type.CANCEL_BUY]
+SOLD = [Transaction.Type.SELL]
+
+# ?by= of the leaderboard endpoint: rank column
+RANKINGS = {
+    'pnl': 'pnl_rank',
+    'volume': 'volume_rank',
+    'roi': 'roi_rank',
+}
+
+
+def book_marks():
+    """``{(market_id, outcome): mark}`` for every order book and resolved market"""
+    marks = {}
+    for market_id, outcome, last_price, best_bid, best_ask in OrderBook.objects.values_list(
+        'market_id', 'outcome', 'last_price', 'best_bid', 'best_ask'
+    ):
+        quotes = [price for price in (best_bid, best_ask) if price is not None]
+        if last_price is not None:
+            marks[market_id, outcome] = float(last_price)
+        elif quotes:
+            marks[market_id, outcome] = float(sum(quotes)) / len(quotes)
+    for market_id, resolved_outcome in Market.objects.filter(status='RESOLVED').values_list('id', 'resolved_outcome'):
+        for outcome, name in Share.OUTCOME_CHOICES:
+            marks[market_id, outcome] = 1.0 if resolved_outcome in (outcome, name) else 0.0
+    return marks
+
+
+def positions():
+    """
+    ``(user ids, market ids, outcomes, quantities, average prices)`` of every
+    position, counting shares reserved by resting sells; the average price is
+    NaN for shares all reserved out of a position never recorded in ``Share``
+    """
+    held = {
+        (user_id, market_id, outcome): [quantity, float(average_price)]
+        for user_id, market_id, outcome, quantity, average_price in Share.objects.values_list(
+            'user_id', 'market_id', 'outcome', 'quantity', 'average_price'
+        )
+    }
+    for user_id, market_id, outcome, reserved in Order.objects.filter(
+        order_type='SELL', status__in=['PENDING', 'PARTIAL', 'WAITING']
+    ).values('user_id', 'market_id', 'outcome').annotate(
+        reserved=Sum(F('quantity') - F('filled_quantity'))
+    ).values_list('user_id', 'market_id', 'outcome', 'reserved').order_by():
+        # Shares are reserved out of a position, so its average cost applies
+        held.setdefault((user_id, market_id, outcome), [0, numpy.nan])[0] += reserved
+
+    rows = [(*key, quantity, price) for key, (quantity, price) in held.items() if quantity]
+    user_ids, market_ids, outcomes, quantities, prices = zip(*rows) if rows else ((), (), (), (), ())
+    return (
+        numpy.array(user_ids, dtype=numpy.int64),
+        list(market_ids),
+        list(outcomes),
+        numpy.array(quantities, dtype=float),
+        numpy.array(prices, dtype=float),
+    )
+
+
+def per_user(user_ids, owners, amounts):
+    """Sum ``amounts`` by their ``owners`` into an array aligned with sorted ``user_ids``"""
+    totals = numpy.zeros(len(user_ids))
+    owners = numpy.asarray(owners, dtype=numpy.int64)
+    if len(owners):
+        # Users without an account (none in practice) are dropped
+        index = numpy.searchsorted(user_ids, owners)
+        known = (index < len(user_ids)) & (user_ids[numpy.minimum(index, len(user_ids) - 1)] == owners)
+        numpy.add.at(totals, index[known], numpy.asarray(amounts, dtype=float)[known])
+    return totals
+
+
+def grouped(queryset, key, value):
+    """``(keys, values)`` of a per-user aggregate, ready for ``per_user``"""
+    rows = list(queryset.values(key).annotate(total=Sum(value)).values_list(key, 'total').order_by())
+    return [row[0] for row in rows], [float(row[1] or 0) for row in rows]
+
+
+def rank(values, user_ids):
+    """1-based ranks, highest value first and lower user id first on ties"""
+    order = numpy.lexsort((user_ids, -values))
+    ranks = numpy.empty(len(values), dtype=numpy.int64)
+    ranks[order] = numpy.arange(1, len(values) + 1)
+    return ranks
+
+
+def money(value):
+    return Decimal(f'{value:.2f}')
+
+
+def compute_leaderboard(now=None):
+    """Recompute and replace the leaderboard; returns how many users it ranks"""
+    now = now or timezone.now()
+    user_ids = numpy.array(sorted(Account.objects.values_list('user_id', flat=True)), dtype=numpy.int64)
+
+    # Positions at their mark and cost
+    owners, market_ids, outcomes, quantities, prices = positions()
+    marks = book_marks()
+    mark = numpy.array([marks.get(key, DEFAULT_MARK) for key in zip(market_ids, outcomes)], dtype=float)
+    # A position of unknown cost has no unrealized P&L
+    cost = numpy.where(numpy.isnan(prices), mark, prices)
+    value = per_user(user_ids, owners, quantities * mark)
+    unrealized = per_user(user_ids, owners, quantities * (mark - cost))
+
+    # Cash in and out of trading, and funds still reserved by resting buys
+    ledger = list(Transaction.objects.filter(transaction_type__in=BOUGHT + RELEASED + SOLD).values(
+        'account__user_id', 'transaction_type'
+    ).annotate(total=Sum('amount')).values_list('account__user_id', 'transaction_type', 'total').order_by())
+
+    def ledger_total(types):
+        rows = [(user_id, float(total)) for user_id, kind, total in ledger if kind in types]
+        return per_user(user_ids, [row[0] for row in rows], [row[1] for row in rows])
+
+    spent = ledger_total(BOUGHT) - ledger_total(RELEASED)
+    cash = ledger_total(SOLD) - spent
+    reserved = per_user(user_ids, *grouped(
+        Order.objects.filter(order_type='BUY', status__in=['PENDING', 'PARTIAL']), 'user_id',
+        (F('quantity') - F('filled_quantity')) * F('price'),
+    ))
+
+    # Notional traded on both sides; a complementary maker traded at 1 - price
+    volume = per_user(user_ids, *grouped(Trade.objects.all(), 'taker_order__user_id', F('quantity') * F('price')))
+    volume += per_user(user_ids, *grouped(
+        Trade.objects.all(), 'maker_order__user_id',
+        Case(
+            When(maker_order__outcome=F('outcome'), then=F('quantity') * F('price')),
+            default=F('quantity') * (1 - F('price')),
+        ),
+    ))
+
+    total = cash + reserved + value
+    realized = total - unrealized
+    # Money spent on buys that filled (reservations of resting buys excluded)
+    invested = spent - reserved
+    roi = numpy.divide(total, invested, out=numpy.zeros(len(user_ids)), where=invested > 0.005)
+
+    pnl_ranks, volume_ranks, roi_ranks = (rank(values, user_ids) for values in (total, volume, roi))
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create([
+            LeaderboardEntry(
+                user_id=user_id,
+                realized_pnl=money(realized[index]),
+                unrealized_pnl=money(unrealized[index]),
+                total_pnl=money(total[index]),
+                volume=money(volume[index]),
+                roi=round(float(roi[index]), 6),
+                pnl_rank=pnl_ranks[index],
+                volume_rank=volume_ranks[index],
+                roi_rank=roi_ranks[index],
+                computed_at=now,
+            )
+            for index, user_id in enumerate(user_ids.tolist())
+        ], batch_size=1000)
+    return len(user_ids)
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from markets.candles import rebuild_candles
+from markets.models import Candle, PriceHistoryChunk
+
+
+class Command(BaseCommand):
+    help = 'Rebuild OHLCV candles from the recorded price history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--market',
+            type=int,
+            help='Rebuild this market only (default: every market with history)',
+        )
+        parser.add_argument(
+            '--interval',
+            action='append',
+            choices=list(Candle.INTERVAL_SECONDS),
+            help='Rebuild this interval only; may be repeated (default: all)',
+        )
+        parser.add_argument(
+            '--batch-chunks',
+            type=int,
+            default=50,
+            help='History chunks decoded at a time (default: 50)',
+        )
+
+    def handle(self, *args, **options):
+        intervals = options['interval'] or list(Candle.INTERVAL_SECONDS)
+        books = PriceHistoryChunk.objects.order_by('market_id', 'outcome').values_list('market_id', 'outcome').distinct()
+        if options['market'] is not None:
+            books = books.filter(market_id=options['market'])
+
+        total = 0
+        for market_id, outcome in books:
+            created = rebuild_candles(market_id, outcome, intervals, options['batch_chunks'])
+            self.stdout.write(f'Market {market_id} {outcome}: {created} candles')
+            total += created
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} candles ({", ".join(intervals)})'))
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from markets.models import Market
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent-client throughput of the sync and async read APIs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--endpoint',
+            choices=['list', 'detail', 'orderbook', 'ticker'],
+            default='detail',
+            help='Endpoint to benchmark (default: detail)',
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=50,
+            help='Number of concurrent clients (default: 50)',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=20,
+            help='Requests per client (default: 20)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Sync worker threads, like gunicorn sync workers (default: 4)',
+        )
+        parser.add_argument(
+            '--db-latency-ms',
+            type=float,
+            default=0.0,
+            help='Simulated network latency added to every query (default: 0)',
+        )
+
+    def handle(self, *args, **options):
+        market = Market.objects.first()
+        if market is None:
+            self.stdout.write(self.style.WARNING('No markets found to benchmark'))
+            return
+
+        paths = {
+            'list': 'markets/',
+            'detail': f'markets/{market.id}/',
+            'orderbook': f'markets/{market.id}/orderbook/YES/',
+            'ticker': f'markets/{market.id}/ticker/',
+        }
+        path = paths[options['endpoint']]
+
+        user, created = User.objects.get_or_create(username='bench_reader')
+        login_client = Client()
+        login_client.force_login(user)
+        cookies = login_client.cookies
+
+        latency = options['db_latency_ms'] / 1000
+
+        def add_latency(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def install_latency(sender, connection, **kwargs):
+            connection.execute_wrappers.append(add_latency)
+
+        if latency:
+            connection_created.connect(install_latency)
+
+        total = options['clients'] * options['requests']
+        try:
+            # Allow the test client to talk to the app without a Host header check
+            with override_settings(ALLOWED_HOSTS=['*']):
+                sync_seconds = self.run_sync(f'/api/markets/{path}', cookies, total, options['workers'])
+                async_seconds = self.run_async(
+                    f'/api/markets/async/{path}', cookies, options['clients'], options['requests']
+                )
+        finally:
+            connection_created.disconnect(install_latency)
+
+        self.stdout.write(f'{total} requests to {path} from {options["clients"]} clients')
+        self.stdout.write(f'  sync  ({options["workers"]} workers): {total / sync_seconds:10.1f} req/s')
+        self.stdout.write(f'  async (event loop):  {total / async_seconds:10.1f} req/s')
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {sync_seconds / async_seconds:.2f}x'))
+
+    def run_sync(self, path, cookies, total, workers):
+        local = threading.local()
+
+        def fetch(_):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.cookies = cookies
+            response = local.client.get(path)
+            assert response.status_code == 200, response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(fetch, range(total)))
+        return time.perf_counter() - start
+
+    def run_async(self, path, cookies, clients, requests):
+        async def client_loop():
+            client = AsyncClient()
+            client.cookies = cookies
+            for _ in range(requests):
+                # ASGIHandler gives every request its own sync thread; the
+                # test client does not, so mirror it here
+                async with ThreadSensitiveContext():
+                    response = await client.get(path)
+                assert response.status_code == 200, response.status_code
+
+        async def run():
+            await asyncio.gather(*(client_loop() for _ in range(clients)))
+
+        start = time.perf_counter()
+        asyncio.run(run())
+        return time.perf_counter() - start
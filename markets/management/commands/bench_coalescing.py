@@ -0,0 +1,85 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings
+from markets.models import Market
+
+
+class Command(BaseCommand):
+    help = 'Measure database load of a burst of identical reads with and without coalescing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=50,
+            help='Concurrent clients in the burst (default: 50)',
+        )
+        parser.add_argument(
+            '--db-latency-ms',
+            type=float,
+            default=5.0,
+            help='Simulated latency added to every query (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        market = Market.objects.first()
+        if market is None:
+            self.stdout.write(self.style.WARNING('No markets found to benchmark'))
+            return
+
+        user, created = User.objects.get_or_create(username='bench_reader')
+        login_client = Client()
+        login_client.force_login(user)
+        cookies = login_client.cookies
+
+        latency = options['db_latency_ms'] / 1000
+        queries = []
+        lock = threading.Lock()
+
+        def count_query(execute, sql, params, many, context):
+            with lock:
+                queries.append(sql)
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def install_counter(sender, connection, **kwargs):
+            connection.execute_wrappers.append(count_query)
+
+        connection_created.connect(install_counter)
+        try:
+            for path in [f'/api/markets/markets/{market.id}/orderbook/YES/', f'/api/markets/markets/{market.id}/']:
+                for coalescing in (False, True):
+                    # Start every burst cold, as right after the market moved
+                    cache.clear()
+                    queries.clear()
+                    with override_settings(ALLOWED_HOSTS=['*'], REQUEST_COALESCING=coalescing):
+                        seconds = self.burst(path, cookies, options['clients'])
+                    data_queries = [sql for sql in queries if 'django_session' not in sql and 'auth_user' not in sql]
+                    self.stdout.write(
+                        f'{path:40} coalescing={"on " if coalescing else "off"}  '
+                        f'{len(data_queries):5} data queries  {seconds * 1000:8.1f} ms'
+                    )
+        finally:
+            connection_created.disconnect(install_counter)
+
+    def burst(self, path, cookies, clients):
+        barrier = threading.Barrier(clients)
+
+        def fetch(_):
+            client = Client()
+            client.cookies = cookies
+            barrier.wait()
+            response = client.get(path)
+            assert response.status_code == 200, response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            list(pool.map(fetch, range(clients)))
+        return time.perf_counter() - start
@@ -0,0 +1,127 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from multiprocessing.connection import Client
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+from django.test.utils import override_settings
+from accounts.models import Account
+from markets import engine
+from markets.expiry import cancel_orders
+from markets.models import Market
+from markets.views import execute_order
+
+
+class Command(BaseCommand):
+    help = 'Measure order throughput in-process and with 1..K matching engine shards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shards',
+            default='1,2,4',
+            help='Comma-separated shard counts to compare (default: 1,2,4)',
+        )
+        parser.add_argument(
+            '--markets',
+            type=int,
+            default=8,
+            help='Active markets to spread orders over, one client each (default: 8)',
+        )
+        parser.add_argument(
+            '--orders',
+            type=int,
+            default=200,
+            help='Orders per market (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        markets = list(Market.objects.filter(status='ACTIVE').order_by('id')[:options['markets']])
+        if not markets:
+            self.stdout.write(self.style.WARNING('No active markets found to benchmark'))
+            return
+
+        users = []
+        for i in range(len(markets)):
+            user, created = User.objects.get_or_create(username=f'bench_engine_{i}')
+            Account.objects.update_or_create(user=user, defaults={'balance': Decimal('1000000.00')})
+            users.append(user)
+
+        placed = []
+        runs = [0] + [int(shards) for shards in options['shards'].split(',')]
+        for shards in runs:
+            with tempfile.TemporaryDirectory() as socket_dir:
+                with override_settings(MATCHING_ENGINE_SHARDS=shards, MATCHING_ENGINE_SOCKET_DIR=socket_dir):
+                    engines = self.start_engines(shards, socket_dir)
+                    try:
+                        seconds, order_ids = self.run(markets, users, options['orders'])
+                    finally:
+                        for process in engines:
+                            process.terminate()
+                            process.wait()
+            placed.extend(order_ids)
+            label = f'{shards} shards' if shards else 'in-process'
+            self.stdout.write(
+                f'{label:12} {len(order_ids):6} orders in {seconds:6.2f}s  '
+                f'{len(order_ids) / seconds:8.1f} orders/s'
+            )
+
+        # Take the benchmark's resting orders off the books again
+        for start in range(0, len(placed), 500):
+            with transaction.atomic():
+                cancel_orders(placed[start:start + 500], 'Benchmark')
+
+    def start_engines(self, shards, socket_dir):
+        env = dict(os.environ, MATCHING_ENGINE_SHARDS=str(shards), MATCHING_ENGINE_SOCKET_DIR=socket_dir)
+        manage = os.path.join(settings.BASE_DIR, 'manage.py')
+        engines = [
+            subprocess.Popen(
+                [sys.executable, manage, 'run_engine', '--shard', str(shard)],
+                env=env, stdout=subprocess.DEVNULL,
+            )
+            for shard in range(shards)
+        ]
+        for shard in range(shards):
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    Client(engine.socket_path(shard), family='AF_UNIX', authkey=settings.SECRET_KEY.encode()).close()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.1)
+        return engines
+
+    def run(self, markets, users, orders):
+        def client(market_user):
+            market, user = market_user
+            close_old_connections()
+            order_ids = []
+            for i in range(orders):
+                # Resting bids well below the book, so every order does the
+                # same work: match attempt, reservation, price level and ledger
+                data = {
+                    'market': market, 'order_type': 'BUY', 'order_class': 'LIMIT',
+                    'outcome': 'YES', 'quantity': 1, 'price': Decimal('0.0100') + Decimal(i % 50) / 10000,
+                    'time_in_force': 'GTC',
+                }
+                if settings.MATCHING_ENGINE_SHARDS:
+                    status_code, body = engine.submit_order(user.id, data)
+                else:
+                    status_code, body = execute_order(user, data)
+                assert status_code == 201, body
+                order_ids.append(body['order']['id'])
+            close_old_connections()
+            return order_ids
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(markets)) as pool:
+            results = list(pool.map(client, zip(markets, users)))
+        return time.perf_counter() - start, [order_id for ids in results for order_id in ids]
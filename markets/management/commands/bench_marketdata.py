@@ -0,0 +1,72 @@
+import json
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from markets import fastpath, marketdata
+from markets.renderers import dumps
+
+
+class Command(BaseCommand):
+    help = 'Compare payload size and decode time of JSON and binary market data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--levels',
+            type=int,
+            default=10,
+            help='Depth levels per side (default: 10)',
+        )
+        parser.add_argument(
+            '--books',
+            type=int,
+            default=500,
+            help='Order books in the ticker payload (default: 500)',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=2000,
+            help='Decodes per payload (default: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        levels = options['levels']
+        bids = [(Decimal('0.5000') - Decimal(i) / 100, 100 + i) for i in range(levels)]
+        asks = [(Decimal('0.5100') + Decimal(i) / 100, 200 + i) for i in range(levels)]
+        depth_json = dumps(fastpath.order_book_dict('YES', bids, asks))
+        depth_binary = marketdata.encode_depth(1, 'YES', 1, bids, asks)
+
+        now = timezone.now()
+        books = [
+            {
+                'id': i, 'market_id': i // 2 + 1, 'outcome': ('YES', 'NO')[i % 2],
+                'best_bid': Decimal('0.4900'), 'best_ask': Decimal('0.5100'),
+                'bid_volume': 100, 'ask_volume': 120, 'updated_at': now, 'version': i,
+                'last_price': Decimal('0.5000'), 'last_quantity': 10, 'last_trade_at': now,
+            }
+            for i in range(options['books'])
+        ]
+        ticker_json = dumps([fastpath.orderbook_dict(book) for book in books])
+        ticker_binary = marketdata.encode_ticker(books)
+
+        iterations = options['iterations']
+        for name, json_payload, binary_payload, decode in [
+            (f'depth ({levels} levels)', depth_json, depth_binary, marketdata.decode_depth),
+            (f'ticker ({len(books)} books)', ticker_json, ticker_binary, marketdata.decode_ticker),
+        ]:
+            json_seconds = self.time_decode(json.loads, json_payload, iterations)
+            binary_seconds = self.time_decode(decode, binary_payload, iterations)
+            self.stdout.write(
+                f'{name:20} size {len(json_payload):7} B -> {len(binary_payload):6} B '
+                f'({len(json_payload) / len(binary_payload):.1f}x)  '
+                f'decode {json_seconds * 1e6:8.1f} us -> {binary_seconds * 1e6:7.1f} us '
+                f'({json_seconds / binary_seconds:.1f}x)'
+            )
+
+    def time_decode(self, decode, payload, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            decode(payload)
+        return (time.perf_counter() - start) / iterations
@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from markets import fastpath
+from markets.models import Market, Order
+from markets.renderers import dumps
+from markets.serializers import MarketSerializer, OrderSerializer, OrderBookDepthSerializer
+from markets.views import get_order_depth
+
+
+class Command(BaseCommand):
+    help = 'Compare CPU per response of the DRF serializers and the fast-path renderers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Responses to build per endpoint (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        market = Market.objects.first()
+        if market is None:
+            self.stdout.write(self.style.WARNING('No markets found to benchmark'))
+            return
+
+        renderer = JSONRenderer()
+        orders = Order.objects.order_by('-created_at')[:100]
+
+        def drf_order_book():
+            bids = get_order_depth(market, 'YES', 'BUY')
+            asks = get_order_depth(market, 'YES', 'SELL')
+            data = {
+                'outcome': 'YES', 'bids': bids, 'asks': asks,
+                'spread': None, 'mid_price': 0.5,
+            }
+            return renderer.render(OrderBookDepthSerializer(data).data)
+
+        cases = [
+            (
+                'market list',
+                lambda: renderer.render(MarketSerializer(Market.objects.all(), many=True).data),
+                lambda: dumps(fastpath.market_list()),
+            ),
+            (
+                'market detail',
+                lambda: renderer.render(MarketSerializer(Market.objects.get(pk=market.pk)).data),
+                lambda: dumps(fastpath.market_detail(market.pk)),
+            ),
+            (
+                'order list',
+                lambda: renderer.render(OrderSerializer(orders, many=True).data),
+                lambda: dumps(fastpath.order_list(orders)),
+            ),
+            (
+                'order book',
+                drf_order_book,
+                lambda: dumps(fastpath.order_book(market.id, 'YES')),
+            ),
+        ]
+
+        iterations = options['iterations']
+        for name, drf_path, fast_path in cases:
+            drf_cpu = self.cpu_per_call(drf_path, iterations)
+            fast_cpu = self.cpu_per_call(fast_path, iterations)
+            self.stdout.write(
+                f'{name:14} DRF {drf_cpu * 1e6:9.1f} us  fast path {fast_cpu * 1e6:9.1f} us  '
+                f'({drf_cpu / fast_cpu:.1f}x less CPU)'
+            )
+
+    def cpu_per_call(self, func, iterations):
+        func()  # warm up caches and connections
+        start = time.process_time()
+        for _ in range(iterations):
+            func()
+        return (time.process_time() - start) / iterations
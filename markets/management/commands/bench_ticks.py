@@ -0,0 +1,91 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from markets.fastpath import PRICE_QUANTUM
+from markets.ticks import (
+    affordable_quantity, from_micros, from_ticks, notional, to_micros, to_ticks, weighted_average
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare Decimal and integer tick arithmetic for the matching walk'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--levels',
+            type=int,
+            default=50,
+            help='Resting orders walked per incoming order (default: 50)',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=5000,
+            help='Incoming orders matched (default: 5000)',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        book = [
+            (Decimal(rng.randint(100, 9900)).scaleb(-4), rng.randint(1, 50))
+            for _ in range(options['levels'])
+        ]
+        balance = Decimal('500.00')
+        iterations = options['iterations']
+
+        results = {}
+        for name, walk in [('Decimal', self.walk_decimal), ('integer ticks', self.walk_ticks)]:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                result = walk(book, balance)
+            results[name] = (time.perf_counter() - start) / iterations, result
+
+        (decimal_seconds, decimal_result), (tick_seconds, tick_result) = results.values()
+        if decimal_result != tick_result:
+            self.stdout.write(self.style.WARNING(
+                f'Results differ: {decimal_result} vs {tick_result}'
+            ))
+        for name, (seconds, result) in results.items():
+            self.stdout.write(f'{name:14} {seconds * 1e6:8.1f} us per walk  (cost {result[0]}, average {result[1]})')
+        self.stdout.write(self.style.SUCCESS(
+            f'Integer ticks are {decimal_seconds / tick_seconds:.1f}x faster'
+        ))
+
+    def walk_decimal(self, book, balance):
+        """Cost, affordability and position averaging as Decimal arithmetic"""
+        total_cost = Decimal('0')
+        held, average = 0, Decimal('0')
+        for price, quantity in book:
+            fill_cost = quantity * price
+            if balance < total_cost + fill_cost:
+                quantity = int((balance - total_cost) / price)
+                if quantity <= 0:
+                    break
+                fill_cost = quantity * price
+            total_cost += fill_cost
+            if held == 0:
+                average = price
+            else:
+                average = ((held * average + quantity * price) / (held + quantity)).quantize(PRICE_QUANTUM)
+            held += quantity
+        return total_cost.quantize(Decimal('0.01')), average
+
+    def walk_ticks(self, book, balance):
+        """The same walk in ticks and micro-units, converting at the edges"""
+        balance = to_micros(balance)
+        total_cost = 0
+        held, average = 0, 0
+        for price, quantity in book:
+            price = to_ticks(price)
+            fill_cost = notional(quantity, price)
+            if total_cost + fill_cost > balance:
+                quantity = affordable_quantity(balance - total_cost, price)
+                if quantity <= 0:
+                    break
+                fill_cost = notional(quantity, price)
+            total_cost += fill_cost
+            average = price if held == 0 else weighted_average(held, average, quantity, price)
+            held += quantity
+        return from_micros(total_cost).quantize(Decimal('0.01')), from_ticks(average)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from markets.cache import cache_stats
+
+# Import the views so every cached route is registered
+import accounts.views  # noqa: F401
+import markets.views  # noqa: F401
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters for cached market reads'
+
+    def handle(self, *args, **options):
+        for route, counts in cache_stats().items():
+            total = counts['hits'] + counts['misses']
+            ratio = counts['hits'] / total if total else 0
+            self.stdout.write(
+                f'{route:20} hits {counts["hits"]:8}  misses {counts["misses"]:8}  hit rate {ratio:.1%}'
+            )
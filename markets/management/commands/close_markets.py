@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from markets.expiry import CLOSE_BATCH_SIZE, close_markets
+from markets.management.periodic import run_periodically
+
+
+class Command(BaseCommand):
+    help = 'Close active markets past their resolution date and cancel their resting orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=CLOSE_BATCH_SIZE,
+            help=f'Markets closed per transaction (default: {CLOSE_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep running, sweeping every INTERVAL seconds (default: a single sweep)',
+        )
+
+    def handle(self, *args, **options):
+        def sweep():
+            closed = close_markets(batch_size=options['batch_size'])
+            if closed or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(f'Closed {closed} markets'))
+
+        run_periodically(self, sweep, options['interval'])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from markets.leaderboard import compute_leaderboard
+from markets.management.periodic import run_periodically
+
+
+class Command(BaseCommand):
+    help = 'Recompute the trader leaderboard from positions, marks and the ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep running, recomputing every INTERVAL seconds (default: a single run)',
+        )
+
+    def handle(self, *args, **options):
+        def sweep():
+            ranked = compute_leaderboard()
+            self.stdout.write(self.style.SUCCESS(f'Ranked {ranked} traders'))
+
+        run_periodically(self, sweep, options['interval'])
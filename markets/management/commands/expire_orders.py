@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from markets.expiry import EXPIRY_BATCH_SIZE, expire_orders
+from markets.management.periodic import run_periodically
+
+
+class Command(BaseCommand):
+    help = 'Cancel GTD orders past their expires_at and release their reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=EXPIRY_BATCH_SIZE,
+            help=f'Orders cancelled per transaction (default: {EXPIRY_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep running, sweeping every INTERVAL seconds (default: a single sweep)',
+        )
+
+    def handle(self, *args, **options):
+        def sweep():
+            expired = expire_orders(batch_size=options['batch_size'])
+            if expired or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(f'Expired {expired} orders'))
+
+        run_periodically(self, sweep, options['interval'])
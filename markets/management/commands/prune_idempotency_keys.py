@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from markets.idempotency import prune_idempotency_keys
+from markets.management.periodic import run_periodically
+
+
+class Command(BaseCommand):
+    help = 'Delete idempotency keys older than IDEMPOTENCY_KEY_RETENTION'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep running, pruning every INTERVAL seconds (default: a single run)',
+        )
+
+    def handle(self, *args, **options):
+        def sweep():
+            pruned = prune_idempotency_keys()
+            if pruned or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(f'Pruned {pruned} idempotency keys'))
+
+        run_periodically(self, sweep, options['interval'])
@@ -0,0 +1,92 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from markets.engine import hash_shard
+from markets.models import Market, MarketShard, Order
+
+
+class Command(BaseCommand):
+    help = 'Spread active markets over the matching engine shards by recent order flow'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=60,
+            help='Minutes of order flow that make up a market\'s load (default: 60)',
+        )
+        parser.add_argument(
+            '--market',
+            type=int,
+            help='Move this market only (requires --shard)',
+        )
+        parser.add_argument(
+            '--shard',
+            type=int,
+            help='Target shard for --market',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Drop all placements and go back to hash placement',
+        )
+
+    def handle(self, *args, **options):
+        shards = settings.MATCHING_ENGINE_SHARDS
+        if not shards:
+            raise CommandError('MATCHING_ENGINE_SHARDS is not set, matching runs in the web process')
+
+        if options['reset']:
+            deleted, _ = MarketShard.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'Dropped {deleted} placements'))
+            return
+
+        if options['market'] is not None:
+            if options['shard'] is None or not 0 <= options['shard'] < shards:
+                raise CommandError(f'--market needs a --shard between 0 and {shards - 1}')
+            self.place({options['market']: options['shard']}, shards)
+            self.stdout.write(self.style.SUCCESS(f"Moved market {options['market']} to shard {options['shard']}"))
+            return
+
+        since = timezone.now() - timedelta(minutes=options['window'])
+        load = dict(
+            Order.objects.filter(created_at__gte=since).values_list('market_id')
+            .annotate(orders=Count('id')).order_by()
+        )
+        markets = Market.objects.filter(status='ACTIVE').values_list('id', flat=True)
+
+        # Longest processing time first: the busiest market goes to the least
+        # loaded shard; idle markets keep their hash placement
+        shard_load = Counter({shard: 0 for shard in range(shards)})
+        placement = {}
+        for market_id in sorted(markets, key=lambda market_id: -load.get(market_id, 0)):
+            if not load.get(market_id):
+                break
+            shard = min(shard_load, key=lambda shard: (shard_load[shard], shard != hash_shard(market_id, shards)))
+            shard_load[shard] += load[market_id]
+            placement[market_id] = shard
+
+        moved = self.place(placement, shards)
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} markets'))
+        for shard in range(shards):
+            self.stdout.write(f'shard {shard}: {shard_load[shard]} orders in the last {options["window"]} minutes')
+
+    def place(self, placement, shards):
+        """Store placements that differ from the hash, dropping the rest; returns markets moved"""
+        moved = {
+            market_id: shard for market_id, shard in placement.items()
+            if shard != hash_shard(market_id, shards)
+        }
+        with transaction.atomic():
+            # Waits for orders being matched in these markets, which lock the same rows
+            list(Market.objects.select_for_update().filter(id__in=placement).values_list('id', flat=True))
+            MarketShard.objects.filter(market_id__in=placement).delete()
+            MarketShard.objects.bulk_create([
+                MarketShard(market_id=market_id, shard=shard) for market_id, shard in moved.items()
+            ])
+        return len(moved)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from markets.search import create_index, drop_index, INDEX_SQL
+
+
+class Command(BaseCommand):
+    help = 'Recreate and refill the full-text market search index'
+
+    def handle(self, *args, **options):
+        if connection.vendor not in INDEX_SQL:
+            self.stdout.write(f'No full-text index on {connection.vendor}, search uses icontains')
+            return
+        with transaction.atomic():
+            drop_index(connection)
+            create_index(connection)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the market search index ({connection.vendor})'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from markets.management.periodic import run_periodically
+from markets.models import Market
+from markets.stats import rebuild_market_stats, roll_window
+
+
+class Command(BaseCommand):
+    help = 'Take volume buckets older than 24 hours out of the market statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep running, rolling every INTERVAL seconds (default: a single run)',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recompute every market\'s statistics from scratch instead',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            market_ids = list(Market.objects.values_list('id', flat=True))
+            rebuild_market_stats(market_ids)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics of {len(market_ids)} markets'))
+            return
+
+        def sweep():
+            rolled = roll_window()
+            if rolled or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(f'Rolled {rolled} volume buckets out of the 24h window'))
+
+        run_periodically(self, sweep, options['interval'])
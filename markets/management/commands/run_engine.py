@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from markets import engine
+
+
+class Command(BaseCommand):
+    help = 'Run one matching engine shard (see MATCHING_ENGINE_SHARDS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shard',
+            type=int,
+            required=True,
+            help='Shard number, from 0 to MATCHING_ENGINE_SHARDS - 1',
+        )
+
+    def handle(self, *args, **options):
+        shard = options['shard']
+        if not 0 <= shard < settings.MATCHING_ENGINE_SHARDS:
+            raise CommandError(
+                f'Shard must be between 0 and {settings.MATCHING_ENGINE_SHARDS - 1} '
+                f'(MATCHING_ENGINE_SHARDS={settings.MATCHING_ENGINE_SHARDS})'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Matching engine shard {shard} listening on {engine.socket_path(shard)}'))
+        engine.serve(shard)
@@ -0,0 +1,65 @@
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from markets.management.periodic import MAX_BACKOFF
+from markets.tasks import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run queued post-trade tasks (ledger rows, order book snapshots) on a thread pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.TASK_QUEUE_WORKERS,
+            help=f'Worker threads (default: {settings.TASK_QUEUE_WORKERS})',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.TASK_QUEUE_BATCH_SIZE,
+            help=f'Tasks claimed at a time (default: {settings.TASK_QUEUE_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=0.2,
+            help='Seconds to wait when the queue is empty (default: 0.2)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue and exit instead of running forever',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if connection.vendor == 'sqlite':
+            # SQLite takes one writer at a time; more threads only hit "database is locked"
+            workers = 1
+        failures = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                try:
+                    ran, failed = run_pending(executor, options['batch_size'])
+                except Exception:
+                    if options['once']:
+                        raise
+                    # Claiming lost its connection or a lock; keep the worker alive
+                    failures += 1
+                    self.stderr.write(traceback.format_exc())
+                    close_old_connections()
+                    time.sleep(min(options['poll_interval'] * 2 ** failures, MAX_BACKOFF))
+                    continue
+                failures = 0
+                if ran:
+                    self.stdout.write(self.style.SUCCESS(f'Ran {ran} tasks ({failed} failed)'))
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
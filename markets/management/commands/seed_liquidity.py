@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from django.db import transaction
 from decimal import Decimal
 from markets.models import Market, Order, Share, OrderBook
+from markets.stats import rebuild_market_stats
 from accounts.models import Account
 
 
@@ -85,6 +86,9 @@ class Command(BaseCommand):
                         )
                         orderbook.update_book()
                     
+                    # Seeded shares are new open interest
+                    rebuild_market_stats([market.id])
+                    
                     seeded_count += 1
                     self.stdout.write(f'  ✓ Seeded {market.title}')
                     
@@ -128,6 +132,9 @@ class Command(BaseCommand):
             status='PENDING'
         )
         
+        buy_order.adjust_price_level(shares_per_side, 1)
+        sell_order.adjust_price_level(shares_per_side, 1)
+        
         # Reserve funds for the buy order
         total_cost = shares_per_side * bid_price
         account.deduct_funds(total_cost)
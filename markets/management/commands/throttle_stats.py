@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from markets.throttling import shed_counts
+
+
+class Command(BaseCommand):
+    help = 'Show how many order requests each rate limit rejected, per account tier'
+
+    def handle(self, *args, **options):
+        for (scope, tier), shed in shed_counts().items():
+            self.stdout.write(f'{scope:8} {tier:14} shed {shed:8}')
@@ -0,0 +1,39 @@
+"""
+Sweep loop shared by the scheduler commands that ``start.sh`` runs in the
+background, where nothing restarts a command that exits.
+"""
+
+import time
+import traceback
+
+from django.db import close_old_connections
+
+# Longest wait between retries of a failing sweep, in seconds
+MAX_BACKOFF = 60
+
+
+def run_periodically(command, sweep, interval):
+    """
+    Call ``sweep()`` every ``interval`` seconds until the process is stopped,
+    or once if ``interval`` is 0.
+
+    A failed sweep (a dropped connection, a deadlock victim, ...) is written
+    to stderr, the broken connection is dropped so the next sweep opens a new
+    one, and the sweep is retried after a backoff that doubles up to
+    ``MAX_BACKOFF``.
+    """
+    if not interval:
+        sweep()
+        return
+    failures = 0
+    while True:
+        try:
+            sweep()
+        except Exception:
+            failures += 1
+            command.stderr.write(traceback.format_exc())
+            close_old_connections()
+            time.sleep(min(interval * 2 ** failures, MAX_BACKOFF))
+        else:
+            failures = 0
+            time.sleep(interval)
@@ -0,0 +1,138 @@
+"""
+Compact binary market-data frames for order book depth and tickers.
+
+Served instead of JSON when a client sends ``Accept: application/vnd.predix.marketdata``
+(or ``?format=bin``). All integers are little-endian; prices are integer
+ticks of 1/10000 and ``-1`` marks a missing price. Every frame starts with::
+
+    magic   2s  b'PM'
+    version u8  FORMAT_VERSION
+    kind    u8  KIND_DEPTH or KIND_TICKER
+
+A depth frame continues with::
+
+    sequence u64, market u32, outcome u8, 3 pad bytes,
+    spread i32, mid_price i32, bid_count u16, ask_count u16,
+    bid_count + ask_count levels of (price u32, quantity u32)
+
+A ticker frame continues with ``count u32`` followed by ``count`` books of::
+
+    version u64, market u32, outcome u8, 3 pad bytes,
+    best_bid i32, best_ask i32, bid_volume u32, ask_volume u32,
+    last_price i32, last_quantity u32
+
+The ``decode_*`` functions only need the standard library, so bots can copy
+this module as a reference decoder.
+"""
+
+import struct
+
+from . import ticks
+
+MEDIA_TYPE = 'application/vnd.predix.marketdata'
+FORMAT_VERSION = 2
+
+KIND_DEPTH = 1
+KIND_TICKER = 2
+
+NO_PRICE = -1
+
+OUTCOME_CODES = {'YES': 0, 'NO': 1}
+OUTCOME_NAMES = {code: name for name, code in OUTCOME_CODES.items()}
+UNKNOWN_OUTCOME = 255
+
+HEADER = struct.Struct('<2sBB')
+DEPTH = struct.Struct('<QIBxxxiiHH')
+LEVEL = struct.Struct('<II')
+TICKER_COUNT = struct.Struct('<I')
+TICKER_BOOK = struct.Struct('<QIBxxxiiIIiI')
+
+MAGIC = b'PM'
+
+
+def to_ticks(price):
+    """Price to integer ticks (see ``ticks.py``), ``NO_PRICE`` for none"""
+    if price is None:
+        return NO_PRICE
+    return ticks.to_ticks(price)
+
+
+def encode_depth(market_id, outcome, sequence, bids, asks):
+    """Encode (price, quantity) bid/ask levels as a depth frame"""
+    from .models import OrderBook
+
+    book = OrderBook(
+        best_bid=bids[0][0] if bids else None,
+        best_ask=asks[0][0] if asks else None,
+    )
+    parts = [
+        HEADER.pack(MAGIC, FORMAT_VERSION, KIND_DEPTH),
+        DEPTH.pack(
+            sequence, market_id, OUTCOME_CODES.get(outcome, UNKNOWN_OUTCOME),
+            to_ticks(book.spread), to_ticks(book.mid_price), len(bids), len(asks),
+        ),
+    ]
+    parts.extend(LEVEL.pack(to_ticks(price), quantity) for price, quantity in bids)
+    parts.extend(LEVEL.pack(to_ticks(price), quantity) for price, quantity in asks)
+    return b''.join(parts)
+
+
+def encode_ticker(books):
+    """Encode order book rows (dicts with ``fastpath.ORDERBOOK_FIELDS``) as a ticker frame"""
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, KIND_TICKER), TICKER_COUNT.pack(len(books))]
+    parts.extend(
+        TICKER_BOOK.pack(
+            book['version'], book['market_id'],
+            OUTCOME_CODES.get(book['outcome'], UNKNOWN_OUTCOME),
+            to_ticks(book['best_bid']), to_ticks(book['best_ask']),
+            book['bid_volume'], book['ask_volume'],
+            to_ticks(book['last_price']), book['last_quantity'],
+        )
+        for book in books
+    )
+    return b''.join(parts)
+
+
+def _check_header(data, kind):
+    magic, version, frame_kind = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION or frame_kind != kind:
+        raise ValueError('Not a version %d market-data frame of kind %d' % (FORMAT_VERSION, kind))
+    return HEADER.size
+
+
+def decode_depth(data):
+    """
+    Decode a depth frame.
+
+    Prices stay in integer ticks (divide by ``TICKS_PER_UNIT``); ``bids`` and
+    ``asks`` are lists of ``(price, quantity)`` tuples, best level first.
+    """
+    offset = _check_header(data, KIND_DEPTH)
+    sequence, market, outcome, spread, mid_price, bid_count, ask_count = DEPTH.unpack_from(data, offset)
+    offset += DEPTH.size
+    levels = list(LEVEL.iter_unpack(data[offset:offset + LEVEL.size * (bid_count + ask_count)]))
+    return {
+        'sequence': sequence,
+        'market': market,
+        'outcome': OUTCOME_NAMES.get(outcome),
+        'spread': None if spread == NO_PRICE else spread,
+        'mid_price': None if mid_price == NO_PRICE else mid_price,
+        'bids': levels[:bid_count],
+        'asks': levels[bid_count:],
+    }
+
+
+def decode_ticker(data):
+    """
+    Decode a ticker frame into a list of
+    ``(version, market, outcome, best_bid, best_ask, bid_volume, ask_volume,
+    last_price, last_quantity)`` tuples with prices in ticks and ``-1`` for a
+    missing price.
+    """
+    offset = _check_header(data, KIND_TICKER)
+    count, = TICKER_COUNT.unpack_from(data, offset)
+    offset += TICKER_COUNT.size
+    return [
+        (book[0], book[1], OUTCOME_NAMES.get(book[2])) + book[3:]
+        for book in TICKER_BOOK.iter_unpack(data[offset:offset + TICKER_BOOK.size * count])
+    ]
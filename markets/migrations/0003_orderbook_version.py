@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0002_alter_order_options_order_filled_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderbook',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0003_orderbook_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderbook',
+            name='last_price',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderbook',
+            name='last_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='orderbook',
+            name='last_trade_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0004_orderbook_last_trade'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='time_in_force',
+            field=models.CharField(choices=[('GTC', 'Good Till Cancelled'), ('GTD', 'Good Till Date'), ('IOC', 'Immediate Or Cancel'), ('FOK', 'Fill Or Kill')], default='GTC', max_length=3),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('expires_at__isnull', False), ('status__in', ['PENDING', 'PARTIAL'])), fields=['expires_at'], name='order_open_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0005_order_time_in_force'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='market',
+            index=models.Index(condition=models.Q(('status', 'ACTIVE')), fields=['resolution_date'], name='market_active_resolution_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0006_market_resolution_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_open_expiry_idx',
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='stop_price',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=6, null=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_class',
+            field=models.CharField(choices=[('MARKET', 'Market Order'), ('LIMIT', 'Limit Order'), ('STOP', 'Stop Order'), ('STOP_LIMIT', 'Stop-Limit Order')], default='LIMIT', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('FILLED', 'Filled'), ('CANCELLED', 'Cancelled'), ('PARTIAL', 'Partially Filled'), ('WAITING', 'Awaiting Trigger')], default='PENDING', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('expires_at__isnull', False), ('status__in', ['PENDING', 'PARTIAL', 'WAITING'])), fields=['expires_at'], name='order_open_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'WAITING')), fields=['market', 'outcome', 'order_type', 'stop_price'], name='order_waiting_stop_idx'),
+        ),
+    ]
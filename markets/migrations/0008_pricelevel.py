@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:12
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+import django.db.models.deletion
+
+
+def build_price_levels(apps, schema_editor):
+    """Aggregate the orders already resting on the books into levels"""
+    Order = apps.get_model('markets', 'Order')
+    PriceLevel = apps.get_model('markets', 'PriceLevel')
+    levels = Order.objects.filter(
+        status__in=['PENDING', 'PARTIAL'], price__isnull=False
+    ).values('market_id', 'outcome', 'order_type', 'price').annotate(
+        total_quantity=Sum(F('quantity') - F('filled_quantity')),
+        order_count=Count('id'),
+    ).order_by()
+    PriceLevel.objects.bulk_create([
+        PriceLevel(
+            market_id=level['market_id'], outcome=level['outcome'], side=level['order_type'],
+            price=level['price'], total_quantity=level['total_quantity'],
+            order_count=level['order_count'],
+        )
+        for level in levels
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0007_order_stop_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('outcome', models.CharField(choices=[('YES', 'Yes'), ('NO', 'No')], max_length=3)),
+                ('side', models.CharField(choices=[('BUY', 'Buy'), ('SELL', 'Sell')], max_length=4)),
+                ('price', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('total_quantity', models.PositiveIntegerField(default=0)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('market', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_levels', to='markets.market')),
+            ],
+            options={
+                'unique_together': {('market', 'outcome', 'side', 'price')},
+            },
+        ),
+        migrations.RunPython(build_price_levels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0009_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('outcome', models.CharField(choices=[('YES', 'Yes'), ('NO', 'No')], max_length=3)),
+                ('price', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('quantity', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('maker_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='maker_trades', to='markets.order')),
+                ('market', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trades', to='markets.market')),
+                ('taker_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='taker_trades', to='markets.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['market', 'created_at'], name='trade_market_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0010_trade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketShard',
+            fields=[
+                ('market', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='engine_shard', serialize=False, to='markets.market')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
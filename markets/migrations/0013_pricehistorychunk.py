@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0012_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistoryChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('outcome', models.CharField(choices=[('YES', 'Yes'), ('NO', 'No')], max_length=3)),
+                ('start_at', models.DateTimeField()),
+                ('end_at', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('open', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('high', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('low', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('close', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('volume', models.PositiveBigIntegerField(default=0)),
+                ('data', models.BinaryField()),
+                ('market', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history_chunks', to='markets.market')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['market', 'outcome', 'start_at'], name='history_book_time_idx')],
+            },
+        ),
+    ]
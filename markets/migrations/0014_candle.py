@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0013_pricehistorychunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Candle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('outcome', models.CharField(choices=[('YES', 'Yes'), ('NO', 'No')], max_length=3)),
+                ('interval', models.CharField(choices=[('1m', '1m'), ('5m', '5m'), ('1h', '1h'), ('1d', '1d')], max_length=3)),
+                ('bucket_start', models.DateTimeField()),
+                ('open', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('high', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('low', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('close', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('volume', models.PositiveBigIntegerField(default=0)),
+                ('trades', models.PositiveIntegerField(default=0)),
+                ('first_trade_at', models.DateTimeField()),
+                ('last_trade_at', models.DateTimeField()),
+                ('market', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candles', to='markets.market')),
+            ],
+            options={
+                'unique_together': {('market', 'outcome', 'interval', 'bucket_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:35
+
+from django.conf import settings
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def build_market_stats(apps, schema_editor):
+    """Statistics of the existing markets, from their trades, orders, shares and price levels"""
+    Market = apps.get_model('markets', 'Market')
+    MarketStats = apps.get_model('markets', 'MarketStats')
+    MarketTrader = apps.get_model('markets', 'MarketTrader')
+    MarketVolume = apps.get_model('markets', 'MarketVolume')
+    Order = apps.get_model('markets', 'Order')
+    PriceLevel = apps.get_model('markets', 'PriceLevel')
+    Share = apps.get_model('markets', 'Share')
+    Trade = apps.get_model('markets', 'Trade')
+
+    def totals(queryset, value):
+        return dict(queryset.values('market_id').annotate(total=Sum(value)).values_list('market_id', 'total').order_by())
+
+    cutoff = timezone.now() - timedelta(hours=25)
+    buckets = defaultdict(lambda: [0, 0])
+    for market_id, created_at, quantity in Trade.objects.filter(
+        created_at__gt=cutoff
+    ).values_list('market_id', 'created_at', 'quantity'):
+        start = created_at.replace(minute=0, second=0, microsecond=0)
+        if start > cutoff:
+            buckets[market_id, start][0] += quantity
+            buckets[market_id, start][1] += 1
+    MarketVolume.objects.bulk_create([
+        MarketVolume(market_id=market_id, bucket_start=start, volume=volume, trades=count)
+        for (market_id, start), (volume, count) in buckets.items()
+    ], batch_size=1000)
+
+    traders = list(Order.objects.filter(filled_quantity__gt=0).values_list('market_id', 'user_id').distinct().order_by())
+    MarketTrader.objects.bulk_create([
+        MarketTrader(market_id=market_id, user_id=user_id) for market_id, user_id in traders
+    ], batch_size=1000)
+
+    held = totals(Share.objects.all(), 'quantity')
+    reserved = totals(
+        Order.objects.filter(order_type='SELL', status__in=['PENDING', 'PARTIAL', 'WAITING']),
+        F('quantity') - F('filled_quantity'),
+    )
+    volume = totals(Trade.objects.all(), 'quantity')
+    depth = totals(PriceLevel.objects.all(), 'total_quantity')
+    trader_counts = defaultdict(int)
+    for market_id, user_id in traders:
+        trader_counts[market_id] += 1
+    MarketStats.objects.bulk_create([
+        MarketStats(
+            market_id=market_id,
+            open_interest=((held.get(market_id) or 0) + (reserved.get(market_id) or 0)) // 2,
+            volume_24h=sum(v for (m, start), (v, c) in buckets.items() if m == market_id),
+            trades_24h=sum(c for (m, start), (v, c) in buckets.items() if m == market_id),
+            volume_total=volume.get(market_id) or 0,
+            traders=trader_counts[market_id],
+            resting_depth=depth.get(market_id) or 0,
+        )
+        for market_id in Market.objects.values_list('id', flat=True)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('markets', '0014_candle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketStats',
+            fields=[
+                ('market', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='markets.market')),
+                ('open_interest', models.BigIntegerField(default=0)),
+                ('volume_24h', models.PositiveBigIntegerField(default=0)),
+                ('trades_24h', models.PositiveIntegerField(default=0)),
+                ('volume_total', models.PositiveBigIntegerField(default=0)),
+                ('traders', models.PositiveIntegerField(default=0)),
+                ('resting_depth', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['volume_24h'], name='stats_volume_24h_idx'), models.Index(fields=['open_interest'], name='stats_open_interest_idx'), models.Index(fields=['traders'], name='stats_traders_idx'), models.Index(fields=['resting_depth'], name='stats_resting_depth_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MarketVolume',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField(db_index=True)),
+                ('volume', models.PositiveBigIntegerField(default=0)),
+                ('trades', models.PositiveIntegerField(default=0)),
+                ('market', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='volume_buckets', to='markets.market')),
+            ],
+            options={
+                'unique_together': {('market', 'bucket_start')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MarketTrader',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('market', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='market_traders', to='markets.market')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='traded_markets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('market', 'user')},
+            },
+        ),
+        migrations.RunPython(build_market_stats, migrations.RunPython.noop),
+    ]
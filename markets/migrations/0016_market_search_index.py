@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:52
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from markets.search import create_index
+    create_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from markets.search import drop_index
+    drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0015_marketstats'),
+    ]
+
+    operations = [
+        # Database-specific (tsvector + GIN on PostgreSQL, FTS5 on SQLite), see markets/search.py
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
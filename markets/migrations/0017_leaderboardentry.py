@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('markets', '0016_market_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='leaderboard_entry', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('realized_pnl', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('unrealized_pnl', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('total_pnl', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('volume', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('roi', models.FloatField()),
+                ('pnl_rank', models.PositiveIntegerField(db_index=True)),
+                ('volume_rank', models.PositiveIntegerField(db_index=True)),
+                ('roi_rank', models.PositiveIntegerField(db_index=True)),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0017_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeneration',
+            fields=[
+                ('scope', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('generation', models.BigIntegerField()),
+            ],
+        ),
+    ]
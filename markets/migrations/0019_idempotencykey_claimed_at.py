@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:09
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markets', '0018_cachegeneration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='claimed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,6 +1,14 @@
-from django.db import models
+import threading
+import time
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.db.models.functions import Greatest, Least
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 from accounts.models import Account
+from .ticks import from_ticks, to_ticks, weighted_average
 
 
 class Market(models.Model):
@@ -24,9 +32,25 @@ class Market(models.Model):
     resolved_outcome = models.CharField(max_length=100, blank=True, null=True)
     resolved_at = models.DateTimeField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Only active markets, so the close job's scan stays small
+            models.Index(
+                fields=['resolution_date'],
+                name='market_active_resolution_idx',
+                condition=Q(status='ACTIVE'),
+            ),
+        ]
+
     def __str__(self):
         return self.title
 
+    @property
+    def is_open_for_trading(self):
+        from django.utils import timezone
+
+        return self.status == 'ACTIVE' and self.resolution_date > timezone.now()
+
     @property
     def current_yes_price(self):
         """Calculate current YES price based on outstanding shares"""
@@ -37,16 +61,26 @@ class Market(models.Model):
             total=models.Sum('quantity')
         )['total'] or 0
         
-        total_shares = yes_shares + no_shares
-        if total_shares == 0:
-            return 0.50  # Default 50/50 if no trades
-        
-        return round(yes_shares / total_shares, 4)
+        return yes_price_from_shares(yes_shares, no_shares)
 
     @property
     def current_no_price(self):
         """Calculate current NO price based on outstanding shares"""
-        return round(1 - self.current_yes_price, 4)
+        return no_price_from_yes(self.current_yes_price)
+
+
+def yes_price_from_shares(yes_shares, no_shares):
+    """YES price implied by outstanding YES/NO share totals"""
+    total_shares = yes_shares + no_shares
+    if total_shares == 0:
+        return 0.50  # Default 50/50 if no trades
+
+    return round(yes_shares / total_shares, 4)
+
+
+def no_price_from_yes(yes_price):
+    """NO price as the complement of the YES price"""
+    return round(1 - yes_price, 4)
 
 
 class Share(models.Model):
@@ -72,23 +106,30 @@ class Share(models.Model):
 
     def add_shares(self, quantity, price):
         """Add shares at a specific price"""
+        self.add_shares_at_ticks(quantity, to_ticks(price))
+
+    def add_shares_at_ticks(self, quantity, price_ticks):
+        """Add shares at a price in ticks (see ``ticks.py``)"""
         if self.quantity == 0:
-            self.average_price = price
+            self.average_price = from_ticks(price_ticks)
         else:
             # Calculate weighted average
-            total_cost = (self.quantity * self.average_price) + (quantity * price)
-            self.average_price = total_cost / (self.quantity + quantity)
+            self.average_price = from_ticks(weighted_average(
+                self.quantity, to_ticks(self.average_price), quantity, price_ticks
+            ))
         
         self.quantity += quantity
         self.save()
 
     def remove_shares(self, quantity):
-        """Remove shares (for selling)"""
-        if self.quantity >= quantity:
-            self.quantity -= quantity
-            self.save()
-            return True
-        return False
+        """Remove shares (for selling), unless the position holds fewer"""
+        # Relative and guarded like Account.deduct_funds, so a stale instance
+        # can't write back a quantity another fill or reservation has changed
+        removed = Share.objects.filter(pk=self.pk, quantity__gte=quantity).update(
+            quantity=F('quantity') - quantity, updated_at=timezone.now()
+        )
+        self.refresh_from_db(fields=['quantity', 'updated_at'])
+        return bool(removed)
 
 
 class Order(models.Model):
@@ -101,6 +142,8 @@ class Order(models.Model):
     ORDER_CLASSES = [
         ('MARKET', 'Market Order'),
         ('LIMIT', 'Limit Order'),
+        ('STOP', 'Stop Order'),
+        ('STOP_LIMIT', 'Stop-Limit Order'),
     ]
 
     ORDER_STATUS = [
@@ -108,23 +151,54 @@ class Order(models.Model):
         ('FILLED', 'Filled'),
         ('CANCELLED', 'Cancelled'),
         ('PARTIAL', 'Partially Filled'),
+        ('WAITING', 'Awaiting Trigger'),
     ]
 
+    TIME_IN_FORCE = [
+        ('GTC', 'Good Till Cancelled'),
+        ('GTD', 'Good Till Date'),
+        ('IOC', 'Immediate Or Cancel'),
+        ('FOK', 'Fill Or Kill'),
+    ]
+
+    # Orders that rest on the book and can still be filled or cancelled
+    OPEN_STATUSES = ['PENDING', 'PARTIAL']
+
+    # Open orders plus stop orders that have not been triggered yet
+    CANCELLABLE_STATUSES = OPEN_STATUSES + ['WAITING']
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     market = models.ForeignKey(Market, on_delete=models.CASCADE, related_name='orders')
     order_type = models.CharField(max_length=4, choices=ORDER_TYPES)
-    order_class = models.CharField(max_length=6, choices=ORDER_CLASSES, default='LIMIT')
+    order_class = models.CharField(max_length=10, choices=ORDER_CLASSES, default='LIMIT')
     outcome = models.CharField(max_length=3, choices=Share.OUTCOME_CHOICES)
     quantity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=6, decimal_places=4, null=True, blank=True)  # None for market orders
+    stop_price = models.DecimalField(max_digits=6, decimal_places=4, null=True, blank=True)  # Stop orders only
     filled_quantity = models.PositiveIntegerField(default=0)
     status = models.CharField(max_length=10, choices=ORDER_STATUS, default='PENDING')
+    time_in_force = models.CharField(max_length=3, choices=TIME_IN_FORCE, default='GTC')
+    expires_at = models.DateTimeField(null=True, blank=True)  # GTD orders only
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     filled_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Only open GTD orders, so the expiry scheduler's scan stays small
+            models.Index(
+                fields=['expires_at'],
+                name='order_open_expiry_idx',
+                condition=Q(status__in=['PENDING', 'PARTIAL', 'WAITING'], expires_at__isnull=False),
+            ),
+            # Stop orders waiting for their trigger, ordered by stop price per book side
+            models.Index(
+                fields=['market', 'outcome', 'order_type', 'stop_price'],
+                name='order_waiting_stop_idx',
+                condition=Q(status='WAITING'),
+            ),
+        ]
 
     def __str__(self):
         price_str = f"@ {self.price}" if self.price else "Market"
@@ -142,6 +216,23 @@ class Order(models.Model):
     def is_limit_order(self):
         return self.order_class == 'LIMIT'
 
+    @property
+    def is_stop_order(self):
+        return self.order_class in ['STOP', 'STOP_LIMIT']
+
+    @property
+    def rests_on_book(self):
+        """Whether an unfilled remainder stays on the book after matching"""
+        return self.order_class in ['LIMIT', 'STOP_LIMIT'] and self.time_in_force in ['GTC', 'GTD']
+
+    def stop_triggered(self, last_price):
+        """Sell stops trigger at or below their stop price, buy stops at or above it"""
+        if last_price is None:
+            return False
+        if self.order_type == 'SELL':
+            return last_price <= self.stop_price
+        return last_price >= self.stop_price
+
     def fill_order(self, quantity, fill_price=None):
         """Fill part or all of the order"""
         from django.utils import timezone
@@ -157,15 +248,235 @@ class Order(models.Model):
             return True
         return False
 
+    def adjust_price_level(self, quantity, orders=0):
+        """Add resting quantity and orders at this order's price level (negative to remove)"""
+        PriceLevel.adjust(self.market_id, self.outcome, self.order_type, self.price, quantity, orders)
+
     def cancel_order(self):
         """Cancel the order"""
-        if self.status in ['PENDING', 'PARTIAL']:
+        if self.status in self.CANCELLABLE_STATUSES:
             self.status = 'CANCELLED'
             self.save()
             return True
         return False
 
 
+class Trade(models.Model):
+    """A fill between an incoming (taker) order and a resting (maker) order"""
+    market = models.ForeignKey(Market, on_delete=models.CASCADE, related_name='trades')
+    taker_order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='taker_trades')
+    maker_order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='maker_trades')
+    # The taker's outcome and price; a complementary maker traded the other
+    # outcome at 1 - price
+    outcome = models.CharField(max_length=3, choices=Share.OUTCOME_CHOICES)
+    price = models.DecimalField(max_digits=6, decimal_places=4)
+    quantity = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['market', 'created_at'], name='trade_market_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.market_id} {self.outcome}: {self.quantity} @ {self.price}"
+
+
+class PriceHistoryChunk(models.Model):
+    """Consecutive trades of an order book, packed by ``markets.history``"""
+    market = models.ForeignKey(Market, on_delete=models.CASCADE, related_name='history_chunks')
+    outcome = models.CharField(max_length=3, choices=Share.OUTCOME_CHOICES)
+    start_at = models.DateTimeField()
+    end_at = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    # Summary of the chunk, for ranges too long to decode point by point
+    open = models.DecimalField(max_digits=6, decimal_places=4)
+    high = models.DecimalField(max_digits=6, decimal_places=4)
+    low = models.DecimalField(max_digits=6, decimal_places=4)
+    close = models.DecimalField(max_digits=6, decimal_places=4)
+    volume = models.PositiveBigIntegerField(default=0)
+    # (ms since epoch, price in ticks, quantity) records, see history.POINT
+    data = models.BinaryField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['market', 'outcome', 'start_at'], name='history_book_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.market_id} {self.outcome}: {self.count} trades from {self.start_at}"
+
+
+class Candle(models.Model):
+    """
+    Open/high/low/close and volume of an order book over one time bucket.
+
+    Rolled up as trades are recorded (``add``) and rebuilt from the price
+    history by ``manage.py backfill_candles``. The times of the first and last
+    trade let late or out-of-order updates keep the right open and close.
+    """
+    INTERVAL_SECONDS = {
+        '1m': 60,
+        '5m': 5 * 60,
+        '1h': 60 * 60,
+        '1d': 24 * 60 * 60,
+    }
+    INTERVAL_CHOICES = [(interval, interval) for interval in INTERVAL_SECONDS]
+
+    market = models.ForeignKey(Market, on_delete=models.CASCADE, related_name='candles')
+    outcome = models.CharField(max_length=3, choices=Share.OUTCOME_CHOICES)
+    interval = models.CharField(max_length=3, choices=INTERVAL_CHOICES)
+    bucket_start = models.DateTimeField()
+    open = models.DecimalField(max_digits=6, decimal_places=4)
+    high = models.DecimalField(max_digits=6, decimal_places=4)
+    low = models.DecimalField(max_digits=6, decimal_places=4)
+    close = models.DecimalField(max_digits=6, decimal_places=4)
+    volume = models.PositiveBigIntegerField(default=0)
+    trades = models.PositiveIntegerField(default=0)
+    first_trade_at = models.DateTimeField()
+    last_trade_at = models.DateTimeField()
+
+    class Meta:
+        # Also the index range queries scan
+        unique_together = ['market', 'outcome', 'interval', 'bucket_start']
+
+    def __str__(self):
+        return f"{self.market_id} {self.outcome} {self.interval} {self.bucket_start}: {self.open}-{self.close}"
+
+    @classmethod
+    def add(cls, market_id, outcome, interval, bucket_start, summary):
+        """
+        Merge trades into a bucket, creating it for its first trades.
+
+        ``summary`` has ``first_trade_at``, ``open``, ``high``, ``low``,
+        ``last_trade_at``, ``close``, ``volume`` and ``trades`` of the new
+        trades, prices as Decimals.
+        """
+        candle = cls.objects.filter(
+            market_id=market_id, outcome=outcome, interval=interval, bucket_start=bucket_start
+        )
+        price = DecimalField(max_digits=6, decimal_places=4)
+        changes = {
+            'open': Case(
+                When(first_trade_at__gt=summary['first_trade_at'], then=Value(summary['open'], output_field=price)),
+                default=F('open'),
+            ),
+            'close': Case(
+                When(last_trade_at__lte=summary['last_trade_at'], then=Value(summary['close'], output_field=price)),
+                default=F('close'),
+            ),
+            'high': Greatest(F('high'), Value(summary['high'], output_field=price)),
+            'low': Least(F('low'), Value(summary['low'], output_field=price)),
+            'first_trade_at': Least(F('first_trade_at'), Value(summary['first_trade_at'])),
+            'last_trade_at': Greatest(F('last_trade_at'), Value(summary['last_trade_at'])),
+            'volume': F('volume') + summary['volume'],
+            'trades': F('trades') + summary['trades'],
+        }
+        if candle.update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    market_id=market_id, outcome=outcome, interval=interval, bucket_start=bucket_start, **summary
+                )
+        except IntegrityError:
+            # Another task opened the bucket first
+            candle.update(**changes)
+
+
+class MarketStats(models.Model):
+    """
+    Activity counters of a market, kept up to date by ``markets.stats`` so
+    the market list can sort by them with one indexed query.
+    """
+    market = models.OneToOneField(Market, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    # YES/NO pairs outstanding (held or reserved by resting sells)
+    open_interest = models.BigIntegerField(default=0)
+    # Sum of the market's volume buckets of the last 24 hours
+    volume_24h = models.PositiveBigIntegerField(default=0)
+    trades_24h = models.PositiveIntegerField(default=0)
+    volume_total = models.PositiveBigIntegerField(default=0)
+    # Users who have traded in the market (see MarketTrader)
+    traders = models.PositiveIntegerField(default=0)
+    # Shares resting on both sides of both order books
+    resting_depth = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['volume_24h'], name='stats_volume_24h_idx'),
+            models.Index(fields=['open_interest'], name='stats_open_interest_idx'),
+            models.Index(fields=['traders'], name='stats_traders_idx'),
+            models.Index(fields=['resting_depth'], name='stats_resting_depth_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.market_id}: {self.volume_24h} in 24h, {self.open_interest} open"
+
+
+class MarketVolume(models.Model):
+    """Traded shares and trades of a market in one hour, while inside the 24 hour window"""
+    market = models.ForeignKey(Market, on_delete=models.CASCADE, related_name='volume_buckets')
+    bucket_start = models.DateTimeField(db_index=True)
+    volume = models.PositiveBigIntegerField(default=0)
+    trades = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['market', 'bucket_start']
+
+    def __str__(self):
+        return f"{self.market_id} {self.bucket_start}: {self.volume}"
+
+    @classmethod
+    def add(cls, market_id, bucket_start, volume, trades):
+        """Add to a bucket, creating it for the hour's first trades"""
+        bucket = cls.objects.filter(market_id=market_id, bucket_start=bucket_start)
+        changes = {'volume': F('volume') + volume, 'trades': F('trades') + trades}
+        if bucket.update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(market_id=market_id, bucket_start=bucket_start, volume=volume, trades=trades)
+        except IntegrityError:
+            # Another task opened the bucket first
+            bucket.update(**changes)
+
+
+class MarketTrader(models.Model):
+    """A user who has traded in a market, so each is counted once"""
+    market = models.ForeignKey(Market, on_delete=models.CASCADE, related_name='market_traders')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='traded_markets')
+
+    class Meta:
+        unique_together = ['market', 'user']
+
+    def __str__(self):
+        return f"{self.market_id}: {self.user_id}"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    A user's P&L, volume and ranks, recomputed for every user at once by
+    ``manage.py compute_leaderboard``. Rank columns are indexed, so the top N
+    is an index range scan and a user's rank a primary key lookup.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='leaderboard_entry')
+    realized_pnl = models.DecimalField(max_digits=14, decimal_places=2)
+    unrealized_pnl = models.DecimalField(max_digits=14, decimal_places=2)
+    total_pnl = models.DecimalField(max_digits=14, decimal_places=2)
+    # Notional traded, both sides
+    volume = models.DecimalField(max_digits=14, decimal_places=2)
+    # Total P&L over the money spent on filled buys
+    roi = models.FloatField()
+    pnl_rank = models.PositiveIntegerField(db_index=True)
+    volume_rank = models.PositiveIntegerField(db_index=True)
+    roi_rank = models.PositiveIntegerField(db_index=True)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"#{self.pnl_rank} {self.user_id}: {self.total_pnl}"
+
+
 class OrderBook(models.Model):
     """Represents the order book for a market outcome"""
     market = models.ForeignKey(Market, on_delete=models.CASCADE, related_name='orderbooks')
@@ -181,6 +492,15 @@ class OrderBook(models.Model):
     
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Last trade
+    last_price = models.DecimalField(max_digits=6, decimal_places=4, null=True, blank=True)
+    last_quantity = models.PositiveIntegerField(default=0)
+    last_trade_at = models.DateTimeField(null=True, blank=True)
+
+    # Time-ordered sequence number, bumped with every change to the book's
+    # price levels (in the same transaction) and every snapshot refresh
+    version = models.BigIntegerField(default=0)
+
     class Meta:
         unique_together = ['market', 'outcome']
 
@@ -188,40 +508,47 @@ class OrderBook(models.Model):
         return f"{self.market.title} - {self.outcome}: {self.best_bid}/{self.best_ask}"
 
     def update_book(self):
-        """Update the order book with current best bid/ask"""
+        """
+        Update the order book with current best bid/ask.
+
+        Runs in the task worker after the match commits, so it only writes the
+        snapshot columns: the last trade fields belong to matching, and the
+        version only ever moves forward.
+        """
+        levels = PriceLevel.objects.filter(market_id=self.market_id, outcome=self.outcome)
+
         # Get best bid (highest buy price)
-        best_bid_order = Order.objects.filter(
-            market=self.market,
-            outcome=self.outcome,
-            order_type='BUY',
-            status__in=['PENDING', 'PARTIAL'],
-            price__isnull=False
-        ).order_by('-price').first()
-        
-        if best_bid_order:
-            self.best_bid = best_bid_order.price
-            self.bid_volume = best_bid_order.remaining_quantity
-        else:
-            self.best_bid = None
-            self.bid_volume = 0
+        best_bid_level = levels.filter(side='BUY').order_by('-price').values_list(
+            'price', 'total_quantity'
+        ).first()
+        self.best_bid, self.bid_volume = best_bid_level or (None, 0)
 
         # Get best ask (lowest sell price)
-        best_ask_order = Order.objects.filter(
-            market=self.market,
-            outcome=self.outcome,
-            order_type='SELL',
-            status__in=['PENDING', 'PARTIAL'],
-            price__isnull=False
-        ).order_by('price').first()
-        
-        if best_ask_order:
-            self.best_ask = best_ask_order.price
-            self.ask_volume = best_ask_order.remaining_quantity
-        else:
-            self.best_ask = None
-            self.ask_volume = 0
-
-        self.save()
+        best_ask_level = levels.filter(side='SELL').order_by('price').values_list(
+            'price', 'total_quantity'
+        ).first()
+        self.best_ask, self.ask_volume = best_ask_level or (None, 0)
+
+        OrderBook.objects.filter(pk=self.pk).update(
+            best_bid=self.best_bid, best_ask=self.best_ask,
+            bid_volume=self.bid_volume, ask_volume=self.ask_volume,
+            version=Greatest(F('version') + 1, next_book_version()),
+            updated_at=timezone.now(),
+        )
+        self.refresh_from_db(fields=['version', 'updated_at'])
+
+    @classmethod
+    def bump_version(cls, market_id, outcome):
+        """Give a book a new version, so depth read after this change carries a newer sequence"""
+        book = cls.objects.filter(market_id=market_id, outcome=outcome)
+        # Strictly increasing per book even if another process's clock is behind
+        if book.update(version=Greatest(F('version') + 1, next_book_version())):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(market_id=market_id, outcome=outcome, version=next_book_version())
+        except IntegrityError:
+            book.update(version=Greatest(F('version') + 1, next_book_version()))
 
     @property
     def spread(self):
@@ -239,4 +566,148 @@ class OrderBook(models.Model):
             return self.best_bid
         elif self.best_ask:
             return self.best_ask
-        return 0.50  # Default if no orders
\ No newline at end of file
+        return 0.50  # Default if no orders
+
+
+class PriceLevel(models.Model):
+    """
+    Resting quantity and order count at one price on one side of an order book.
+
+    Kept in step with the orders in the same transaction as every rest, fill
+    and cancel, so depth is a range scan over at most N levels and top of
+    book a single row, whatever the number of resting orders.
+    """
+    market = models.ForeignKey(Market, on_delete=models.CASCADE, related_name='price_levels')
+    outcome = models.CharField(max_length=3, choices=Share.OUTCOME_CHOICES)
+    side = models.CharField(max_length=4, choices=Order.ORDER_TYPES)
+    price = models.DecimalField(max_digits=6, decimal_places=4)
+    total_quantity = models.PositiveIntegerField(default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Also the index depth reads scan, in either price direction
+        unique_together = ['market', 'outcome', 'side', 'price']
+
+    def __str__(self):
+        return f"{self.market_id} {self.outcome} {self.side} {self.price}: {self.total_quantity} ({self.order_count})"
+
+    @classmethod
+    def adjust(cls, market_id, outcome, side, price, quantity, orders=0):
+        """
+        Add ``quantity`` and ``orders`` to a level (negative to take away),
+        dropping it once empty, and bump the book's version with it
+        """
+        OrderBook.bump_version(market_id, outcome)
+        level = cls.objects.filter(market_id=market_id, outcome=outcome, side=side, price=price)
+        changes = {
+            'total_quantity': F('total_quantity') + quantity,
+            'order_count': F('order_count') + orders,
+        }
+        if level.update(**changes):
+            if orders < 0:
+                level.filter(order_count=0).delete()
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    market_id=market_id, outcome=outcome, side=side, price=price,
+                    total_quantity=quantity, order_count=orders,
+                )
+        except IntegrityError:
+            # Another order opened the level first
+            level.update(**changes)
+
+
+class MarketShard(models.Model):
+    """Matching engine shard a market was moved to, overriding its hash placement"""
+    market = models.OneToOneField(Market, on_delete=models.CASCADE, primary_key=True, related_name='engine_shard')
+    shard = models.PositiveSmallIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.market_id} -> shard {self.shard}"
+
+
+class IdempotencyKey(models.Model):
+    """Stored response of an order request sent with an Idempotency-Key"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=64)
+    request_hash = models.CharField(max_length=64)
+    # Null while the first request with the key is still running
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # When the running request took the key; an unfinished claim older than
+    # IDEMPOTENCY_CLAIM_TIMEOUT was abandoned and may be taken over
+    claimed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['user', 'key']
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key} ({self.status_code})"
+
+
+class Task(models.Model):
+    """Post-trade work queued in the trade's transaction and run by ``manage.py run_tasks``"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('FAILED', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When the task is next due; for running tasks, when their lease runs out
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Only claimable tasks, so polling an idle queue stays cheap
+            models.Index(
+                fields=['run_after'],
+                name='task_due_idx',
+                condition=Q(status__in=['PENDING', 'RUNNING']),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+_book_version_lock = threading.Lock()
+_last_book_version = 0
+
+
+def next_book_version():
+    """Strictly increasing microsecond timestamp used as an order book version"""
+    global _last_book_version
+    with _book_version_lock:
+        _last_book_version = max(time.time_ns() // 1000, _last_book_version + 1)
+        return _last_book_version
+
+
+class CacheGeneration(models.Model):
+    """Generation of a cached scope, when ``CACHE_GENERATIONS_IN_DATABASE`` keeps them here (see ``cache.py``)"""
+    scope = models.CharField(max_length=100, primary_key=True)
+    generation = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.scope}@{self.generation}"
+
+    @classmethod
+    def bump(cls, scope, first):
+        """Move a scope to its next generation, starting it at ``first``"""
+        row = cls.objects.filter(scope=scope)
+        if row.update(generation=F('generation') + 1):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(scope=scope, generation=first)
+        except IntegrityError:
+            # Another process started the scope first
+            row.update(generation=F('generation') + 1)
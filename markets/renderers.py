@@ -0,0 +1,56 @@
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import marketdata
+
+_encoder = JSONEncoder()
+
+# UTC datetimes as "Z" and non-string keys match DRF's JSONEncoder output
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(data):
+    """Encode data to the same JSON bytes as DRF's JSONRenderer, using orjson"""
+    content = orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+    # JSONRenderer escapes these two line separators for JavaScript
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer replacement backed by orjson.
+
+    Types orjson can't encode natively (Decimal, lazy strings, ...) fall back
+    to DRF's encoder, and indented output is delegated to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class MarketDataRenderer(BaseRenderer):
+    """
+    Compact binary market data (see ``markets/marketdata.py``).
+
+    Views hand this renderer pre-encoded frames; anything else, such as error
+    responses, is rendered as JSON with a JSON content type.
+    """
+    media_type = marketdata.MEDIA_TYPE
+    format = 'bin'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return dumps(data)
@@ -0,0 +1,109 @@
+"""
+Per-market admission control for order placement.
+
+New orders take one of ``ORDER_SLOTS`` slots of their worker process while
+they are matched, and a single market may hold at most ``HOT_MARKET_SHARE`` of
+them. A viral market then queues behind its own share instead of taking every
+worker thread and the database connections behind them. Orders wait up to
+``ORDER_QUEUE_TIMEOUT`` seconds for a slot and are then shed with a 503 and
+``Retry-After``. Reads and cancels never take a slot, so they always run
+ahead of queued orders.
+
+Queue depth, waits and shed orders are counted per market in the cache
+(``market_load``) and shown in the market admin.
+"""
+
+import contextlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+LOAD_PREFIX = 'load:'
+LOAD_COUNTERS = ('queued', 'admitted', 'wait_us', 'shed')
+
+
+class OrderShed(Exception):
+    """No order slot freed up within the queue timeout"""
+
+
+def _add(market_id, counter, delta=1):
+    key = f'{LOAD_PREFIX}{market_id}:{counter}'
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def market_load(market_ids):
+    """``{market_id: {'queued', 'admitted', 'wait_us', 'shed'}}`` counters from the cache"""
+    keys = {
+        (market_id, counter): f'{LOAD_PREFIX}{market_id}:{counter}'
+        for market_id in market_ids for counter in LOAD_COUNTERS
+    }
+    values = cache.get_many(keys.values())
+    return {
+        market_id: {counter: values.get(keys[market_id, counter], 0) for counter in LOAD_COUNTERS}
+        for market_id in market_ids
+    }
+
+
+class OrderScheduler:
+    """Slots for new orders, with a cap on how many one market may hold"""
+
+    def __init__(self, slots, market_share):
+        self.slots = slots
+        self.market_slots = max(1, int(slots * market_share))
+        self._condition = threading.Condition()
+        self._running = 0
+        self._by_market = Counter()
+
+    def _available(self, market_id):
+        return self._running < self.slots and self._by_market[market_id] < self.market_slots
+
+    @contextlib.contextmanager
+    def slot(self, market_id, timeout):
+        """Hold a slot for ``market_id`` for the duration of the block, or raise ``OrderShed``"""
+        start = time.monotonic()
+        _add(market_id, 'queued')
+        try:
+            with self._condition:
+                admitted = self._condition.wait_for(lambda: self._available(market_id), timeout)
+                if admitted:
+                    self._running += 1
+                    self._by_market[market_id] += 1
+        finally:
+            _add(market_id, 'queued', -1)
+
+        if not admitted:
+            _add(market_id, 'shed')
+            raise OrderShed
+        _add(market_id, 'admitted')
+        _add(market_id, 'wait_us', int((time.monotonic() - start) * 1e6))
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._by_market[market_id] -= 1
+                if not self._by_market[market_id]:
+                    del self._by_market[market_id]
+                self._condition.notify_all()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def order_slot(market_id):
+    """Wait for this process's order scheduler to admit an order for ``market_id``"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = OrderScheduler(settings.ORDER_SLOTS, settings.HOT_MARKET_SHARE)
+    return _scheduler.slot(market_id, settings.ORDER_QUEUE_TIMEOUT)
@@ -0,0 +1,163 @@
+"""
+Full-text market search.
+
+The index lives in the database and is kept in sync by the database itself,
+so every save, bulk update and delete is covered:
+
+- PostgreSQL: a stored generated ``tsvector`` column on the market table
+  (title weighted above description) with a GIN index, ranked by
+  ``ts_rank_cd``.
+- SQLite: an external-content FTS5 table with triggers on the market table,
+  ranked by ``bm25`` with the same weighting.
+
+Other databases fall back to ``icontains`` in creation order. Every query word
+matches as a prefix, so partial words find markets as the user types.
+
+Migrations that make Django's SQLite backend rebuild the market table drop
+its triggers; ``manage.py rebuild_search_index`` recreates and refills the
+index.
+"""
+
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+from .models import Market
+
+TABLE = 'markets_market'
+FTS_TABLE = 'markets_market_fts'
+# Relative weight of a title match over a description match
+TITLE_WEIGHT = 10.0
+
+POSTGRES_INDEX = [
+    f"""
+    ALTER TABLE {TABLE} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(description, '')), 'D')
+    ) STORED
+    """,
+    f"CREATE INDEX markets_market_search_idx ON {TABLE} USING GIN (search_vector)",
+]
+POSTGRES_DROP = [
+    f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_INDEX = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description, content='{TABLE}', content_rowid='id'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF title, description ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+INDEX_SQL = {'postgresql': POSTGRES_INDEX, 'sqlite': SQLITE_INDEX}
+DROP_SQL = {'postgresql': POSTGRES_DROP, 'sqlite': SQLITE_DROP}
+
+
+def create_index(connection):
+    with connection.cursor() as cursor:
+        for statement in INDEX_SQL.get(connection.vendor, []):
+            cursor.execute(statement)
+
+
+def drop_index(connection):
+    with connection.cursor() as cursor:
+        for statement in DROP_SQL.get(connection.vendor, []):
+            cursor.execute(statement)
+
+
+def query_words(text):
+    """Words of a search, stripped of any query syntax"""
+    return re.findall(r'\w+', text.lower())
+
+
+# Filter name: (column, comparison, ORM lookup)
+FILTERS = {
+    'status': ('status', '=', 'status'),
+    'created_after': ('created_at', '>=', 'created_at__gte'),
+    'created_before': ('created_at', '<', 'created_at__lt'),
+    'resolves_after': ('resolution_date', '>=', 'resolution_date__gte'),
+    'resolves_before': ('resolution_date', '<', 'resolution_date__lt'),
+}
+
+
+def filter_sql(connection, filters):
+    """``AND ...`` clauses on the market table ``m`` and their params"""
+    clauses, params = [], []
+    for name, value in filters.items():
+        if value is None:
+            continue
+        column, comparison, lookup = FILTERS[name]
+        clauses.append(f'AND m.{column} {comparison} %s')
+        if column != 'status':
+            value = connection.ops.adapt_datetimefield_value(value)
+        params.append(value)
+    return ' '.join(clauses), params
+
+
+def search_markets(text, limit, **filters):
+    """
+    ``[(market id, rank)]`` for a search, best match first (higher ranks are
+    better). ``filters`` are the keys of ``FILTERS``; None means unfiltered.
+    """
+    words = query_words(text)
+    if not words:
+        return []
+    connection = connections[Market.objects.db]
+    where, params = filter_sql(connection, filters)
+
+    if connection.vendor == 'postgresql':
+        sql = f"""
+            SELECT m.id, ts_rank_cd(m.search_vector, query) AS rank
+            FROM {TABLE} m, to_tsquery('english', %s) query
+            WHERE m.search_vector @@ query {where}
+            ORDER BY rank DESC, m.id DESC
+            LIMIT %s
+        """
+        match = ' & '.join(f'{word}:*' for word in words)
+    elif connection.vendor == 'sqlite':
+        # bm25 is lower for better matches
+        sql = f"""
+            SELECT m.id, -bm25({FTS_TABLE}, {TITLE_WEIGHT}, 1.0) AS rank
+            FROM {FTS_TABLE} JOIN {TABLE} m ON m.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s {where}
+            ORDER BY rank DESC, m.id DESC
+            LIMIT %s
+        """
+        match = ' '.join(f'"{word}"*' for word in words)
+    else:
+        markets = Market.objects.filter(
+            *[Q(title__icontains=word) | Q(description__icontains=word) for word in words],
+            **{FILTERS[name][2]: value for name, value in filters.items() if value is not None}
+        ).order_by('-created_at')
+        return [(market_id, 0.0) for market_id in markets.values_list('id', flat=True)[:limit]]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, *params, limit])
+        return cursor.fetchall()
@@ -1,18 +1,25 @@
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Market, Share, Order, OrderBook
+from .models import Market, Share, Order
+from .ticks import TICKS_PER_UNIT, from_ticks, to_ticks
 
 
 class MarketSerializer(serializers.ModelSerializer):
     current_yes_price = serializers.ReadOnlyField()
     current_no_price = serializers.ReadOnlyField()
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
+    volume_24h = serializers.IntegerField(source='stats.volume_24h', read_only=True)
+    open_interest = serializers.IntegerField(source='stats.open_interest', read_only=True)
+    traders = serializers.IntegerField(source='stats.traders', read_only=True)
+    resting_depth = serializers.IntegerField(source='stats.resting_depth', read_only=True)
     
     class Meta:
         model = Market
         fields = [
             'id', 'title', 'description', 'outcome_yes', 'outcome_no',
             'status', 'resolution_date', 'current_yes_price', 'current_no_price',
-            'created_by_username', 'created_at', 'resolved_outcome', 'resolved_at'
+            'created_by_username', 'created_at', 'resolved_outcome', 'resolved_at',
+            'volume_24h', 'open_interest', 'traders', 'resting_depth'
         ]
 
 
@@ -27,18 +34,6 @@ class ShareSerializer(serializers.ModelSerializer):
         ]
 
 
-class OrderBookSerializer(serializers.ModelSerializer):
-    spread = serializers.ReadOnlyField()
-    mid_price = serializers.ReadOnlyField()
-    
-    class Meta:
-        model = OrderBook
-        fields = [
-            'id', 'market', 'outcome', 'best_bid', 'best_ask',
-            'bid_volume', 'ask_volume', 'spread', 'mid_price', 'updated_at'
-        ]
-
-
 class OrderSerializer(serializers.ModelSerializer):
     market_title = serializers.CharField(source='market.title', read_only=True)
     remaining_quantity = serializers.ReadOnlyField()
@@ -49,17 +44,47 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = [
             'id', 'market', 'market_title', 'order_type', 'order_class',
-            'outcome', 'quantity', 'price', 'filled_quantity', 'remaining_quantity',
-            'status', 'is_market_order', 'is_limit_order', 'created_at', 'updated_at', 'filled_at'
+            'outcome', 'quantity', 'price', 'stop_price', 'filled_quantity', 'remaining_quantity',
+            'status', 'time_in_force', 'expires_at', 'is_market_order', 'is_limit_order',
+            'created_at', 'updated_at', 'filled_at'
         ]
 
 
+def validate_tick_price(price):
+    """
+    Prices are whole ticks strictly between 0 and 1: a YES/NO pair is worth 1,
+    so matching prices the other outcome at ``1 - price``
+    """
+    # The 4 decimal places of the field are already whole ticks
+    if price is not None and not 0 < to_ticks(price) < TICKS_PER_UNIT:
+        raise serializers.ValidationError(
+            f"Price must be between {from_ticks(1)} and {from_ticks(TICKS_PER_UNIT - 1)}"
+        )
+    return price
+
+
 class CreateOrderSerializer(serializers.ModelSerializer):
     order_class = serializers.ChoiceField(choices=Order.ORDER_CLASSES, default='LIMIT')
+    time_in_force = serializers.ChoiceField(choices=Order.TIME_IN_FORCE, required=False)
     
     class Meta:
         model = Order
-        fields = ['market', 'order_type', 'order_class', 'outcome', 'quantity', 'price']
+        fields = [
+            'market', 'order_type', 'order_class', 'outcome', 'quantity', 'price',
+            'stop_price', 'time_in_force', 'expires_at'
+        ]
+    
+    def validate_price(self, price):
+        return validate_tick_price(price)
+    
+    def validate_stop_price(self, stop_price):
+        return validate_tick_price(stop_price)
+    
+    def validate_market(self, market):
+        # Expired markets may not have been closed by the close job yet
+        if not market.is_open_for_trading:
+            raise serializers.ValidationError("This market is closed for trading")
+        return market
     
     def validate(self, data):
         """Validate order data"""
@@ -67,11 +92,34 @@ class CreateOrderSerializer(serializers.ModelSerializer):
         price = data.get('price')
         
         # Market orders don't need a price
-        if order_class == 'MARKET':
+        if order_class in ['MARKET', 'STOP']:
             data['price'] = None
-        elif order_class == 'LIMIT' and price is None:
+        elif order_class in ['LIMIT', 'STOP_LIMIT'] and price is None:
             raise serializers.ValidationError("Limit orders require a price")
         
+        # Stop orders wait for the last trade to reach their stop price
+        if order_class in ['STOP', 'STOP_LIMIT']:
+            if data.get('stop_price') is None:
+                raise serializers.ValidationError("Stop orders require a stop_price")
+        elif data.get('stop_price') is not None:
+            raise serializers.ValidationError("stop_price is only allowed for stop orders")
+        
+        # Market orders never rest on the book, so they are IOC unless FOK
+        market_order = order_class in ['MARKET', 'STOP']
+        time_in_force = data.get('time_in_force') or ('IOC' if market_order else 'GTC')
+        if market_order and time_in_force not in ['IOC', 'FOK']:
+            raise serializers.ValidationError("Market and stop orders must be IOC or FOK")
+        data['time_in_force'] = time_in_force
+        
+        expires_at = data.get('expires_at')
+        if time_in_force == 'GTD':
+            if expires_at is None:
+                raise serializers.ValidationError("GTD orders require expires_at")
+            if expires_at <= timezone.now():
+                raise serializers.ValidationError("expires_at must be in the future")
+        elif expires_at is not None:
+            raise serializers.ValidationError("expires_at is only allowed for GTD orders")
+        
         return data
 
 
@@ -0,0 +1,91 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import Signal, receiver
+
+from . import fastpath
+from .cache import invalidate
+from .models import Market, MarketStats, OrderBook
+from accounts.models import Transaction
+
+# Sent with ``order`` once an order has been accepted by the matching engine
+order_placed = Signal()
+
+# Sent with ``order``, ``counterparty`` (the resting order), ``quantity`` and
+# ``price`` for every fill. In a complementary YES/NO match the counterparty is
+# on the other outcome and trades at its own price, ``1 - price``
+order_filled = Signal()
+
+# Sent with ``order`` when a resting order is cancelled
+order_cancelled = Signal()
+
+# Sent with ``orders`` (values() rows with ``expiry.RESERVATION_FIELDS``) and
+# ``reason`` when a batch of resting orders is cancelled in bulk
+orders_cancelled = Signal()
+
+# Sent with ``market_ids`` when the close job closes a batch of markets
+markets_closed = Signal()
+
+
+@receiver(post_save, sender=OrderBook)
+@receiver(post_save, sender=Market)
+def invalidate_ticker(sender, **kwargs):
+    """Drop the cached ticker once the change is committed"""
+    transaction.on_commit(fastpath.invalidate_ticker)
+
+
+@receiver(post_save, sender=Market)
+def create_market_stats(sender, instance, created, **kwargs):
+    if created:
+        MarketStats.objects.get_or_create(market=instance)
+
+
+@receiver(post_save, sender=Market)
+def invalidate_market(sender, instance, **kwargs):
+    """Market edits, closing and resolution (all done by saving the market)"""
+    invalidate('markets', f'market:{instance.pk}')
+
+
+@receiver(markets_closed)
+def invalidate_closed_markets(sender, market_ids, **kwargs):
+    # Bulk updates skip post_save, so cover what it would have
+    transaction.on_commit(fastpath.invalidate_ticker)
+    invalidate(
+        'markets',
+        *[f'market:{market_id}' for market_id in market_ids],
+        *[f'book:{market_id}' for market_id in market_ids],
+    )
+
+
+@receiver(order_placed)
+@receiver(order_cancelled)
+def invalidate_order_owner(sender, order, **kwargs):
+    # Resting sells reserve shares and cancels return them, which moves the
+    # share totals behind the prices on market reads
+    invalidate(
+        'markets', f'market:{order.market_id}', f'book:{order.market_id}', f'user:{order.user_id}'
+    )
+
+
+@receiver(orders_cancelled)
+def invalidate_bulk_cancel(sender, orders, **kwargs):
+    transaction.on_commit(fastpath.invalidate_ticker)
+    invalidate(
+        'markets',
+        *{f'market:{order["market_id"]}' for order in orders},
+        *{f'book:{order["market_id"]}' for order in orders},
+        *{f'user:{order["user_id"]}' for order in orders},
+    )
+
+
+@receiver(order_filled)
+def invalidate_fill(sender, order, counterparty, **kwargs):
+    # Fills move share totals, and with them the prices on market reads
+    invalidate(
+        'markets', f'market:{order.market_id}', f'book:{order.market_id}',
+        f'user:{order.user_id}', f'user:{counterparty.user_id}',
+    )
+
+
+@receiver(post_save, sender=Transaction)
+def invalidate_ledger(sender, instance, **kwargs):
+    invalidate(f'user:{instance.account.user_id}')
@@ -0,0 +1,185 @@
+"""
+Per-market activity statistics, maintained incrementally.
+
+After a match, ``trade_stats`` summarises its trades and a queued
+``record_market_stats`` task adds them to the market's ``MarketStats`` row:
+total and hourly volume, new traders and the change in open interest (a
+complementary buy pair mints a YES/NO pair, a sell pair merges one). Resting
+depth is re-summed from the market's price levels whenever its order books
+are refreshed, which is one row per price rather than per order.
+
+The 24 hour volume is the sum of the market's ``MarketVolume`` buckets still
+in the window; ``manage.py roll_market_stats`` takes buckets out as they age
+past it. ``rebuild_market_stats`` recomputes everything from the trades,
+shares and orders, for new deployments and reconciliation.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .history import from_millis, to_millis
+from .models import MarketStats, MarketTrader, MarketVolume, Order, PriceLevel, Share, Trade
+
+BUCKET = timedelta(hours=1)
+WINDOW = timedelta(hours=24)
+
+
+def bucket_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def window_cutoff(now):
+    """Buckets starting at or before this are entirely outside the window"""
+    return now - WINDOW - BUCKET
+
+
+def trade_stats(trades):
+    """Task payload summarising one order's saved trades, all in one market"""
+    open_interest = 0
+    for trade in trades:
+        if trade.maker_order.outcome != trade.outcome:
+            open_interest += trade.quantity if trade.taker_order.order_type == 'BUY' else -trade.quantity
+    return {
+        'market_id': trades[0].market_id,
+        'volume': sum(trade.quantity for trade in trades),
+        'trades': len(trades),
+        'open_interest': open_interest,
+        'user_ids': sorted(
+            {trade.taker_order.user_id for trade in trades} | {trade.maker_order.user_id for trade in trades}
+        ),
+        'traded_at': max(to_millis(trade.created_at) for trade in trades),
+    }
+
+
+def add_traders(market_id, user_ids):
+    """Record users as traders of a market; returns how many are new"""
+    known = set(MarketTrader.objects.filter(market_id=market_id, user_id__in=user_ids).values_list('user_id', flat=True))
+    added = 0
+    for user_id in set(user_ids) - known:
+        try:
+            with transaction.atomic():
+                MarketTrader.objects.create(market_id=market_id, user_id=user_id)
+            added += 1
+        except IntegrityError:
+            # Counted by a concurrent task
+            pass
+    return added
+
+
+def record_trades(market_id, volume, trades, open_interest, user_ids, traded_at):
+    """Add a ``trade_stats`` summary to the market's counters"""
+    traded_at = from_millis(traded_at)
+    bucket = bucket_start(traded_at)
+    # A task that ran late may land after its hour has left the window
+    in_window = bucket > window_cutoff(timezone.now())
+    if in_window:
+        MarketVolume.add(market_id, bucket, volume, trades)
+
+    MarketStats.objects.filter(market_id=market_id).update(
+        volume_24h=F('volume_24h') + (volume if in_window else 0),
+        trades_24h=F('trades_24h') + (trades if in_window else 0),
+        volume_total=F('volume_total') + volume,
+        open_interest=F('open_interest') + open_interest,
+        traders=F('traders') + add_traders(market_id, user_ids),
+    )
+
+
+def depth_subquery():
+    return Coalesce(
+        Subquery(
+            PriceLevel.objects.filter(market_id=OuterRef('market_id')).values('market_id').annotate(
+                total=Sum('total_quantity')
+            ).values('total')
+        ),
+        0,
+    )
+
+
+def refresh_depth(market_ids):
+    """Re-sum the resting depth of markets from their price levels"""
+    MarketStats.objects.filter(market_id__in=market_ids).update(resting_depth=depth_subquery())
+
+
+def roll_window(now=None):
+    """Take buckets that left the 24 hour window out of the markets' volume; returns how many"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        expired = list(MarketVolume.objects.select_for_update().filter(
+            bucket_start__lte=window_cutoff(now)
+        ).values_list('id', 'market_id', 'volume', 'trades'))
+        if not expired:
+            return 0
+
+        totals = defaultdict(lambda: [0, 0])
+        for bucket_id, market_id, volume, trades in expired:
+            totals[market_id][0] += volume
+            totals[market_id][1] += trades
+        MarketStats.objects.filter(market_id__in=totals).update(
+            volume_24h=F('volume_24h') - Case(
+                *[When(market_id=market_id, then=Value(volume)) for market_id, (volume, trades) in totals.items()],
+                output_field=BigIntegerField(),
+            ),
+            trades_24h=F('trades_24h') - Case(
+                *[When(market_id=market_id, then=Value(trades)) for market_id, (volume, trades) in totals.items()],
+                output_field=IntegerField(),
+            ),
+        )
+        MarketVolume.objects.filter(id__in=[bucket_id for bucket_id, *rest in expired]).delete()
+    return len(expired)
+
+
+def rebuild_market_stats(market_ids, now=None):
+    """Recompute the statistics of markets from scratch"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        MarketVolume.objects.filter(market_id__in=market_ids).delete()
+        MarketTrader.objects.filter(market_id__in=market_ids).delete()
+        trades = Trade.objects.filter(market_id__in=market_ids)
+
+        buckets = defaultdict(lambda: [0, 0])
+        cutoff = window_cutoff(now)
+        for market_id, created_at, quantity in trades.filter(
+            created_at__gt=cutoff
+        ).values_list('market_id', 'created_at', 'quantity'):
+            if bucket_start(created_at) <= cutoff:
+                continue
+            bucket = buckets[market_id, bucket_start(created_at)]
+            bucket[0] += quantity
+            bucket[1] += 1
+        MarketVolume.objects.bulk_create([
+            MarketVolume(market_id=market_id, bucket_start=start, volume=volume, trades=count)
+            for (market_id, start), (volume, count) in buckets.items()
+        ])
+
+        # Orders that filled at all cover trades from before trades were recorded
+        MarketTrader.objects.bulk_create([
+            MarketTrader(market_id=market_id, user_id=user_id)
+            for market_id, user_id in Order.objects.filter(
+                market_id__in=market_ids, filled_quantity__gt=0
+            ).values_list('market_id', 'user_id').distinct().order_by()
+        ], batch_size=1000)
+
+        held = dict(Share.objects.filter(market_id__in=market_ids).values('market_id').annotate(
+            total=Sum('quantity')
+        ).values_list('market_id', 'total').order_by())
+        reserved = dict(Order.objects.filter(
+            market_id__in=market_ids, order_type='SELL', status__in=['PENDING', 'PARTIAL', 'WAITING']
+        ).values('market_id').annotate(
+            total=Sum(F('quantity') - F('filled_quantity'))
+        ).values_list('market_id', 'total').order_by())
+
+        for market_id in market_ids:
+            volume = [value for (bucket_market, start), value in buckets.items() if bucket_market == market_id]
+            MarketStats.objects.update_or_create(market_id=market_id, defaults={
+                'open_interest': ((held.get(market_id) or 0) + (reserved.get(market_id) or 0)) // 2,
+                'volume_24h': sum(quantity for quantity, count in volume),
+                'trades_24h': sum(count for quantity, count in volume),
+                'volume_total': trades.filter(market_id=market_id).aggregate(total=Sum('quantity'))['total'] or 0,
+                'traders': MarketTrader.objects.filter(market_id=market_id).count(),
+            })
+        refresh_depth(market_ids)
@@ -0,0 +1,152 @@
+"""
+Durable local task queue for post-trade work.
+
+Work that doesn't decide balances, positions or matching (ledger rows, order
+book snapshots, price history, candles, market statistics) is queued with ``enqueue`` as a ``Task`` row inside the
+trade's transaction, so it commits or rolls back with the trade, and
+``manage.py run_tasks`` runs it afterwards on a thread pool. A claimed task
+holds a lease until ``TASK_QUEUE_LEASE_SECONDS`` so a crashed worker's tasks
+are picked up again; failures are retried with exponential backoff and
+marked FAILED after ``TASK_QUEUE_MAX_ATTEMPTS``.
+
+With ``TASK_QUEUE_EAGER`` tasks run in-process right after the transaction
+commits instead, which is handy when no worker is running.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import Account, Transaction
+from .cache import invalidate
+from .candles import update_candles
+from .fastpath import invalidate_ticker
+from .history import append_points
+from .models import OrderBook, Task
+from .stats import record_trades, refresh_depth
+
+handlers = {}
+
+
+def task(handler):
+    """Register a task handler under its function name"""
+    handlers[handler.__name__] = handler
+    return handler
+
+
+def enqueue(name, **payload):
+    """Queue ``handlers[name](**payload)`` to run after the current transaction commits"""
+    if settings.TASK_QUEUE_EAGER:
+        transaction.on_commit(lambda: run_handler(name, payload))
+        return None
+    return Task.objects.create(name=name, payload=payload)
+
+
+def run_handler(name, payload):
+    with transaction.atomic():
+        handlers[name](**payload)
+
+
+def claim_tasks(batch_size, now=None):
+    """Lease up to ``batch_size`` due tasks, oldest first"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status__in=['PENDING', 'RUNNING'], run_after__lte=now)
+            .order_by('run_after')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        Task.objects.filter(id__in=ids).update(
+            status='RUNNING',
+            attempts=F('attempts') + 1,
+            run_after=now + timedelta(seconds=settings.TASK_QUEUE_LEASE_SECONDS),
+        )
+    return list(Task.objects.filter(id__in=ids).order_by('id'))
+
+
+def run_task(queued):
+    """Run a claimed task, deleting it on success and rescheduling it on failure"""
+    close_old_connections()
+    try:
+        run_handler(queued.name, queued.payload)
+    except Exception as error:
+        changes = {'status': 'FAILED', 'last_error': repr(error)}
+        if queued.attempts < settings.TASK_QUEUE_MAX_ATTEMPTS:
+            changes.update(
+                status='PENDING',
+                run_after=timezone.now() + timedelta(seconds=2 ** queued.attempts),
+            )
+        Task.objects.filter(id=queued.id).update(**changes)
+        return False
+    else:
+        Task.objects.filter(id=queued.id).delete()
+        return True
+    finally:
+        close_old_connections()
+
+
+def run_pending(executor, batch_size):
+    """Claim one batch of due tasks and run it on ``executor``; returns (ran, failed)"""
+    claimed = claim_tasks(batch_size)
+    results = list(executor.map(run_task, claimed))
+    return len(results), results.count(False)
+
+
+def ledger_payload(transactions):
+    """Unsaved Transaction rows as JSON-safe values for ``record_transactions``"""
+    return [
+        {
+            'account_id': row.account_id,
+            'transaction_type': row.transaction_type,
+            'amount': str(row.amount),
+            'market_id': row.market_id,
+            'order_id': row.order_id,
+            # Trades are saved after the row is built, so read the id off the instance
+            'trade_id': row.trade.id if row.trade else None,
+            'outcome': row.outcome,
+            'quantity': row.quantity,
+            'price': None if row.price is None else str(row.price),
+            'description': row.description,
+        }
+        for row in transactions
+    ]
+
+
+@task
+def record_transactions(entries):
+    """Insert an order's ledger rows in one statement"""
+    Transaction.objects.bulk_create([Transaction(**entry) for entry in entries])
+    user_ids = Account.objects.filter(
+        id__in={entry['account_id'] for entry in entries}
+    ).values_list('user_id', flat=True)
+    invalidate(*(f'user:{user_id}' for user_id in user_ids))
+
+
+@task
+def refresh_order_books(market_id, outcomes):
+    """Rebuild the top-of-book snapshot of a market's order books"""
+    for outcome in outcomes:
+        orderbook, created = OrderBook.objects.get_or_create(market_id=market_id, outcome=outcome)
+        orderbook.update_book()
+    refresh_depth([market_id])
+    # update_book writes with UPDATE, which skips the post_save handler
+    transaction.on_commit(invalidate_ticker)
+
+
+@task
+def record_price_history(points):
+    """Append a match's trades to the price history and candles of their order books"""
+    append_points(points)
+    update_candles(points)
+    invalidate(*{f'history:{market_id}' for market_id, *point in points})
+
+
+@task
+def record_market_stats(market_id, **summary):
+    """Add a match's trades to its market's statistics"""
+    record_trades(market_id, **summary)
+    invalidate('markets', f'market:{market_id}')
@@ -1,3 +1,564 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError
+from django.db.models import Count, F, Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import candles, expiry, history, leaderboard, marketdata, tasks
+from .idempotency import request_fingerprint
+from .management import periodic
+from .models import (
+    Candle, IdempotencyKey, LeaderboardEntry, Market, MarketStats, Order, OrderBook, PriceHistoryChunk,
+    PriceLevel, Share,
+)
+from accounts.models import Account
+
+
+class OrderTestCase(TestCase):
+    """Places orders through the API as users with fresh 1000.00 accounts"""
+
+    def setUp(self):
+        # Cached responses outlive each test's rolled back generations
+        cache.clear()
+        self.creator = User.objects.create_user('creator', password='x')
+        self.market = Market.objects.create(
+            title='Will it rain?',
+            description='Resolves YES if it rains.',
+            resolution_date=timezone.now() + timedelta(days=30),
+            created_by=self.creator,
+        )
+
+    def make_user(self, username, shares=0, outcome='YES'):
+        user = User.objects.create_user(username, password='x')
+        Account.objects.create(user=user)
+        if shares:
+            Share.objects.create(
+                user=user, market=self.market, outcome=outcome, quantity=shares,
+                average_price=Decimal('0.5000')
+            )
+        return user
+
+    def place(self, user, headers=None, **data):
+        data.setdefault('market', self.market.id)
+        data.setdefault('outcome', 'YES')
+        self.client.force_login(user)
+        return self.client.post(
+            '/api/markets/place-order/', data, content_type='application/json', headers=headers
+        )
+
+    def balance(self, user):
+        return Account.objects.get(user=user).balance
+
+    def shares(self, user, outcome='YES'):
+        share = Share.objects.filter(user=user, market=self.market, outcome=outcome).first()
+        return share.quantity if share else 0
+
+
+class MatchingTests(OrderTestCase):
+    def test_limit_orders_match_and_settle(self):
+        seller = self.make_user('seller', shares=10)
+        buyer = self.make_user('buyer')
+
+        response = self.place(seller, order_type='SELL', quantity=10, price='0.60')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.shares(seller), 0)  # reserved while resting
+
+        response = self.place(buyer, order_type='BUY', quantity=10, price='0.60')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['fills']), 1)
+
+        self.assertEqual(self.balance(buyer), Decimal('994.00'))
+        self.assertEqual(self.balance(seller), Decimal('1006.00'))
+        self.assertEqual(self.shares(buyer), 10)
+        self.assertEqual(self.shares(seller), 0)
+        self.assertEqual(
+            set(Order.objects.values_list('status', flat=True)), {'FILLED'}
+        )
+
+    def test_partial_fill_rests_the_remainder(self):
+        seller = self.make_user('seller', shares=4)
+        buyer = self.make_user('buyer')
+
+        self.place(seller, order_type='SELL', quantity=4, price='0.50')
+        response = self.place(buyer, order_type='BUY', quantity=10, price='0.50')
+        self.assertEqual(response.status_code, 201)
+
+        order = Order.objects.get(user=buyer)
+        self.assertEqual(order.filled_quantity, 4)
+        self.assertEqual(order.status, 'PARTIAL')
+        # 4 bought and 6 reserved at 0.50
+        self.assertEqual(self.balance(buyer), Decimal('995.00'))
+        self.assertEqual(self.balance(seller), Decimal('1002.00'))
+        self.assertEqual(self.shares(buyer), 4)
+
+    def test_yes_and_no_bids_mint_a_pair(self):
+        yes_buyer = self.make_user('yes_buyer')
+        no_buyer = self.make_user('no_buyer')
+
+        self.place(yes_buyer, order_type='BUY', quantity=5, price='0.60')
+        response = self.place(no_buyer, order_type='BUY', outcome='NO', quantity=5, price='0.40')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.shares(yes_buyer, 'YES'), 5)
+        self.assertEqual(self.shares(no_buyer, 'NO'), 5)
+        self.assertEqual(self.balance(yes_buyer), Decimal('997.00'))
+        self.assertEqual(self.balance(no_buyer), Decimal('998.00'))
+
+    def test_insufficient_funds_rejects_the_order(self):
+        buyer = self.make_user('buyer')
+
+        response = self.place(buyer, order_type='BUY', quantity=5000, price='0.50')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.balance(buyer), Decimal('1000.00'))
+
+    def test_prices_outside_zero_to_one_are_rejected(self):
+        seller = self.make_user('seller', shares=10)
+
+        for price in ['0', '1', '-0.20', '1.50', '0.00005']:
+            response = self.place(seller, order_type='SELL', quantity=1, price=price)
+            self.assertEqual(response.status_code, 400, price)
+        response = self.place(seller, order_type='SELL', order_class='STOP', quantity=1, stop_price='-1')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.shares(seller), 10)
+
+
+class IdempotencyTests(OrderTestCase):
+    def test_repeated_key_replays_the_response(self):
+        buyer = self.make_user('buyer')
+        headers = {'Idempotency-Key': 'order-1'}
+
+        first = self.place(buyer, headers=headers, order_type='BUY', quantity=10, price='0.40')
+        retry = self.place(buyer, headers=headers, order_type='BUY', quantity=10, price='0.40')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Order.objects.filter(user=buyer).count(), 1)
+        self.assertEqual(self.balance(buyer), Decimal('996.00'))
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        buyer = self.make_user('buyer')
+        headers = {'Idempotency-Key': 'order-1'}
+
+        self.place(buyer, headers=headers, order_type='BUY', quantity=10, price='0.40')
+        response = self.place(buyer, headers=headers, order_type='BUY', quantity=20, price='0.40')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.filter(user=buyer).count(), 1)
+
+    def test_keys_are_per_user(self):
+        first = self.make_user('first')
+        second = self.make_user('second')
+        headers = {'Idempotency-Key': 'order-1'}
+
+        self.place(first, headers=headers, order_type='BUY', quantity=10, price='0.40')
+        response = self.place(second, headers=headers, order_type='BUY', quantity=10, price='0.40')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response.headers)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_repeated_cancel_refunds_once(self):
+        buyer = self.make_user('buyer')
+        self.place(buyer, order_type='BUY', quantity=10, price='0.40')
+        order = Order.objects.get(user=buyer)
+        url = f'/api/markets/orders/{order.id}/cancel/'
+        headers = {'Idempotency-Key': 'cancel-1'}
+
+        first = self.client.post(url, headers=headers)
+        retry = self.client.post(url, headers=headers)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.balance(buyer), Decimal('1000.00'))
+
+    def claim(self, user, key, claimed_at, **data):
+        """A claim left by a request whose worker died before it finished"""
+        data.update(market=self.market.id, outcome='YES')
+        request = SimpleNamespace(path='/api/markets/place-order/', data=data)
+        return IdempotencyKey.objects.create(
+            user=user, key=key, request_hash=request_fingerprint(request, {}), claimed_at=claimed_at
+        )
+
+    def test_running_claim_is_not_taken_over(self):
+        buyer = self.make_user('buyer')
+        self.claim(buyer, 'order-1', timezone.now(), order_type='BUY', quantity=10, price='0.40')
+
+        response = self.place(
+            buyer, headers={'Idempotency-Key': 'order-1'}, order_type='BUY', quantity=10, price='0.40'
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+
+    def test_abandoned_claim_is_taken_over(self):
+        buyer = self.make_user('buyer')
+        self.claim(
+            buyer, 'order-1', timezone.now() - timedelta(minutes=5),
+            order_type='BUY', quantity=10, price='0.40'
+        )
+        headers = {'Idempotency-Key': 'order-1'}
+
+        response = self.place(buyer, headers=headers, order_type='BUY', quantity=10, price='0.40')
+        retry = self.place(buyer, headers=headers, order_type='BUY', quantity=10, price='0.40')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.filter(user=buyer).count(), 1)
+
+
+class StopOrderTests(OrderTestCase):
+    def test_stop_sell_triggers_when_the_last_trade_reaches_it(self):
+        holder = self.make_user('holder', shares=5)
+        bidder = self.make_user('bidder')
+        seller = self.make_user('seller', shares=12)
+
+        response = self.place(holder, order_type='SELL', order_class='STOP', quantity=5, stop_price='0.50')
+        self.assertEqual(response.status_code, 201)
+        stop = Order.objects.get(user=holder)
+        self.assertEqual(stop.status, 'WAITING')
+        self.assertEqual(self.shares(holder), 0)  # reserved while waiting
+
+        self.place(bidder, order_type='BUY', quantity=10, price='0.55')
+        self.place(seller, order_type='SELL', quantity=2, price='0.55')
+        stop.refresh_from_db()
+        self.assertEqual(stop.status, 'WAITING')  # last trade 0.55 is above the stop
+
+        # Takes the 8 left at 0.55, then trades 2 at 0.45
+        self.place(bidder, order_type='BUY', quantity=10, price='0.45')
+        self.place(seller, order_type='SELL', quantity=10, price='0.45')
+        stop.refresh_from_db()
+        self.assertEqual(stop.status, 'FILLED')
+        self.assertEqual(self.shares(holder), 0)
+        self.assertEqual(self.shares(bidder), 17)
+        self.assertEqual(self.balance(holder), Decimal('1002.25'))
+
+    def test_shares_are_not_reserved_twice_through_a_stale_position(self):
+        holder = self.make_user('holder', shares=10)
+        position = Share.objects.get(user=holder)
+        stale = Share.objects.get(user=holder)
+
+        self.assertTrue(position.remove_shares(6))
+        self.assertFalse(stale.remove_shares(6))
+        self.assertEqual(stale.quantity, 4)
+        self.assertEqual(self.shares(holder), 4)
+
+    def test_cancelled_stop_sell_returns_its_shares(self):
+        holder = self.make_user('holder', shares=5)
+
+        self.place(holder, order_type='SELL', order_class='STOP', quantity=5, stop_price='0.50')
+        stop = Order.objects.get(user=holder)
+        response = self.client.post(f'/api/markets/orders/{stop.id}/cancel/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.shares(holder), 5)
+
+
+class ExpiryTests(OrderTestCase):
+    def test_expired_gtd_orders_are_refunded(self):
+        buyer = self.make_user('buyer')
+        seller = self.make_user('seller', shares=10)
+        expires_at = timezone.now() + timedelta(hours=1)
+
+        self.place(
+            buyer, order_type='BUY', quantity=10, price='0.40',
+            time_in_force='GTD', expires_at=expires_at.isoformat()
+        )
+        self.place(
+            seller, order_type='SELL', quantity=10, price='0.70',
+            time_in_force='GTD', expires_at=expires_at.isoformat()
+        )
+        self.assertEqual(self.balance(buyer), Decimal('996.00'))
+        self.assertEqual(self.shares(seller), 0)
+
+        self.assertEqual(expiry.expire_orders(now=timezone.now()), 0)
+        self.assertEqual(expiry.expire_orders(now=expires_at), 2)
+
+        self.assertEqual(set(Order.objects.values_list('status', flat=True)), {'CANCELLED'})
+        self.assertEqual(self.balance(buyer), Decimal('1000.00'))
+        self.assertEqual(self.shares(seller), 10)
+        self.assertFalse(PriceLevel.objects.filter(market=self.market).exists())
+
+    def test_sweep_loop_survives_database_errors(self):
+        sweeps = []
+
+        def sweep():
+            sweeps.append(len(sweeps))
+            if len(sweeps) == 1:
+                raise OperationalError('deadlock detected')
+            if len(sweeps) == 3:
+                raise KeyboardInterrupt
+
+        command = SimpleNamespace(stderr=mock.Mock())
+        with mock.patch.object(periodic.time, 'sleep') as sleep, self.assertRaises(KeyboardInterrupt):
+            periodic.run_periodically(command, sweep, 5)
+
+        self.assertEqual(len(sweeps), 3)
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [10, 5])
+        command.stderr.write.assert_called_once()
+
+    def test_partially_filled_gtd_order_refunds_the_remainder(self):
+        buyer = self.make_user('buyer')
+        seller = self.make_user('seller', shares=4)
+        expires_at = timezone.now() + timedelta(hours=1)
+
+        self.place(seller, order_type='SELL', quantity=4, price='0.50')
+        self.place(
+            buyer, order_type='BUY', quantity=10, price='0.50',
+            time_in_force='GTD', expires_at=expires_at.isoformat()
+        )
+        expiry.expire_orders(now=expires_at)
+
+        self.assertEqual(self.balance(buyer), Decimal('998.00'))
+        self.assertEqual(self.shares(buyer), 4)
+
+    def test_closing_a_market_refunds_its_resting_orders(self):
+        buyer = self.make_user('buyer')
+        seller = self.make_user('seller', shares=10)
+        self.place(buyer, order_type='BUY', quantity=10, price='0.40')
+        self.place(seller, order_type='SELL', quantity=10, price='0.70')
+        tasks.refresh_order_books(self.market.id, ['YES'])
+        self.assertEqual(MarketStats.objects.get(market=self.market).resting_depth, 20)
+
+        closed = expiry.close_markets(now=self.market.resolution_date)
+
+        self.assertEqual(closed, 1)
+        self.market.refresh_from_db()
+        self.assertEqual(self.market.status, 'CLOSED')
+        self.assertEqual(self.balance(buyer), Decimal('1000.00'))
+        self.assertEqual(self.shares(seller), 10)
+        self.assertEqual(MarketStats.objects.get(market=self.market).resting_depth, 0)
+        response = self.place(buyer, order_type='BUY', quantity=1, price='0.40')
+        self.assertEqual(response.status_code, 400)
+
+
+class CacheInvalidationTests(OrderTestCase):
+    def market_price(self):
+        return self.client.get(f'/api/markets/markets/{self.market.id}/').json()['current_yes_price']
+
+    def test_resting_sell_and_its_expiry_refresh_the_market(self):
+        seller = self.make_user('seller', shares=10)
+        self.client.force_login(seller)
+        before = self.market_price()
+        expires_at = timezone.now() + timedelta(hours=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place(
+                seller, order_type='SELL', quantity=10, price='0.70',
+                time_in_force='GTD', expires_at=expires_at.isoformat()
+            )
+        reserved = self.market_price()
+        self.assertNotEqual(reserved, before)
+        self.assertEqual(reserved, float(self.market.current_yes_price))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expiry.expire_orders(now=expires_at)
+        self.assertEqual(self.market_price(), before)
+
+
+class OrderBookSnapshotTests(OrderTestCase):
+    def test_late_refresh_keeps_the_last_trade_and_version(self):
+        seller = self.make_user('seller', shares=10)
+        buyer = self.make_user('buyer')
+        self.place(seller, order_type='SELL', quantity=10, price='0.60')
+        self.place(buyer, order_type='BUY', quantity=4, price='0.60')
+
+        book = OrderBook.objects.get(market=self.market, outcome='YES')
+        self.assertEqual(book.last_price, Decimal('0.6000'))
+        # Another process's clock ran ahead of this one's
+        OrderBook.objects.filter(pk=book.pk).update(version=book.version + 10 ** 12)
+        stale = OrderBook.objects.get(pk=book.pk)
+        stale.last_price, stale.last_quantity = None, 0
+
+        stale.update_book()
+        tasks.refresh_order_books(self.market.id, ['YES'])
+
+        book = OrderBook.objects.get(pk=book.pk)
+        self.assertEqual(book.last_price, Decimal('0.6000'))
+        self.assertEqual(book.last_quantity, 4)
+        self.assertEqual(book.best_ask, Decimal('0.6000'))
+        self.assertEqual(book.ask_volume, 6)
+        self.assertEqual(book.version, stale.version + 1)
+
+
+class MarketDataTests(OrderTestCase):
+    def test_binary_depth_carries_prices_in_ticks(self):
+        seller = self.make_user('seller', shares=10)
+        buyer = self.make_user('buyer')
+        self.place(seller, order_type='SELL', quantity=10, price='0.6500')
+        self.place(buyer, order_type='BUY', quantity=4, price='0.0001')
+
+        response = self.client.get(f'/api/markets/markets/{self.market.id}/orderbook/YES/?format=bin')
+
+        self.assertEqual(response.status_code, 200)
+        depth = marketdata.decode_depth(response.content)
+        self.assertEqual(depth['bids'], [(1, 4)])
+        self.assertEqual(depth['asks'], [(6500, 10)])
+
+
+class PriceLevelTests(OrderTestCase):
+    def assertLevelsMatchOrders(self):
+        """Every price level holds exactly the remainders of the open orders at its price"""
+        levels = {
+            (outcome, side, price): (quantity, count)
+            for outcome, side, price, quantity, count in PriceLevel.objects.filter(market=self.market)
+            .values_list('outcome', 'side', 'price', 'total_quantity', 'order_count')
+        }
+        orders = {
+            (row['outcome'], row['order_type'], row['price']): (row['quantity'], row['count'])
+            for row in Order.objects.filter(market=self.market, status__in=Order.OPEN_STATUSES)
+            .values('outcome', 'order_type', 'price')
+            .annotate(quantity=Sum(F('quantity') - F('filled_quantity')), count=Count('id'))
+        }
+        self.assertEqual(levels, orders)
+
+    def test_levels_follow_fills_cancels_expiry_and_close(self):
+        yes_holder = self.make_user('yes_holder', shares=30)
+        no_holder = self.make_user('no_holder', shares=30, outcome='NO')
+        buyer = self.make_user('buyer')
+        expires_at = timezone.now() + timedelta(hours=1)
+
+        self.place(yes_holder, order_type='SELL', quantity=10, price='0.60')
+        self.place(yes_holder, order_type='SELL', quantity=10, price='0.65')
+        self.place(
+            yes_holder, order_type='SELL', quantity=5, price='0.70',
+            time_in_force='GTD', expires_at=expires_at.isoformat()
+        )
+        self.place(buyer, order_type='BUY', quantity=8, price='0.40')
+        self.place(buyer, order_type='BUY', quantity=6, price='0.40')
+        self.place(no_holder, order_type='SELL', outcome='NO', quantity=10, price='0.45')
+        self.assertLevelsMatchOrders()
+
+        # Fills across two levels, leaving one partly filled
+        self.place(buyer, order_type='BUY', quantity=14, price='0.65')
+        self.place(buyer, order_type='BUY', quantity=3, price='0.55')
+        self.assertLevelsMatchOrders()
+
+        # A NO bid mints pairs with the YES bids at 0.55 and 0.40
+        self.place(no_holder, order_type='BUY', outcome='NO', quantity=5, price='0.60')
+        self.assertLevelsMatchOrders()
+
+        # A YES ask merges pairs with the NO ask at 0.45
+        self.place(yes_holder, order_type='SELL', quantity=4, price='0.55')
+        self.assertEqual(Order.objects.get(outcome='NO', order_type='SELL').filled_quantity, 4)
+        self.assertLevelsMatchOrders()
+
+        order = Order.objects.filter(user=buyer, status__in=Order.OPEN_STATUSES).first()
+        self.client.force_login(buyer)
+        self.client.post(f'/api/markets/orders/{order.id}/cancel/')
+        self.assertLevelsMatchOrders()
+
+        expiry.expire_orders(now=expires_at)
+        self.assertLevelsMatchOrders()
+
+        expiry.close_markets(now=self.market.resolution_date)
+        self.assertLevelsMatchOrders()
+        self.assertFalse(PriceLevel.objects.filter(market=self.market).exists())
+
+
+class PriceHistoryTests(OrderTestCase):
+    # On a 5 minute boundary inside an hour, so 1m and 5m buckets split where 1h doesn't
+    BOUNDARY = 1_800_000_300_000
+
+    def points(self, *points):
+        return [[self.market.id, 'YES', millis, ticks, quantity] for millis, ticks, quantity in points]
+
+    def test_chunks_round_trip_their_points(self):
+        points = [(self.BOUNDARY + index * 1000, 4000 + index * 100, index + 1) for index in range(10)]
+
+        with mock.patch.object(history, 'CHUNK_POINTS', 4):
+            history.append_points(self.points(*points[:3]))
+            history.append_points(self.points(*points[3:]))
+
+        chunks = list(PriceHistoryChunk.objects.filter(market=self.market).order_by('start_at'))
+        self.assertEqual([chunk.count for chunk in chunks], [4, 4, 2])
+        self.assertEqual([point for chunk in chunks for point in history.decode(chunk.data)], points)
+        first = chunks[0]
+        self.assertEqual(
+            (first.open, first.high, first.low, first.close, first.volume),
+            (Decimal('0.4000'), Decimal('0.4300'), Decimal('0.4000'), Decimal('0.4300'), 10),
+        )
+        self.assertEqual(first.start_at, history.from_millis(points[0][0]))
+        self.assertEqual(chunks[-1].end_at, history.from_millis(points[-1][0]))
+
+        start, end = history.from_millis(points[2][0]), history.from_millis(points[6][0])
+        self.assertEqual(
+            history.series(self.market.id, 'YES', start, end, 500, 'lttb'),
+            [[millis, ticks / 10000, quantity] for millis, ticks, quantity in points[2:7]],
+        )
+
+    def candles(self, interval):
+        return list(Candle.objects.filter(market=self.market, interval=interval).order_by('bucket_start').values_list(
+            'bucket_start', 'open', 'high', 'low', 'close', 'volume', 'trades'
+        ))
+
+    def test_candles_split_at_bucket_boundaries(self):
+        before = [(self.BOUNDARY - 1000, 5000, 2), (self.BOUNDARY - 500, 5200, 1)]
+        after = [(self.BOUNDARY + 100, 4800, 3), (self.BOUNDARY + 30_000, 4900, 1)]
+
+        # The later trades are rolled up first, as a delayed task would
+        candles.update_candles(self.points(*after))
+        candles.update_candles(self.points(*before))
+
+        minute = history.from_millis(self.BOUNDARY - 60_000)
+        five_minutes = history.from_millis(self.BOUNDARY - 300_000)
+        boundary = history.from_millis(self.BOUNDARY)
+        self.assertEqual(self.candles('1m'), [
+            (minute, Decimal('0.5000'), Decimal('0.5200'), Decimal('0.5000'), Decimal('0.5200'), 3, 2),
+            (boundary, Decimal('0.4800'), Decimal('0.4900'), Decimal('0.4800'), Decimal('0.4900'), 4, 2),
+        ])
+        self.assertEqual(self.candles('5m'), [
+            (five_minutes, Decimal('0.5000'), Decimal('0.5200'), Decimal('0.5000'), Decimal('0.5200'), 3, 2),
+            (boundary, Decimal('0.4800'), Decimal('0.4900'), Decimal('0.4800'), Decimal('0.4900'), 4, 2),
+        ])
+        self.assertEqual(self.candles('1h'), [
+            (history.from_millis(self.BOUNDARY - self.BOUNDARY % 3_600_000),
+             Decimal('0.5000'), Decimal('0.5200'), Decimal('0.4800'), Decimal('0.4900'), 7, 4),
+        ])
+
+        # Rebuilding from the packed history gives the same candles
+        incremental = {interval: self.candles(interval) for interval in Candle.INTERVAL_SECONDS}
+        history.append_points(self.points(*before, *after))
+        candles.rebuild_candles(self.market.id, 'YES', list(Candle.INTERVAL_SECONDS))
+        self.assertEqual({interval: self.candles(interval) for interval in Candle.INTERVAL_SECONDS}, incremental)
+
+
+class LeaderboardTests(OrderTestCase):
+    @override_settings(TASK_QUEUE_EAGER=True)
+    def test_pnl_matches_a_hand_computed_board(self):
+        seller = self.make_user('seller', shares=20)  # bought at 0.50 before the ledger
+        first = self.make_user('first')
+        second = self.make_user('second')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place(seller, order_type='SELL', quantity=10, price='0.60')
+            self.place(seller, order_type='SELL', quantity=10, price='0.70')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place(first, order_type='BUY', quantity=10, price='0.60')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place(second, order_type='BUY', quantity=5, price='0.70')
+
+        self.assertEqual(leaderboard.compute_leaderboard(), 3)
+
+        # Marked at the last trade, 0.70. The seller took in 6.00 + 3.50 and
+        # still has 5 shares at 0.50 reserved by the resting sell.
+        board = {
+            entry.user_id: (entry.total_pnl, entry.realized_pnl, entry.unrealized_pnl, entry.volume, entry.pnl_rank)
+            for entry in LeaderboardEntry.objects.all()
+        }
+        self.assertEqual(board, {
+            seller.id: (Decimal('13.00'), Decimal('12.00'), Decimal('1.00'), Decimal('9.50'), 1),
+            first.id: (Decimal('1.00'), Decimal('0.00'), Decimal('1.00'), Decimal('6.00'), 2),
+            second.id: (Decimal('0.00'), Decimal('0.00'), Decimal('0.00'), Decimal('3.50'), 3),
+        })
+        self.assertAlmostEqual(LeaderboardEntry.objects.get(user=first).roi, 1 / 6, places=6)
+        self.assertEqual(LeaderboardEntry.objects.get(user=seller).volume_rank, 1)
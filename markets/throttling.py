@@ -0,0 +1,130 @@
+"""
+Token-bucket rate limits for placing and cancelling orders.
+
+DRF runs throttles after authentication and before the view, so a flood of
+orders is turned away before serializer validation or any transaction. Each
+user has one bucket for the order endpoints and one per market they trade
+in; rates and bursts come from ``ORDER_THROTTLE_RATES`` for the user's
+account tier. Buckets live in worker memory, or in the cache with
+``ORDER_THROTTLE_SHARED`` so all workers share them (read-modify-write, so
+concurrent requests in different workers can occasionally both get the last
+token). Rejected requests get a 429 with ``Retry-After``, and are counted
+per scope and tier (``shed_counts``).
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from accounts.models import Account
+
+BUCKET_PREFIX = 'bucket:'
+SHED_PREFIX = 'shed:'
+TIER_PREFIX = 'tier:'
+# Forget buckets of idle users once this many are kept in memory
+MAX_LOCAL_BUCKETS = 10000
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def user_tier(user):
+    """Account tier of a user, cached so throttling doesn't query the database"""
+    key = f'{TIER_PREFIX}{user.id}'
+    tier = cache.get(key)
+    if tier is None:
+        tier = Account.objects.filter(user=user).values_list('tier', flat=True).first() or Account.DEFAULT_TIER
+        cache.set(key, tier, settings.ACCOUNT_TIER_CACHE_TIMEOUT)
+    return tier
+
+
+def refill(state, rate, burst, now):
+    """Take a token from a ``(tokens, updated)`` bucket; returns (new state, seconds to wait or 0)"""
+    tokens, updated = state if state is not None else (burst, now)
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / rate
+
+
+def take_token(key, rate, burst):
+    """Take a token from the bucket at ``key``; returns seconds to wait, 0 when allowed"""
+    now = time.time()
+    if settings.ORDER_THROTTLE_SHARED:
+        state, wait = refill(cache.get(BUCKET_PREFIX + key), rate, burst, now)
+        # A bucket left alone until it is full again is the same as no bucket
+        cache.set(BUCKET_PREFIX + key, state, burst / rate + 1)
+        return wait
+
+    with _buckets_lock:
+        if len(_buckets) > MAX_LOCAL_BUCKETS:
+            for stale in [k for k, (tokens, updated) in _buckets.items() if now - updated > 60]:
+                del _buckets[stale]
+        _buckets[key], wait = refill(_buckets.get(key), rate, burst, now)
+    return wait
+
+
+def _count_shed(scope, tier):
+    key = f'{SHED_PREFIX}{scope}:{tier}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def shed_counts():
+    """``{(scope, tier): rejected requests}`` for every configured scope and tier"""
+    keys = {
+        (scope, tier): f'{SHED_PREFIX}{scope}:{tier}'
+        for tier, scopes in settings.ORDER_THROTTLE_RATES.items() for scope in scopes
+    }
+    counts = cache.get_many(keys.values())
+    return {name: counts.get(key, 0) for name, key in keys.items()}
+
+
+class OrderThrottle(BaseThrottle):
+    """Token bucket per ``get_key``, sized by the user's tier for ``scope``"""
+    scope = None
+
+    def get_key(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        if not request.user.is_authenticated:
+            return True
+        key = self.get_key(request, view)
+        if key is None:
+            return True
+        tier = user_tier(request.user)
+        rate, burst = settings.ORDER_THROTTLE_RATES[tier][self.scope]
+        self.retry_after = take_token(f'{self.scope}:{key}', rate, burst)
+        if self.retry_after:
+            _count_shed(self.scope, tier)
+            return False
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+class UserOrderThrottle(OrderThrottle):
+    """All of a user's order placements and cancels"""
+    scope = 'user'
+
+    def get_key(self, request, view):
+        return request.user.id
+
+
+class MarketOrderThrottle(OrderThrottle):
+    """A user's order placements in one market"""
+    scope = 'market'
+
+    def get_key(self, request, view):
+        market = request.data.get('market') if hasattr(request.data, 'get') else None
+        if market is None:
+            return None
+        return f'{request.user.id}:{market}'
@@ -0,0 +1,65 @@
+"""
+Integer prices and money for the matching engine.
+
+Prices are whole ticks of 1/10000 (the precision of every price column) and
+money is whole micro-units of 1/1000000, so the notional of a fill,
+``quantity * ticks * MICROS_PER_TICK``, is exact integer arithmetic with no
+Decimal contexts involved. Matching, reservation and settlement work in these
+units; values are converted from Decimal when read off a model and back when
+written to a model field, the ledger or an API response.
+"""
+
+from decimal import Decimal
+
+TICKS_PER_UNIT = 10000
+MICROS_PER_UNIT = 1000000
+MICROS_PER_TICK = MICROS_PER_UNIT // TICKS_PER_UNIT
+
+
+def to_ticks(price):
+    """
+    Price to ticks: exact for price columns and inputs (at most 4 places),
+    derived prices like a mid are rounded half to even like the JSON API
+    """
+    if not isinstance(price, Decimal):
+        price = Decimal(str(price))
+    return int((price * TICKS_PER_UNIT).to_integral_value())
+
+
+def from_ticks(ticks):
+    """Ticks to a 4 decimal place Decimal price"""
+    return Decimal(ticks).scaleb(-4)
+
+
+def to_micros(amount):
+    """Decimal amount of money to micro-units"""
+    return int((amount * MICROS_PER_UNIT).to_integral_value())
+
+
+def from_micros(micros):
+    """Micro-units to a Decimal amount, rounded to cents when saved"""
+    return Decimal(micros).scaleb(-6)
+
+
+def complement(ticks):
+    """Price of the other outcome, since a YES/NO pair is worth 1"""
+    return TICKS_PER_UNIT - ticks
+
+
+def notional(quantity, ticks):
+    """Cost of ``quantity`` shares at ``ticks``, in micro-units"""
+    return quantity * ticks * MICROS_PER_TICK
+
+
+def affordable_quantity(micros, ticks):
+    """Most shares ``micros`` buys at ``ticks``"""
+    return micros // (ticks * MICROS_PER_TICK)
+
+
+def weighted_average(quantity, average, added_quantity, added_ticks):
+    """Average price in ticks after adding shares, rounded half to even like the price column"""
+    total = quantity + added_quantity
+    average, remainder = divmod(quantity * average + added_quantity * added_ticks, total)
+    if remainder * 2 > total or (remainder * 2 == total and average % 2):
+        average += 1
+    return average
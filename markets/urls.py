@@ -1,12 +1,26 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 
 urlpatterns = [
     path('markets/', views.MarketListView.as_view(), name='market-list'),
+    path('markets/search/', views.market_search, name='market-search'),
     path('markets/<int:pk>/', views.MarketDetailView.as_view(), name='market-detail'),
+    path('markets/<int:market_id>/view/', views.market_view, name='market-view'),
+    path('ticker/', views.ticker, name='ticker'),
+    path('leaderboard/', views.leaderboard_view, name='leaderboard'),
     path('shares/', views.ShareListView.as_view(), name='share-list'),
     path('orders/', views.OrderListView.as_view(), name='order-list'),
     path('orders/<int:order_id>/cancel/', views.cancel_order, name='cancel-order'),
     path('place-order/', views.place_order, name='place-order'),
     path('markets/<int:market_id>/orderbook/<str:outcome>/', views.order_book, name='order-book'),
+    path('markets/<int:market_id>/ticker/', views.market_ticker, name='market-ticker'),
+    path('markets/<int:market_id>/history/', views.price_history, name='price-history'),
+    path('markets/<int:market_id>/candles/', views.candles, name='candles'),
+
+    # Async read API (same responses, served natively under ASGI)
+    path('async/markets/', async_views.market_list, name='async-market-list'),
+    path('async/ticker/', async_views.ticker, name='async-ticker'),
+    path('async/markets/<int:pk>/', async_views.market_detail, name='async-market-detail'),
+    path('async/markets/<int:market_id>/orderbook/<str:outcome>/', async_views.order_book, name='async-order-book'),
+    path('async/markets/<int:market_id>/ticker/', async_views.market_ticker, name='async-market-ticker'),
 ]
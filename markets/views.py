@@ -1,28 +1,127 @@
 from rest_framework import generics, status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, renderer_classes, throttle_classes
+from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from django.conf import settings
 from django.db import transaction
+from django.db.models import F, Q
+from django.http import Http404
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from decimal import Decimal
-from .models import Market, Share, Order, OrderBook
-from .serializers import (
-    MarketSerializer, ShareSerializer, OrderSerializer, CreateOrderSerializer,
-    OrderBookSerializer, OrderBookDepthSerializer
+import heapq
+from . import engine, fastpath, history, leaderboard, marketdata, search, stats
+from .cache import cached_data, cached_response
+from .coalescing import coalesce_requests
+from .idempotency import idempotent
+from .models import Candle, LeaderboardEntry, Market, Share, Order, OrderBook, Trade
+from .serializers import MarketSerializer, ShareSerializer, OrderSerializer, CreateOrderSerializer
+from .renderers import MarketDataRenderer
+from .scheduling import OrderShed, order_slot
+from .signals import order_placed, order_filled, order_cancelled
+from .tasks import enqueue, ledger_payload
+from .throttling import MarketOrderThrottle, UserOrderThrottle
+from .ticks import (
+    TICKS_PER_UNIT, affordable_quantity, complement, from_micros, from_ticks,
+    notional, to_micros, to_ticks
 )
 from accounts.models import Account, Transaction
 
+MARKET_DATA_RENDERERS = api_settings.DEFAULT_RENDERER_CLASSES + [MarketDataRenderer]
+
 
 class MarketListView(generics.ListAPIView):
-    queryset = Market.objects.all()
     serializer_class = MarketSerializer
+    # e.g. ?ordering=-volume_24h, sorted on the indexed MarketStats columns
+    filter_backends = [OrderingFilter]
+    ordering_fields = ['volume_24h', 'open_interest', 'traders', 'resting_depth', 'created_at']
+
+    def get_queryset(self):
+        return Market.objects.alias(
+            volume_24h=F('stats__volume_24h'),
+            open_interest=F('stats__open_interest'),
+            traders=F('stats__traders'),
+            resting_depth=F('stats__resting_depth'),
+        )
+
+    @method_decorator(cached_response('market-list', ['markets']))
+    def list(self, request, *args, **kwargs):
+        return Response(fastpath.market_list(self.filter_queryset(self.get_queryset())))
+
+
+@api_view(['GET'])
+@cached_response('market-search', ['markets'])
+def market_search(request):
+    """
+    Markets matching a full-text search, best match first.
+    
+    Query parameters: ``q``, and optionally ``status``, ``created_after``,
+    ``created_before``, ``resolves_after`` and ``resolves_before`` (ISO 8601)
+    and ``limit`` (at most ``MARKET_SEARCH_MAX_LIMIT``). Each market carries
+    its ``rank``.
+    """
+    params = request.query_params
+    status_filter = params.get('status')
+    try:
+        filters = {name: parse_time(params, name, None) for name in search.FILTERS if name != 'status'}
+        limit = int(params.get('limit', settings.MARKET_SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        limit = None
+    if not params.get('q') or status_filter not in (None, *dict(Market.STATUS_CHOICES)):
+        return Response(
+            {'error': 'q is required and status must be ACTIVE, CLOSED or RESOLVED'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if limit is None or not 1 <= limit <= settings.MARKET_SEARCH_MAX_LIMIT:
+        return Response(
+            {'error': f'dates must be ISO 8601 times and limit 1 to {settings.MARKET_SEARCH_MAX_LIMIT}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    ranks = dict(search.search_markets(params['q'], limit, status=status_filter, **filters))
+    markets = fastpath.market_list(Market.objects.filter(id__in=ranks))
+    for market in markets:
+        market['rank'] = ranks[market['id']]
+    return Response(sorted(markets, key=lambda market: (-market['rank'], -market['id'])))
 
 
 class MarketDetailView(generics.RetrieveAPIView):
     queryset = Market.objects.all()
     serializer_class = MarketSerializer
 
+    @method_decorator(cached_response('market-detail', ['market:{pk}']))
+    @method_decorator(coalesce_requests('market-detail', ['market:{pk}']))
+    def retrieve(self, request, *args, **kwargs):
+        data = fastpath.market_detail(kwargs['pk'])
+        if data is None:
+            raise Http404
+        return Response(data)
+
+
+@api_view(['GET'])
+def market_view(request, market_id):
+    """
+    Everything the market page shows, in one request: the market, depth of
+    both outcomes, recent trades, and the requesting user's position and open
+    orders in the market.
+    
+    The shared parts are cached until the market or its order books change;
+    the user's parts take two queries.
+    """
+    overview = cached_data(
+        f'market-view:{market_id}',
+        [f'market:{market_id}', f'book:{market_id}'],
+        lambda: fastpath.market_overview(
+            market_id, settings.MARKET_VIEW_DEPTH_LEVELS, settings.MARKET_VIEW_RECENT_TRADES
+        ),
+    )
+    if overview is None:
+        return Response({'error': 'Market not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({**overview, **fastpath.user_position(request.user, market_id)})
+
 
 class ShareListView(generics.ListAPIView):
     serializer_class = ShareSerializer
@@ -37,83 +136,259 @@ class OrderListView(generics.ListCreateAPIView):
     def get_queryset(self):
         return Order.objects.filter(user=self.request.user).order_by('-created_at')
     
+    def list(self, request, *args, **kwargs):
+        return Response(fastpath.order_list(self.get_queryset()))
+
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return CreateOrderSerializer
         return OrderSerializer
 
 
+def wants_market_data(request):
+    return request.accepted_renderer.format == MarketDataRenderer.format
+
+
 @api_view(['GET'])
+@renderer_classes(MARKET_DATA_RENDERERS)
+@coalesce_requests('order-book', ['book:{market_id}'])
 def order_book(request, market_id, outcome):
     """Get order book depth for a market outcome"""
-    try:
-        market = Market.objects.get(id=market_id)
-    except Market.DoesNotExist:
+    if not Market.objects.filter(id=market_id).exists():
         return Response({'error': 'Market not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Get or create order book
-    orderbook, created = OrderBook.objects.get_or_create(
-        market=market,
-        outcome=outcome
-    )
-    orderbook.update_book()
+    binary = wants_market_data(request)
+    if binary:
+        # Read before the depth, so a frame's depth is never older than its sequence
+        sequence = OrderBook.objects.filter(
+            market_id=market_id, outcome=outcome
+        ).values_list('version', flat=True).first()
+    bids, asks = fastpath.depth_levels(market_id, outcome)
+    if binary:
+        return Response(marketdata.encode_depth(market_id, outcome, sequence or 0, bids, asks))
     
-    # Get bid/ask depth
-    bids = get_order_depth(market, outcome, 'BUY')
-    asks = get_order_depth(market, outcome, 'SELL')
+    return Response(fastpath.order_book_dict(outcome, bids, asks))
+
+
+@api_view(['GET'])
+@renderer_classes(MARKET_DATA_RENDERERS)
+def market_ticker(request, market_id):
+    """Get top of book for both outcomes of a market"""
+    if not Market.objects.filter(id=market_id).exists():
+        return Response({'error': 'Market not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    orderbooks = list(OrderBook.objects.filter(market_id=market_id).values(
+        *fastpath.ORDERBOOK_FIELDS
+    ).order_by('outcome'))
+    if wants_market_data(request):
+        return Response(marketdata.encode_ticker(orderbooks))
+    return Response([fastpath.orderbook_dict(row) for row in orderbooks])
+
+
+@api_view(['GET'])
+@renderer_classes(MARKET_DATA_RENDERERS)
+def ticker(request):
+    """Get top of book and last trade for every active market"""
+    try:
+        since = int(request.query_params.get('since', 0))
+    except ValueError:
+        return Response({'error': 'since must be an integer version'}, status=status.HTTP_400_BAD_REQUEST)
     
-    data = {
+    rows = fastpath.ticker_rows()
+    if wants_market_data(request):
+        return Response(marketdata.encode_ticker([row for row in rows if row['version'] > since]))
+    return Response(fastpath.ticker(rows, since))
+
+
+def parse_time(params, name, default):
+    """Aware datetime from an ISO 8601 query parameter; raises ValueError if malformed"""
+    if name not in params:
+        return default
+    moment = parse_datetime(params[name])
+    if moment is None:
+        raise ValueError(name)
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+@api_view(['GET'])
+@cached_response('price-history', ['history:{market_id}'])
+def price_history(request, market_id):
+    """
+    Price and volume history of a market outcome, downsampled for charting.
+    
+    Query parameters: ``outcome`` (YES or NO, default YES), ``start`` and
+    ``end`` (ISO 8601, default the market's creation and now), ``points``
+    (at most ``PRICE_HISTORY_MAX_POINTS``) and ``method`` (``lttb`` or
+    ``minmax``).
+    """
+    market = Market.objects.filter(id=market_id).values('created_at').first()
+    if market is None:
+        return Response({'error': 'Market not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    params = request.query_params
+    outcome = params.get('outcome', 'YES')
+    method = params.get('method', 'lttb')
+    try:
+        start = parse_time(params, 'start', market['created_at'])
+        end = parse_time(params, 'end', timezone.now())
+        points = int(params.get('points', settings.PRICE_HISTORY_DEFAULT_POINTS))
+    except ValueError:
+        points = None
+    if outcome not in ('YES', 'NO') or method not in history.METHODS:
+        return Response(
+            {'error': f"outcome must be YES or NO and method one of {', '.join(history.METHODS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if points is None or not 2 <= points <= settings.PRICE_HISTORY_MAX_POINTS:
+        return Response(
+            {'error': f'start and end must be ISO 8601 times and points 2 to {settings.PRICE_HISTORY_MAX_POINTS}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response({
+        'market': market_id,
         'outcome': outcome,
-        'bids': bids,
-        'asks': asks,
-        'spread': orderbook.spread,
-        'mid_price': orderbook.mid_price
+        'method': method,
+        'points': history.series(market_id, outcome, start, end, points, method),
+    })
+
+
+@api_view(['GET'])
+@cached_response('candles', ['history:{market_id}'])
+def candles(request, market_id):
+    """
+    OHLCV candles of a market outcome, oldest first.
+    
+    Query parameters: ``outcome`` (YES or NO, default YES), ``interval``
+    (1m, 5m, 1h or 1d, default 1h), ``start`` and ``end`` (ISO 8601) and
+    ``limit`` (at most ``CANDLES_MAX_LIMIT``). Without ``start`` the latest
+    ``limit`` candles before ``end`` are returned. Each candle is
+    ``[bucket start ms, open, high, low, close, volume, trades]``.
+    """
+    if not Market.objects.filter(id=market_id).exists():
+        return Response({'error': 'Market not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    params = request.query_params
+    outcome = params.get('outcome', 'YES')
+    interval = params.get('interval', '1h')
+    try:
+        start = parse_time(params, 'start', None)
+        end = parse_time(params, 'end', None)
+        limit = int(params.get('limit', settings.CANDLES_DEFAULT_LIMIT))
+    except ValueError:
+        limit = None
+    if outcome not in ('YES', 'NO') or interval not in Candle.INTERVAL_SECONDS:
+        return Response(
+            {'error': f"outcome must be YES or NO and interval one of {', '.join(Candle.INTERVAL_SECONDS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if limit is None or not 1 <= limit <= settings.CANDLES_MAX_LIMIT:
+        return Response(
+            {'error': f'start and end must be ISO 8601 times and limit 1 to {settings.CANDLES_MAX_LIMIT}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    rows = Candle.objects.filter(market_id=market_id, outcome=outcome, interval=interval)
+    if end is not None:
+        rows = rows.filter(bucket_start__lt=end)
+    rows = rows.values_list('bucket_start', 'open', 'high', 'low', 'close', 'volume', 'trades')
+    if start is not None:
+        rows = list(rows.filter(bucket_start__gte=start).order_by('bucket_start')[:limit])
+    else:
+        rows = list(rows.order_by('-bucket_start')[:limit])[::-1]
+
+    return Response({
+        'market': market_id,
+        'outcome': outcome,
+        'interval': interval,
+        'candles': [
+            [history.to_millis(bucket_start), float(open_), float(high), float(low), float(close), volume, trades]
+            for bucket_start, open_, high, low, close, volume, trades in rows
+        ],
+    })
+
+
+def leaderboard_entry(entry, rank_field):
+    return {
+        'rank': getattr(entry, rank_field),
+        'username': entry.user.username,
+        'realized_pnl': float(entry.realized_pnl),
+        'unrealized_pnl': float(entry.unrealized_pnl),
+        'total_pnl': float(entry.total_pnl),
+        'volume': float(entry.volume),
+        'roi': entry.roi,
     }
+
+
+@api_view(['GET'])
+def leaderboard_view(request):
+    """
+    Top traders and the requesting user's own entry, from the board last
+    materialized by ``manage.py compute_leaderboard``.
     
-    serializer = OrderBookDepthSerializer(data)
-    return Response(serializer.data)
+    Query parameters: ``by`` (pnl, volume or roi, default pnl) and ``limit``
+    (at most ``LEADERBOARD_MAX_LIMIT``). Both lookups are on indexed columns.
+    """
+    params = request.query_params
+    by = params.get('by', 'pnl')
+    try:
+        limit = int(params.get('limit', settings.LEADERBOARD_DEFAULT_LIMIT))
+    except ValueError:
+        limit = None
+    if by not in leaderboard.RANKINGS or limit is None or not 1 <= limit <= settings.LEADERBOARD_MAX_LIMIT:
+        return Response(
+            {'error': f"by must be one of {', '.join(leaderboard.RANKINGS)} and limit 1 to {settings.LEADERBOARD_MAX_LIMIT}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    rank_field = leaderboard.RANKINGS[by]
+    top = list(LeaderboardEntry.objects.filter(
+        **{f'{rank_field}__lte': limit}
+    ).select_related('user').order_by(rank_field))
+    me = LeaderboardEntry.objects.select_related('user').filter(user=request.user).first()
+    return Response({
+        'by': by,
+        'computed_at': top[0].computed_at if top else None,
+        'top': [leaderboard_entry(entry, rank_field) for entry in top],
+        'me': leaderboard_entry(me, rank_field) if me else None,
+    })
 
 
 def get_order_depth(market, outcome, order_type, levels=10):
     """Get order book depth for bids or asks"""
-    orders = Order.objects.filter(
-        market=market,
-        outcome=outcome,
-        order_type=order_type,
-        status__in=['PENDING', 'PARTIAL'],
-        price__isnull=False
-    ).order_by('-price' if order_type == 'BUY' else 'price')
-    
-    depth = {}
-    for order in orders:
-        price = float(order.price)
-        if price in depth:
-            depth[price] += order.remaining_quantity
-        else:
-            depth[price] = order.remaining_quantity
-    
-    # Convert to list and limit levels
-    result = []
-    sorted_prices = sorted(depth.keys(), reverse=(order_type == 'BUY'))
-    
-    for price in sorted_prices[:levels]:
-        result.append({
-            'price': price,
-            'quantity': depth[price]
-        })
-    
-    return result
+    return fastpath.depth_list(fastpath.price_levels(market.id, outcome, order_type, levels))
 
 
 @csrf_exempt
 @api_view(['POST'])
+@throttle_classes([UserOrderThrottle, MarketOrderThrottle])
+@idempotent
 def place_order(request):
     """Place a buy or sell order with proper order matching"""
     serializer = CreateOrderSerializer(data=request.data)
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    data = serializer.validated_data
+    market = serializer.validated_data['market']
+    try:
+        # A hot market only gets its share of this worker's order slots
+        with order_slot(market.id):
+            if settings.MATCHING_ENGINE_SHARDS:
+                # Sharded mode: the engine process that owns the market matches it
+                status_code, body = engine.submit_order(request.user.id, serializer.validated_data)
+            else:
+                status_code, body = execute_order(request.user, serializer.validated_data)
+    except OrderShed:
+        return Response(
+            {'error': 'This market is busy, please retry shortly'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={'Retry-After': str(settings.ORDER_RETRY_AFTER)}
+        )
+    return Response(body, status=status_code)
+
+
+def execute_order(user, data):
+    """Create, match and settle a validated order; returns (status code, response body)"""
     market = data['market']
     order_type = data['order_type']
     order_class = data['order_class']
@@ -121,58 +396,291 @@ def place_order(request):
     quantity = data['quantity']
     price = data.get('price')
     
-    # Get user account
-    account, created = Account.objects.get_or_create(user=request.user)
-    
     try:
         with transaction.atomic():
+            # One match per market at a time, whichever process or engine shard runs it
+            market = Market.objects.select_for_update().get(pk=market.pk)
+            account = locked_account(user)
+            
             # Create the order
             order = Order.objects.create(
-                user=request.user,
+                user=user,
                 market=market,
                 order_type=order_type,
                 order_class=order_class,
                 outcome=outcome,
                 quantity=quantity,
-                price=price
+                price=price,
+                stop_price=data.get('stop_price'),
+                time_in_force=data['time_in_force'],
+                expires_at=data.get('expires_at')
             )
             
             # Process the order
             if order_class == 'MARKET':
                 result = process_market_order(order, account)
-            else:  # LIMIT order
+            elif order_class == 'LIMIT':
                 result = process_limit_order(order, account)
+            else:  # STOP or STOP_LIMIT order
+                result = process_stop_order(order, account)
             
             if result['success']:
-                # Update order book
-                update_order_book(market, outcome)
+                # Update order books (complementary fills touch both outcomes)
+                update_order_books(market, result.get('books', {outcome}))
+                order_placed.send(sender=Order, order=order)
+                # Fills move the last trade price, which may trigger stops
+                if result.get('fills'):
+                    trigger_stop_orders(market)
                 
-                return Response({
+                return status.HTTP_201_CREATED, {
                     'message': result['message'],
-                    'order': OrderSerializer(order).data,
+                    'order': dict(OrderSerializer(order).data),
                     'fills': result.get('fills', [])
-                }, status=status.HTTP_201_CREATED)
+                }
             else:
                 order.delete()  # Remove failed order
-                return Response(
-                    {'error': result['error']}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+                return status.HTTP_400_BAD_REQUEST, {'error': result['error']}
                 
     except Exception as e:
-        return Response(
-            {'error': f'Order processing failed: {str(e)}'}, 
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
+        return status.HTTP_500_INTERNAL_SERVER_ERROR, {'error': f'Order processing failed: {str(e)}'}
+
+
+def locked_account(user):
+    """
+    The user's account, locked until the transaction ends.
+    
+    Matching checks the taker's balance before deducting from it, so the row
+    is locked for the whole match; every other balance change (counterparties,
+    refunds, the expiry and close jobs) is a relative UPDATE.
+    """
+    account, created = Account.objects.get_or_create(user=user)
+    return Account.objects.select_for_update().get(pk=account.pk)
 
 
 def process_market_order(order, account):
-    """Process a market order - fills immediately at best available price"""
+    """Process a market order - fills immediately at best available price, the rest is cancelled"""
+    return match_order(order, account)
+
+
+def process_limit_order(order, account):
+    """Process a limit order - fills up to its limit price, then rests, or cancels per time in force"""
+    # Check funds/shares for the whole order up front
+    if order.order_type == 'BUY' and (
+        notional(order.quantity, to_ticks(order.price)) > to_micros(account.balance)
+    ):
+        return {
+            'success': False,
+            'error': 'Insufficient funds for limit order'
+        }
+    return match_order(order, account)
+
+
+def process_stop_order(order, account):
+    """Process a stop order - waits off the book until the last trade reaches its stop price"""
+    last_price = OrderBook.objects.filter(
+        market=order.market, outcome=order.outcome
+    ).values_list('last_price', flat=True).first()
+    if order.stop_triggered(last_price):
+        # The market is already through the stop price
+        return process_triggered_order(order, account)
+    
+    if order.order_type == 'SELL':
+        # Reserve the shares so a stop-loss can't sell them twice
+        share = Share.objects.select_for_update().filter(
+            user=order.user, market=order.market, outcome=order.outcome
+        ).first()
+        if share is None or not share.remove_shares(order.quantity):
+            return {
+                'success': False,
+                'error': 'Insufficient shares for stop sell order'
+            }
+    
+    order.status = 'WAITING'
+    order.save()
+    return {
+        'success': True,
+        'message': f'Stop order placed. It triggers when the last trade reaches {order.stop_price}.'
+    }
+
+
+def process_triggered_order(order, account):
+    """Trade a triggered stop as a market order, or a limit order for stop-limits"""
+    if order.order_class == 'STOP_LIMIT':
+        return process_limit_order(order, account)
+    return process_market_order(order, account)
+
+
+def trigger_stop_orders(market):
+    """
+    Activate the stop orders the last trade prices of a market have reached.
+    
+    Waiting stops are looked up through ``order_waiting_stop_idx`` (sell stops
+    at or above the last price, buy stops at or below it), so each check is an
+    index range seek instead of a scan of every pending stop. Triggered stops
+    trade straight away and may move the prices again, so this repeats until
+    nothing else triggers.
+    """
+    while True:
+        triggered = []
+        for outcome, last_price in OrderBook.objects.filter(
+            market=market, last_price__isnull=False
+        ).values_list('outcome', 'last_price'):
+            waiting = Order.objects.filter(market=market, outcome=outcome, status='WAITING')
+            triggered += list(
+                waiting.filter(order_type='SELL', stop_price__gte=last_price).order_by('-stop_price', 'created_at')
+            ) + list(
+                waiting.filter(order_type='BUY', stop_price__lte=last_price).order_by('stop_price', 'created_at')
+            )
+        if not triggered:
+            return
+        
+        for order in triggered:
+            activate_stop_order(order)
+
+
+def activate_stop_order(order):
+    """Turn a triggered stop into a live order"""
+    account = locked_account(order.user)
+    if order.order_type == 'SELL':
+        # Hand back the reserved shares, matching takes what it sells
+        Share.objects.filter(
+            user=order.user, market=order.market, outcome=order.outcome
+        ).update(quantity=F('quantity') + order.quantity)
+    
+    result = process_triggered_order(order, account)
+    update_order_books(order.market, result.get('books', {order.outcome}))
+    if result['success']:
+        order_placed.send(sender=Order, order=order)
+    else:
+        order.status = 'CANCELLED'
+        order.save()
+        order_cancelled.send(sender=Order, order=order)
+
+
+def matching_orders(order):
+    """
+    Resting orders an incoming order can trade with, best price (then oldest)
+    first. They are locked, like every order matching reads, so a cancel or
+    an expiry sweep can't release an order that is being filled.
+    """
     opposite_type = 'SELL' if order.order_type == 'BUY' else 'BUY'
+    orders = Order.objects.select_for_update().filter(
+        market=order.market,
+        outcome=order.outcome,
+        order_type=opposite_type,
+        status__in=Order.OPEN_STATUSES,
+        price__isnull=False
+    ).filter(
+        # GTD orders stop trading at expires_at, even before the scheduler sweeps them
+        Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
+    ).exclude(user=order.user)
+    
+    # A limit order only trades at its limit price or better
+    if order.price is not None:
+        if order.order_type == 'BUY':
+            orders = orders.filter(price__lte=order.price)
+        else:
+            orders = orders.filter(price__gte=order.price)
+    
+    return orders.order_by(
+        'price' if order.order_type == 'BUY' else '-price', 'created_at'
+    )
+
+
+def complementary_orders(order):
+    """
+    Resting orders on the other outcome's book that cross with an incoming order.
+    
+    A YES share plus a NO share is worth exactly 1, so BUY YES @p crosses a
+    resting BUY NO @q when p + q >= 1 (the pair is minted), and SELL YES @p
+    crosses a resting SELL NO @q when p + q <= 1 (the pair is merged). The
+    incoming order trades at 1 - q, the resting order at its own price q.
+    """
+    other_outcome = 'NO' if order.outcome == 'YES' else 'YES'
+    orders = Order.objects.select_for_update().filter(
+        market=order.market,
+        outcome=other_outcome,
+        order_type=order.order_type,
+        status__in=Order.OPEN_STATUSES,
+        price__isnull=False
+    ).filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
+    ).exclude(user=order.user)
+    
+    if order.price is not None:
+        if order.order_type == 'BUY':
+            orders = orders.filter(price__gte=1 - order.price)
+        else:
+            orders = orders.filter(price__lte=1 - order.price)
+    
+    return orders.order_by(
+        '-price' if order.order_type == 'BUY' else 'price', 'created_at'
+    )
+
+
+def match_candidates(order):
+    """
+    ``(resting order, fill price in ticks)`` pairs for an incoming order, best price first.
     
-    # Validate SELL orders - user must own the shares they're trying to sell
+    Both books are read in price order and merged, so matching stays a single
+    ordered walk over the same-outcome book and the complementary one.
+    """
+    direct = ((resting, to_ticks(resting.price)) for resting in matching_orders(order))
+    complementary = (
+        (resting, complement(to_ticks(resting.price))) for resting in complementary_orders(order)
+    )
+    if order.order_type == 'BUY':
+        key = lambda candidate: (candidate[1], candidate[0].created_at)
+    else:
+        key = lambda candidate: (-candidate[1], candidate[0].created_at)
+    return heapq.merge(direct, complementary, key=key)
+
+
+def fill_or_kill_possible(order, account):
+    """Whether the whole order can be filled right now, within the buyer's funds"""
+    needed = order.quantity
+    cost = 0
+    for resting, price in match_candidates(order):
+        fill_quantity = min(needed, resting.remaining_quantity)
+        cost += notional(fill_quantity, price)
+        needed -= fill_quantity
+        if needed == 0:
+            break
+    if needed > 0:
+        return False
+    return order.order_type == 'SELL' or cost <= to_micros(account.balance)
+
+
+def match_order(order, account):
+    """
+    Match an incoming order against the book and apply its time in force.
+    
+    Market and IOC orders cancel whatever doesn't fill immediately, FOK orders
+    fill completely or not at all, and GTC/GTD limit orders rest the remainder
+    with its funds or shares reserved. Prices are handled in ticks and money
+    in micro-units throughout (see ``ticks.py``). The order's trades are
+    inserted in one statement, and the ledger rows of every account it
+    touched, the points for the price history and the market's statistics
+    are written by queued tasks.
+    """
+    trades = []
+    ledger = []
+    result = fill_order_against_book(order, account, trades, ledger)
+    if trades:
+        Trade.objects.bulk_create(trades)
+        enqueue('record_price_history', points=history.trade_points(trades))
+        enqueue('record_market_stats', **stats.trade_stats(trades))
+    if ledger:
+        enqueue('record_transactions', entries=ledger_payload(ledger))
+    return result
+
+
+def fill_order_against_book(order, account, trades, ledger):
+    """Fill, settle and rest ``order`` for ``match_order``, collecting unsaved trades and ledger rows"""
+    share = None
     if order.order_type == 'SELL':
-        share, created = Share.objects.get_or_create(
+        # Validate SELL orders - user must own the shares they're trying to sell
+        share, created = Share.objects.select_for_update().get_or_create(
             user=order.user,
             market=order.market,
             outcome=order.outcome,
@@ -184,244 +692,331 @@ def process_market_order(order, account):
                 'error': f'Insufficient shares. You own {share.quantity} shares but trying to sell {order.quantity}'
             }
     
-    # Find matching orders
-    matching_orders = Order.objects.filter(
-        market=order.market,
-        outcome=order.outcome,
-        order_type=opposite_type,
-        status__in=['PENDING', 'PARTIAL'],
-        price__isnull=False
-    ).exclude(user=order.user).order_by(
-        'price' if order.order_type == 'BUY' else '-price'
-    )
-    
-    if not matching_orders.exists():
+    if order.time_in_force == 'FOK' and not fill_or_kill_possible(order, account):
         return {
             'success': False,
-            'error': 'No matching orders available for market order'
+            'error': 'Fill-or-kill order cannot be filled completely'
         }
     
     remaining_quantity = order.quantity
-    total_cost = Decimal('0')
+    balance = to_micros(account.balance)
+    total_cost = 0
     fills = []
+    books = {order.outcome}
     
-    for matching_order in matching_orders:
+    for matching_order, fill_price in match_candidates(order):
         if remaining_quantity <= 0:
             break
             
         # Calculate fill quantity
         fill_quantity = min(remaining_quantity, matching_order.remaining_quantity)
-        fill_price = matching_order.price
         
         # Check if user can afford the fill
         if order.order_type == 'BUY':
-            fill_cost = fill_quantity * fill_price
-            if not account.can_afford(total_cost + fill_cost):
+            fill_cost = notional(fill_quantity, fill_price)
+            if total_cost + fill_cost > balance:
                 # Partial fill with remaining funds
-                max_affordable = int((account.balance - total_cost) / fill_price)
+                max_affordable = affordable_quantity(balance - total_cost, fill_price)
                 if max_affordable <= 0:
                     break
                 fill_quantity = max_affordable
-                fill_cost = fill_quantity * fill_price
+                fill_cost = notional(fill_quantity, fill_price)
             
             total_cost += fill_cost
         
         # Execute the fill
-        execute_fill(order, matching_order, fill_quantity, fill_price)
+        if matching_order.outcome == order.outcome:
+            execute_fill(order, matching_order, fill_quantity, fill_price, trades, ledger)
+        else:
+            execute_pair_fill(order, matching_order, fill_quantity, fill_price, trades, ledger)
+            books.add(matching_order.outcome)
         
         fills.append({
-            'price': float(fill_price),
+            'price': fill_price / TICKS_PER_UNIT,
             'quantity': fill_quantity,
             'counterparty': matching_order.user.username
         })
         
         remaining_quantity -= fill_quantity
     
-    # Update account balance
+    filled_quantity = order.quantity - remaining_quantity
+    if not order.rests_on_book and filled_quantity == 0:
+        return {
+            'success': False,
+            'error': 'No matching orders available for market order'
+            if order.is_market_order else 'No matching orders available at this price'
+        }
+    
+    # Settle the fills
     if order.order_type == 'BUY':
-        account.deduct_funds(total_cost)
-        Transaction.objects.create(
-            account=account,
-            transaction_type='BUY',
-            amount=total_cost,
-            description=f'Market buy {order.quantity} {order.outcome} shares in {order.market.title}'
-        )
+        if total_cost:
+            account.deduct_funds(from_micros(total_cost))
+            ledger.append(Transaction(
+                account=account,
+                transaction_type=Transaction.Type.BUY,
+                amount=from_micros(total_cost),
+                market_id=order.market_id,
+                order=order,
+                outcome=order.outcome,
+                quantity=filled_quantity
+            ))
+    elif filled_quantity:
+        share.remove_shares(filled_quantity)
     
-    if remaining_quantity > 0:
-        order.status = 'PARTIAL'
-        order.save()
+    if remaining_quantity == 0:
         return {
             'success': True,
-            'message': f'Order partially filled. {order.quantity - remaining_quantity} shares filled.',
-            'fills': fills
+            'message': 'Order filled completely.',
+            'fills': fills,
+            'books': books
         }
-    else:
-        order.status = 'FILLED'
-        order.filled_at = timezone.now()
+    
+    if not order.rests_on_book:
+        # Market and IOC orders never rest: cancel the unfilled remainder
+        order.status = 'CANCELLED'
         order.save()
         return {
             'success': True,
-            'message': 'Order filled completely.',
-            'fills': fills
+            'message': f'Order partially filled. {filled_quantity} shares filled, the remaining {remaining_quantity} cancelled.',
+            'fills': fills,
+            'books': books
         }
-
-
-def process_limit_order(order, account):
-    """Process a limit order - adds to order book or fills if price matches"""
-    opposite_type = 'SELL' if order.order_type == 'BUY' else 'BUY'
     
-    # Check if order can be filled immediately
-    matching_orders = Order.objects.filter(
-        market=order.market,
-        outcome=order.outcome,
-        order_type=opposite_type,
-        status__in=['PENDING', 'PARTIAL'],
-        price__isnull=False
-    ).exclude(user=order.user).order_by(
-        'price' if order.order_type == 'BUY' else '-price'
-    )
-    
-    # For buy orders, check if our limit price >= ask price
-    # For sell orders, check if our limit price <= bid price
-    can_fill = False
+    # Rest the remainder on the book and reserve funds/shares for it
     if order.order_type == 'BUY':
-        best_ask = matching_orders.first()
-        can_fill = best_ask and order.price >= best_ask.price
+        reserved = from_micros(notional(remaining_quantity, to_ticks(order.price)))
+        account.deduct_funds(reserved)
+        ledger.append(Transaction(
+            account=account,
+            transaction_type=Transaction.Type.BUY_LIMIT,
+            amount=reserved,
+            market_id=order.market_id,
+            order=order,
+            outcome=order.outcome,
+            quantity=remaining_quantity,
+            price=order.price
+        ))
     else:
-        best_bid = matching_orders.first()
-        can_fill = best_bid and order.price <= best_bid.price
+        share.remove_shares(remaining_quantity)
+    order.adjust_price_level(remaining_quantity, 1)
     
-    if can_fill:
-        # Try to fill the order
-        return process_market_order(order, account)
-    else:
-        # Add to order book (check funds/shares first)
-        if order.order_type == 'BUY':
-            total_cost = order.quantity * order.price
-            if not account.can_afford(total_cost):
-                return {
-                    'success': False,
-                    'error': 'Insufficient funds for limit order'
-                }
-            # Reserve funds
-            account.deduct_funds(total_cost)
-            Transaction.objects.create(
-                account=account,
-                transaction_type='BUY_LIMIT',
-                amount=total_cost,
-                description=f'Limit buy order: {order.quantity} {order.outcome} @ {order.price} in {order.market.title}'
-            )
-        else:
-            # Check if user has enough shares to sell
-            share, created = Share.objects.get_or_create(
-                user=order.user,
-                market=order.market,
-                outcome=order.outcome
-            )
-            if share.quantity < order.quantity:
-                return {
-                    'success': False,
-                    'error': 'Insufficient shares for limit sell order'
-                }
-            # Reserve shares
-            share.remove_shares(order.quantity)
-        
-        order.status = 'PENDING'
-        order.save()
-        
+    if filled_quantity:
         return {
             'success': True,
-            'message': 'Limit order placed in order book.'
+            'message': f'Order partially filled. {filled_quantity} shares filled, the remaining {remaining_quantity} placed in order book.',
+            'fills': fills,
+            'books': books
         }
+    order.status = 'PENDING'
+    order.save()
+    return {
+        'success': True,
+        'message': 'Limit order placed in order book.'
+    }
 
 
-def execute_fill(buy_order, sell_order, quantity, price):
-    """Execute a trade between two orders"""
+def execute_fill(buy_order, sell_order, quantity, price, trades, ledger):
+    """
+    Execute a trade between an incoming and a resting order at ``price`` ticks.
+    
+    The trade and the seller's ledger row are appended to ``trades`` and
+    ``ledger`` unsaved, for ``match_order`` to write in bulk.
+    """
     # Update order quantities
     buy_order.fill_order(quantity)
     sell_order.fill_order(quantity)
+    sell_order.adjust_price_level(-quantity, -1 if sell_order.status == 'FILLED' else 0)
+    trade = Trade(
+        market_id=buy_order.market_id,
+        taker_order=buy_order,
+        maker_order=sell_order,
+        outcome=buy_order.outcome,
+        price=from_ticks(price),
+        quantity=quantity
+    )
+    trades.append(trade)
     
     # Update shares
     if buy_order.order_type == 'BUY':
         # Buyer gets shares
-        buy_share, created = Share.objects.get_or_create(
+        buy_share, created = Share.objects.select_for_update().get_or_create(
             user=buy_order.user,
             market=buy_order.market,
             outcome=buy_order.outcome
         )
-        buy_share.add_shares(quantity, price)
+        buy_share.add_shares_at_ticks(quantity, price)
         
         # Seller's account gets funds
         sell_account, created = Account.objects.get_or_create(user=sell_order.user)
-        sell_account.add_funds(quantity * price)
+        sell_account.add_funds(from_micros(notional(quantity, price)))
         
-        Transaction.objects.create(
+        ledger.append(Transaction(
             account=sell_account,
-            transaction_type='SELL',
-            amount=quantity * price,
-            description=f'Sell {quantity} {sell_order.outcome} shares in {sell_order.market.title}'
-        )
+            transaction_type=Transaction.Type.SELL,
+            amount=from_micros(notional(quantity, price)),
+            market_id=trade.market_id,
+            order=sell_order,
+            trade=trade,
+            outcome=sell_order.outcome,
+            quantity=quantity
+        ))
     else:
         # Seller gets shares
-        sell_share, created = Share.objects.get_or_create(
+        sell_share, created = Share.objects.select_for_update().get_or_create(
             user=sell_order.user,
             market=sell_order.market,
             outcome=sell_order.outcome
         )
-        sell_share.add_shares(quantity, price)
+        sell_share.add_shares_at_ticks(quantity, price)
         
         # Buyer's account gets funds
         buy_account, created = Account.objects.get_or_create(user=buy_order.user)
-        buy_account.add_funds(quantity * price)
+        buy_account.add_funds(from_micros(notional(quantity, price)))
+        
+        ledger.append(Transaction(
+            account=buy_account,
+            transaction_type=Transaction.Type.SELL,
+            amount=from_micros(notional(quantity, price)),
+            market_id=trade.market_id,
+            order=buy_order,
+            trade=trade,
+            outcome=buy_order.outcome,
+            quantity=quantity
+        ))
+    
+    record_last_trade(buy_order.market, buy_order.outcome, from_ticks(price), quantity)
+    order_filled.send(
+        sender=Order, order=buy_order, counterparty=sell_order,
+        quantity=quantity, price=from_ticks(price)
+    )
+
+
+def execute_pair_fill(order, resting_order, quantity, price, trades, ledger):
+    """
+    Execute a complementary match between YES and NO orders on the same side.
+    
+    The incoming order trades at ``price`` ticks and the resting order at its
+    own price, which add up to 1. Two buys mint a YES/NO pair, each buyer taking
+    their side; two sells merge a pair, each seller receiving their price.
+    """
+    order.fill_order(quantity)
+    resting_order.fill_order(quantity)
+    resting_order.adjust_price_level(-quantity, -1 if resting_order.status == 'FILLED' else 0)
+    trade = Trade(
+        market_id=order.market_id,
+        taker_order=order,
+        maker_order=resting_order,
+        outcome=order.outcome,
+        price=from_ticks(price),
+        quantity=quantity
+    )
+    trades.append(trade)
+    sides = [(order, price), (resting_order, complement(price))]
+    
+    if order.order_type == 'BUY':
+        # Each buyer gets their outcome; the resting buyer's funds were reserved
+        for buyer, buy_price in sides:
+            share, created = Share.objects.select_for_update().get_or_create(
+                user=buyer.user,
+                market=buyer.market,
+                outcome=buyer.outcome
+            )
+            share.add_shares_at_ticks(quantity, buy_price)
+    else:
+        # Each seller is paid; the incoming seller's shares are settled by matching
+        for seller, sell_price in sides:
+            account, created = Account.objects.get_or_create(user=seller.user)
+            account.add_funds(from_micros(notional(quantity, sell_price)))
+            ledger.append(Transaction(
+                account=account,
+                transaction_type=Transaction.Type.SELL,
+                amount=from_micros(notional(quantity, sell_price)),
+                market_id=trade.market_id,
+                order=seller,
+                trade=trade,
+                outcome=seller.outcome,
+                quantity=quantity
+            ))
+    
+    for side, side_price in sides:
+        record_last_trade(side.market, side.outcome, from_ticks(side_price), quantity)
+    order_filled.send(
+        sender=Order, order=order, counterparty=resting_order,
+        quantity=quantity, price=from_ticks(price)
+    )
 
 
-def update_order_book(market, outcome):
-    """Update the order book for a market outcome"""
-    orderbook, created = OrderBook.objects.get_or_create(
+def record_last_trade(market, outcome, price, quantity):
+    """Remember the latest trade on the order book for tickers"""
+    OrderBook.objects.update_or_create(
         market=market,
-        outcome=outcome
+        outcome=outcome,
+        defaults={
+            'last_price': price,
+            'last_quantity': quantity,
+            'last_trade_at': timezone.now(),
+        }
     )
-    orderbook.update_book()
+
+
+def update_order_books(market, outcomes):
+    """Queue a snapshot refresh of a market's order books; depth reads price levels directly"""
+    enqueue('refresh_order_books', market_id=market.id, outcomes=sorted(outcomes))
 
 
 @csrf_exempt
 @api_view(['POST'])
+@throttle_classes([UserOrderThrottle])
+@idempotent
 def cancel_order(request, order_id):
     """Cancel a pending order"""
-    try:
-        order = Order.objects.get(id=order_id, user=request.user)
-    except Order.DoesNotExist:
-        return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
-    
-    if order.status not in ['PENDING', 'PARTIAL']:
-        return Response({'error': 'Order cannot be cancelled'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Refund reserved funds/shares
-    account, created = Account.objects.get_or_create(user=request.user)
+    with transaction.atomic():
+        # Locked so a concurrent fill or expiry can't release it too
+        order = Order.objects.select_for_update().filter(id=order_id, user=request.user).first()
+        if order is None:
+            return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+        if order.status not in Order.CANCELLABLE_STATUSES:
+            return Response({'error': 'Order cannot be cancelled'}, status=status.HTTP_400_BAD_REQUEST)
+        release_order(order)
+    return Response({'message': 'Order cancelled successfully'})
+
+
+def release_order(order):
+    """Refund a cancelled order's reserved funds or shares and take it off the book"""
+    account, created = Account.objects.get_or_create(user=order.user)
     
-    if order.order_type == 'BUY':
+    # Untriggered buy stops reserve nothing
+    if order.order_type == 'BUY' and order.status != 'WAITING':
         # Refund reserved funds
-        refund_amount = order.remaining_quantity * order.price
+        refund_amount = from_micros(notional(order.remaining_quantity, to_ticks(order.price)))
         account.add_funds(refund_amount)
-        Transaction.objects.create(
+        enqueue('record_transactions', entries=ledger_payload([Transaction(
             account=account,
-            transaction_type='CANCEL_BUY',
+            transaction_type=Transaction.Type.CANCEL_BUY,
             amount=refund_amount,
-            description=f'Cancelled buy order: {order.remaining_quantity} {order.outcome} @ {order.price}'
-        )
-    else:
+            market_id=order.market_id,
+            order=order,
+            outcome=order.outcome,
+            quantity=order.remaining_quantity,
+            price=order.price
+        )]))
+    elif order.order_type == 'SELL':
         # Return reserved shares
-        share, created = Share.objects.get_or_create(
+        share, created = Share.objects.select_for_update().get_or_create(
             user=order.user,
             market=order.market,
             outcome=order.outcome
         )
-        share.add_shares(order.remaining_quantity, order.price)
+        share.quantity += order.remaining_quantity
+        share.save()
+    
+    # Take it off its price level (untriggered stops never rested)
+    if order.status in Order.OPEN_STATUSES:
+        order.adjust_price_level(-order.remaining_quantity, -1)
     
     # Cancel the order
     order.cancel_order()
     
     # Update order book
-    update_order_book(order.market, order.outcome)
-    
-    return Response({'message': 'Order cancelled successfully'})
\ No newline at end of file
+    update_order_books(order.market, [order.outcome])
+    order_cancelled.send(sender=Order, order=order)
\ No newline at end of file
@@ -2,6 +2,9 @@
 ASGI config for prediction_marketplace project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Production runs it under gunicorn with uvicorn workers so the async read API
+(``/api/markets/async/...``) does not tie up a worker while waiting on the
+database.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -0,0 +1,59 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .routers import allow_replica_reads
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+PIN_COOKIE_NAME = 'pin_primary'
+
+
+class ReplicaPinningMiddleware:
+    """
+    Route safe requests to read replicas while keeping read-your-writes.
+
+    Any successful write request sets a short-lived cookie; while it is
+    present the client's reads stay on the primary, so a user who just
+    placed or cancelled an order never sees a lagging replica.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with allow_replica_reads(self.use_replica(request)):
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        with allow_replica_reads(self.use_replica(request)):
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def use_replica(self, request):
+        return (
+            request.method in SAFE_METHODS
+            and PIN_COOKIE_NAME not in request.COOKIES
+        )
+
+    def process_response(self, request, response):
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and getattr(settings, 'DATABASE_REPLICAS', [])
+        ):
+            response.set_cookie(
+                PIN_COOKIE_NAME, '1',
+                max_age=settings.DATABASE_REPLICA_STICKY_SECONDS,
+                httponly=True,
+                secure=settings.SESSION_COOKIE_SECURE,
+                samesite=settings.SESSION_COOKIE_SAMESITE,
+            )
+        return response
@@ -0,0 +1,47 @@
+"""
+Database routing for read replicas.
+
+Reads go to the primary unless the current request has opted in to replica
+reads (see ``ReplicaPinningMiddleware``), so management commands, the shell
+and anything running inside a write request keep read-your-writes semantics.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_reads_allowed():
+    """Return True if reads in the current context may use a replica"""
+    return _replica_reads.get()
+
+
+@contextmanager
+def allow_replica_reads(allowed=True):
+    """Allow (or forbid) replica reads for the duration of the block"""
+    token = _replica_reads.set(allowed)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """Send writes to ``default`` and safe reads to a random replica"""
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if replicas and _replica_reads.get():
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import os
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,6 +49,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'prediction_marketplace.middleware.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -143,6 +145,8 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
+CORS_ALLOW_HEADERS = [*default_headers, 'idempotency-key']
+CORS_EXPOSE_HEADERS = ['idempotent-replayed', 'retry-after']
 
 # CSRF settings for production
 CSRF_TRUSTED_ORIGINS = [
@@ -161,7 +165,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'markets.renderers.ORJSONRenderer',
     ],
 }
 
@@ -171,6 +175,123 @@ if os.environ.get('DATABASE_URL'):
         'default': dj_database_url.parse(os.environ.get('DATABASE_URL'))
     }
 
+# Read replicas (comma-separated DATABASE_REPLICA_URLS). Safe requests read
+# from a random replica; clients that just wrote stay on the primary for
+# DATABASE_REPLICA_STICKY_SECONDS so they always see their own orders.
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dj_database_url.parse(url.strip())
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['prediction_marketplace.routers.PrimaryReplicaRouter']
+DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', 5))
+
+# Maximum concurrent database connections used by the async read API per
+# ASGI worker (see markets/async_views.py)
+ASYNC_DB_MAX_CONNECTIONS = int(os.environ.get('ASYNC_DB_MAX_CONNECTIONS', 10))
+
+# Cache: local memory per process by default. Point CACHE_BACKEND and
+# CACHE_LOCATION at a shared backend (e.g. RedisCache + redis://...) to share
+# cached reads and counters across workers.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'prediction-marketplace'),
+    }
+}
+
+# Cached market reads are invalidated by order/market signals (markets/cache.py);
+# the timeout only bounds how long orphaned entries occupy memory
+MARKET_CACHE_TIMEOUT = 600
+
+# Cache generations are bumped by every process that writes (web, run_tasks,
+# the schedulers), so a process-local cache keeps them in the database instead
+CACHE_GENERATIONS_IN_DATABASE = os.environ.get(
+    'CACHE_GENERATIONS_IN_DATABASE', str(CACHES['default']['BACKEND'].endswith('LocMemCache'))
+).lower() in ['true', '1', 'yes']
+
+# Coalesce concurrent identical reads of hot markets (markets/coalescing.py).
+# The shared mode also coalesces across workers through the cache.
+REQUEST_COALESCING = True
+REQUEST_COALESCING_SHARED = os.environ.get('REQUEST_COALESCING_SHARED', 'False').lower() in ['true', '1', 'yes']
+REQUEST_COALESCING_LOCK_TIMEOUT = 2
+
+# Upper bound on how long the market-wide ticker stays cached; it is also
+# dropped whenever an order book or market changes
+MARKET_TICKER_CACHE_TIMEOUT = 30
+
+# Post-trade task queue (markets/tasks.py), drained by `manage.py run_tasks`.
+# Eager mode runs tasks in-process after commit instead, for setups without a worker.
+TASK_QUEUE_EAGER = os.environ.get('TASK_QUEUE_EAGER', 'False').lower() in ['true', '1', 'yes']
+TASK_QUEUE_WORKERS = int(os.environ.get('TASK_QUEUE_WORKERS', 4))
+TASK_QUEUE_BATCH_SIZE = 100
+TASK_QUEUE_LEASE_SECONDS = 60
+TASK_QUEUE_MAX_ATTEMPTS = 5
+
+# Sharded matching (markets/engine.py). 0 matches orders in the web process;
+# K > 0 sends them to K `manage.py run_engine --shard N` processes by market
+MATCHING_ENGINE_SHARDS = int(os.environ.get('MATCHING_ENGINE_SHARDS', 0))
+# The sockets live in a directory only the app's user may enter (created 0700),
+# and connections are authenticated with MATCHING_ENGINE_AUTHKEY. It is
+# required unless DEBUG, where a random key is kept in the socket directory.
+MATCHING_ENGINE_SOCKET_DIR = os.environ.get('MATCHING_ENGINE_SOCKET_DIR', str(BASE_DIR / 'run' / 'matching-engine'))
+MATCHING_ENGINE_AUTHKEY = os.environ.get('MATCHING_ENGINE_AUTHKEY', '')
+MATCHING_ENGINE_ASSIGNMENT_TTL = 5
+
+# Admission of new orders per worker process (markets/scheduling.py): orders
+# share ORDER_SLOTS, one market holds at most HOT_MARKET_SHARE of them, and
+# orders still queued after ORDER_QUEUE_TIMEOUT seconds are shed with a 503
+ORDER_SLOTS = int(os.environ.get('ORDER_SLOTS', 8))
+HOT_MARKET_SHARE = 0.25
+ORDER_QUEUE_TIMEOUT = 2
+ORDER_RETRY_AFTER = 1
+
+# Token-bucket limits on placing and cancelling orders (markets/throttling.py),
+# as (requests per second, burst) per account tier, for each user and for each
+# user within one market. ORDER_THROTTLE_SHARED keeps the buckets in the cache
+# so every worker enforces the same limits.
+ORDER_THROTTLE_RATES = {
+    'STANDARD': {'user': (10, 20), 'market': (5, 10)},
+    'PRO': {'user': (50, 100), 'market': (25, 50)},
+    'MARKET_MAKER': {'user': (200, 400), 'market': (100, 200)},
+}
+ORDER_THROTTLE_SHARED = os.environ.get('ORDER_THROTTLE_SHARED', 'False').lower() in ['true', '1', 'yes']
+ACCOUNT_TIER_CACHE_TIMEOUT = 60
+
+# Responses to order requests sent with an Idempotency-Key are replayed for
+# retries for this many seconds (markets/idempotency.py)
+IDEMPOTENCY_KEY_RETENTION = 24 * 60 * 60
+# A key still unfinished after this many seconds belongs to a request whose
+# worker died, and a retry may claim it again
+IDEMPOTENCY_CLAIM_TIMEOUT = 60
+
+# Points returned by the price history endpoint by default and at most
+# (markets/history.py)
+PRICE_HISTORY_DEFAULT_POINTS = 500
+PRICE_HISTORY_MAX_POINTS = 5000
+
+# Candles returned by the candles endpoint by default and at most
+# (markets/candles.py)
+CANDLES_DEFAULT_LIMIT = 500
+CANDLES_MAX_LIMIT = 2000
+
+# Results returned by the market search endpoint by default and at most
+# (markets/search.py)
+MARKET_SEARCH_DEFAULT_LIMIT = 20
+MARKET_SEARCH_MAX_LIMIT = 100
+
+# Price levels per side and recent trades on the market view endpoint
+# (markets/fastpath.py)
+MARKET_VIEW_DEPTH_LEVELS = 10
+MARKET_VIEW_RECENT_TRADES = 20
+
+# Traders returned by the leaderboard endpoint by default and at most
+# (markets/leaderboard.py)
+LEADERBOARD_DEFAULT_LIMIT = 50
+LEADERBOARD_MAX_LIMIT = 500
+
 # Allow all hosts in production
 ALLOWED_HOSTS = ['*']
 
@@ -14,5 +14,22 @@ python manage.py shell -c "from django.contrib.auth.models import User; User.obj
 echo "Creating sample data..."
 python manage.py shell -c "exec(open('create_sample_data.py').read())"
 
+echo "Starting order expiry, market close, idempotency key, market stats and leaderboard schedulers..."
+python manage.py expire_orders --interval 5 &
+python manage.py close_markets --interval 30 &
+python manage.py prune_idempotency_keys --interval 3600 &
+python manage.py roll_market_stats --interval 60 &
+python manage.py compute_leaderboard --interval 300 &
+
+echo "Starting post-trade task worker..."
+python manage.py run_tasks &
+
+if [ "${MATCHING_ENGINE_SHARDS:-0}" -gt 0 ]; then
+    echo "Starting $MATCHING_ENGINE_SHARDS matching engine shards..."
+    for shard in $(seq 0 $((MATCHING_ENGINE_SHARDS - 1))); do
+        python manage.py run_engine --shard $shard &
+    done
+fi
+
 echo "Starting Gunicorn server..."
-gunicorn prediction_marketplace.wsgi:application --bind 0.0.0.0:$PORT
\ No newline at end of file
+exec gunicorn prediction_marketplace.asgi:application -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:${PORT:-8080}
\ No newline at end of file